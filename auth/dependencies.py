@@ -71,6 +71,17 @@ class AccessTokenBearer(TokenBearer):
             )
 
 
+class OptionalAccessTokenBearer(AccessTokenBearer):
+    # Anonymous requests get None; a token that is present must still be valid.
+    def __init__(self):
+        super().__init__(auto_error=False)
+
+    async def __call__(self, request: Request):
+        if not request.headers.get("Authorization"):
+            return None
+        return await super().__call__(request)
+
+
 class RefreshTokenBearer(TokenBearer):
     def verify_token_data(self, token_data: dict):
         if token_data and token_data.get("refresh", False):
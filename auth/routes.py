@@ -1,6 +1,6 @@
 from datetime import timedelta, datetime, timezone
 
-from fastapi import APIRouter, BackgroundTasks, Depends, HTTPException, status
+from fastapi import APIRouter, BackgroundTasks, Depends, HTTPException, Request, status
 from fastapi.responses import JSONResponse
 from auth.schemas import (
     UserRegister,
@@ -17,13 +17,17 @@ from utils.tokens import (
     decode_url_safe_token,
     create_access_token,
     verify_token,
+    decode_guest_token,
 )
 from celery_tasks import send_password_reset_email, send_verfification_email
 from auth.dependencies import AccessTokenBearer, RefreshTokenBearer
 from db.redis import add_jti_to_blocklist
+from cart.dependencies import GUEST_COOKIE
+from cart.services import CartService
 
 Auth_router = APIRouter(prefix="/auth", tags=["Auth"])
 user_service = AuthService()
+cart_services = CartService()
 
 
 @Auth_router.post("/register")
@@ -78,7 +82,7 @@ async def verify_user_account(token: str, session: AsyncSession = Depends(get_se
 
 
 @Auth_router.post("/login")
-async def login(login_data: UserLogin, session: AsyncSession = Depends(get_session)):
+async def login(login_data: UserLogin, request: Request, session: AsyncSession = Depends(get_session)):
     username: str = login_data.username
     password: str = login_data.password
 
@@ -109,6 +113,9 @@ async def login(login_data: UserLogin, session: AsyncSession = Depends(get_sessi
         expires_delta=timedelta(days=2),
     )
 
+    guest_id = decode_guest_token(request.cookies.get(GUEST_COOKIE))
+    merged = guest_id is not None and await cart_services.merge_guest_cart(user, guest_id, session)
+
     response = JSONResponse(
         content={
             "message": "Login successful",
@@ -127,6 +134,8 @@ async def login(login_data: UserLogin, session: AsyncSession = Depends(get_sessi
         secure=True,
         samesite="strict",
     )
+    if merged:
+        response.delete_cookie(GUEST_COOKIE, secure=True, httponly=True, samesite="lax")
     return response
 
 
@@ -0,0 +1,76 @@
+"""Bulk product import throughput.
+
+Creates a throwaway vendor and imports synthetic products through
+ProductService.create_bulk_products against DATABASE_URL, reporting rows
+per second for each chunk size.
+
+    python -m benchmarks.bulk_import --rows 5000 --chunk-sizes 100 500 1000
+"""
+import argparse
+import asyncio
+import random
+import time
+import uuid
+
+from sqlalchemy import text
+
+from config import settings
+from db.session import AsyncSessionLocal, engine
+from products.schemes import ProductCreate
+from products.services import ProductService
+
+
+CATEGORIES = ["Staples", "Rice", "Dal", "Dairy", "Snacks", "Beverages", "Household"]
+
+
+async def create_vendor() -> uuid.UUID:
+    vendor_id = uuid.uuid4()
+    async with AsyncSessionLocal() as session:
+        await session.exec(
+            text(
+                "INSERT INTO \"user\" (user_id, username, email, role, is_verified, is_active, password_hash, created_at, updated_at) "
+                "VALUES (:id, :name, :email, 'vendor', true, true, '', now(), now())"
+            ).bindparams(id=vendor_id, name=f"bench_{vendor_id.hex[:8]}", email=f"{vendor_id.hex[:8]}@bench.local")
+        )
+        await session.commit()
+    return vendor_id
+
+
+def build_payload(vendor_id: uuid.UUID, rows: int, run: str) -> list[ProductCreate]:
+    return [
+        ProductCreate(
+            name=f"bench product {run} {i}",
+            description=f"synthetic product {i}",
+            price=round(random.uniform(10, 2000), 2),
+            stock=random.randint(0, 100),
+            category_names=random.sample(CATEGORIES, k=2),
+            vendor_id=vendor_id,
+        )
+        for i in range(rows)
+    ]
+
+
+async def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--rows", type=int, default=5000)
+    parser.add_argument("--chunk-sizes", type=int, nargs="+", default=[500])
+    args = parser.parse_args()
+    engine.echo = False
+
+    vendor_id = await create_vendor()
+    service = ProductService()
+    for chunk_size in args.chunk_sizes:
+        settings.BULK_IMPORT_CHUNK_SIZE = chunk_size
+        payload = build_payload(vendor_id, args.rows, f"c{chunk_size}")
+        async with AsyncSessionLocal() as session:
+            started = time.perf_counter()
+            report = await service.create_bulk_products(session, payload)
+            elapsed = time.perf_counter() - started
+        print(
+            f"chunk={chunk_size:>5} rows={len(report['success'])} errors={len(report['errors'])} "
+            f"elapsed={elapsed:.2f}s rate={len(report['success']) / elapsed:,.0f} rows/s"
+        )
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
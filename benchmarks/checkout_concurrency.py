@@ -0,0 +1,185 @@
+"""Checkout concurrency load test.
+
+Seeds a small catalogue and one cart per buyer in the database configured by
+DATABASE_URL, with every cart drawing from the same few SKUs, then runs all
+checkouts at once. Fails if any product was oversold or if the units sold do
+not match the order lines, and reports orders per second. Each checkout is
+sent twice with the same Idempotency-Key to check that retries do not
+double-order.
+
+    python -m benchmarks.checkout_concurrency --checkouts 500 --products 20
+"""
+import argparse
+import asyncio
+import random
+import time
+import uuid
+from types import SimpleNamespace
+
+import redis.asyncio as red_db
+from fastapi import HTTPException
+from sqlalchemy import text
+from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
+from sqlmodel.ext.asyncio.session import AsyncSession
+
+from cart.store import FLUSH_GROUP, JOURNAL_KEY, cart_key
+from config import settings
+from orders.services import OrderService
+
+
+async def seed(session_factory, checkouts: int, products: int, stock: int, lines: int):
+    run = uuid.uuid4().hex[:8]
+    vendor_id = uuid.uuid4()
+    product_ids = [uuid.uuid4() for _ in range(products)]
+    buyer_ids = [uuid.uuid4() for _ in range(checkouts)]
+    user_sql = text(
+        "INSERT INTO \"user\" (user_id, username, email, role, is_verified, is_active, password_hash, created_at, updated_at) "
+        "VALUES (:id, :name, :email, :role, true, true, '', now(), now())"
+    )
+    async with session_factory() as session:
+        await session.execute(
+            user_sql,
+            [{"id": vendor_id, "name": f"bench_vendor_{run}", "email": f"vendor_{run}@bench.local", "role": "vendor"}]
+            + [
+                {"id": buyer_id, "name": f"bench_{run}_{i}", "email": f"{run}_{i}@bench.local", "role": "user"}
+                for i, buyer_id in enumerate(buyer_ids)
+            ],
+        )
+        await session.execute(
+            text(
+                "INSERT INTO product (product_id, vendor_id, name, description, price, stock, image_urls, created_at, updated_at) "
+                "VALUES (:id, :vendor, :name, 'checkout bench', :price, :stock, '[]', now(), now())"
+            ),
+            [
+                {"id": product_id, "vendor": vendor_id, "name": f"bench_{run}_{i}", "price": 10 + i, "stock": stock}
+                for i, product_id in enumerate(product_ids)
+            ],
+        )
+        carts = [(uuid.uuid4(), buyer_id) for buyer_id in buyer_ids]
+        await session.execute(
+            text("INSERT INTO cart (cart_id, user_id, created_at, updated_at) VALUES (:id, :user, now(), now())"),
+            [{"id": cart_id, "user": buyer_id} for cart_id, buyer_id in carts],
+        )
+        await session.execute(
+            text(
+                "INSERT INTO cartitem (cart_item_id, cart_id, product_id, quantity, updated_at) "
+                "VALUES (gen_random_uuid(), :cart, :product, :quantity, now())"
+            ),
+            [
+                {"cart": cart_id, "product": product_id, "quantity": random.randint(1, 3)}
+                for cart_id, _ in carts
+                for product_id in random.sample(product_ids, min(lines, products))
+            ],
+        )
+        await session.commit()
+    return vendor_id, product_ids, buyer_ids
+
+
+async def buyer(service: OrderService, session_factory, buyer_id, counters: dict):
+    key = uuid.uuid4().hex
+    user = SimpleNamespace(user_id=buyer_id)
+    orders = set()
+    for _ in range(2):
+        async with session_factory() as session:
+            try:
+                order, replayed = await service.checkout(user, key, session)  # type: ignore
+            except HTTPException as e:
+                if e.status_code == 409:
+                    counters["out_of_stock"] += 1
+                    return
+                raise
+        orders.add(order["order_id"])
+        counters["replayed" if replayed else "placed"] += 1
+    assert len(orders) == 1, "retry placed a second order"
+
+
+async def purge_journal(client, buyer_ids):
+    # Journal entries of deleted users would only be replayed by the flusher.
+    buyers = {str(buyer_id).encode() for buyer_id in buyer_ids}
+    start = "-"
+    while True:
+        entries = await client.xrange(JOURNAL_KEY, min=start, count=1000)
+        if not entries:
+            return
+        ids = [entry_id for entry_id, fields in entries if fields.get(b"user_id") in buyers]
+        if ids:
+            await client.xack(JOURNAL_KEY, FLUSH_GROUP, *ids)
+            await client.xdel(JOURNAL_KEY, *ids)
+        start = b"(" + entries[-1][0]
+
+
+async def run(checkouts: int, products: int, stock: int, lines: int, pool_size: int):
+    engine = create_async_engine(settings.DATABASE_URL, pool_size=pool_size, max_overflow=0)
+    session_factory = async_sessionmaker(bind=engine, class_=AsyncSession, expire_on_commit=False)
+    client = red_db.from_url(settings.REDIS_URL)
+    service = OrderService()
+    vendor_id, product_ids, buyer_ids = await seed(session_factory, checkouts, products, stock, lines)
+    try:
+        counters = {"placed": 0, "replayed": 0, "out_of_stock": 0}
+        started = time.perf_counter()
+        await asyncio.gather(
+            *(buyer(service, session_factory, buyer_id, counters) for buyer_id in buyer_ids)
+        )
+        elapsed = time.perf_counter() - started
+
+        async with session_factory() as session:
+            left = (
+                await session.execute(
+                    text("SELECT coalesce(sum(stock), 0), coalesce(min(stock), 0) FROM product WHERE product_id = ANY(:ids)"),
+                    {"ids": product_ids},
+                )
+            ).one()
+            sold = (
+                await session.execute(
+                    text("SELECT coalesce(sum(quantity), 0) FROM orderitem WHERE product_id = ANY(:ids)"),
+                    {"ids": product_ids},
+                )
+            ).scalar_one()
+        print(
+            f"checkouts={checkouts} products={products} placed={counters['placed']} "
+            f"replayed={counters['replayed']} out_of_stock={counters['out_of_stock']} "
+            f"units_sold={sold} elapsed={elapsed:.2f}s "
+            f"throughput={counters['placed'] / elapsed:.0f} orders/s"
+        )
+        assert left[1] >= 0, "oversold"
+        assert sold + left[0] == stock * products, "units were lost or double counted"
+    finally:
+        await client.delete(*(cart_key(buyer_id) for buyer_id in buyer_ids))
+        await purge_journal(client, buyer_ids)
+        async with session_factory() as session:
+            # Undelivered events would email the fake buyers and vendor.
+            await session.execute(
+                text("DELETE FROM outboxevent WHERE aggregate_id IN (SELECT order_id FROM \"order\" WHERE user_id = ANY(:ids))"),
+                {"ids": buyer_ids},
+            )
+            await session.execute(
+                text("DELETE FROM orderitem WHERE product_id = ANY(:ids)"), {"ids": product_ids}
+            )
+            await session.execute(text("DELETE FROM \"order\" WHERE user_id = ANY(:ids)"), {"ids": buyer_ids})
+            await session.execute(
+                text("DELETE FROM cartitem WHERE cart_id IN (SELECT cart_id FROM cart WHERE user_id = ANY(:ids))"),
+                {"ids": buyer_ids},
+            )
+            await session.execute(text("DELETE FROM cart WHERE user_id = ANY(:ids)"), {"ids": buyer_ids})
+            await session.execute(text("DELETE FROM product WHERE product_id = ANY(:ids)"), {"ids": product_ids})
+            await session.execute(
+                text("DELETE FROM \"user\" WHERE user_id = ANY(:ids)"), {"ids": [vendor_id, *buyer_ids]}
+            )
+            await session.commit()
+        await engine.dispose()
+        await client.aclose()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Concurrent checkout load test")
+    parser.add_argument("--checkouts", type=int, default=500)
+    parser.add_argument("--products", type=int, default=20)
+    parser.add_argument("--stock", type=int, default=200)
+    parser.add_argument("--lines", type=int, default=4, help="products per cart")
+    parser.add_argument("--pool-size", type=int, default=50)
+    args = parser.parse_args()
+    asyncio.run(run(args.checkouts, args.products, args.stock, args.lines, args.pool_size))
+
+
+if __name__ == "__main__":
+    main()
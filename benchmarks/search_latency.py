@@ -0,0 +1,96 @@
+"""Search latency benchmark.
+
+Seeds a synthetic catalog (default one million products) into the database
+configured by DATABASE_URL and reports p50/p95/p99 latency of
+ProductService.get_product for exact and fuzzy queries.
+
+    python -m benchmarks.search_latency --rows 1000000 --iterations 500
+"""
+import argparse
+import asyncio
+import random
+import statistics
+import time
+import uuid
+
+from sqlalchemy import text
+
+from db.session import AsyncSessionLocal, engine
+from products.services import ProductService
+
+
+QUERIES = ["atta", "aata", "basmathi", "basm", "rice 5kg", "milk", "toor dal", "ghee"]
+WORDS = [
+    "atta", "basmati", "rice", "toor", "dal", "ghee", "milk", "paneer", "sugar",
+    "salt", "masala", "tea", "coffee", "biscuit", "oil", "soap", "shampoo", "flour",
+]
+
+
+async def seed(rows: int):
+    async with AsyncSessionLocal() as session:
+        vendor_id = uuid.uuid4()
+        await session.execute(
+            text(
+                "INSERT INTO \"user\" (user_id, username, email, role, is_verified, is_active, password_hash, created_at, updated_at) "
+                "VALUES (:id, :name, :email, 'vendor', true, true, '', now(), now())"
+            ).bindparams(id=vendor_id, name=f"bench_{vendor_id.hex[:8]}", email=f"{vendor_id.hex[:8]}@bench.local")
+        )
+        words = "{" + ",".join(WORDS) + "}"
+        await session.execute(
+            text(
+                """
+                INSERT INTO product (product_id, vendor_id, name, description, price, stock, image_urls, created_at, updated_at)
+                SELECT gen_random_uuid(), :vendor,
+                       w[1 + (g % array_length(w, 1))] || ' ' || w[1 + ((g / 7) % array_length(w, 1))] || ' ' || g,
+                       'synthetic product ' || g, (g % 1000) + 9.5, g % 50, '[]',
+                       now() - (g || ' seconds')::interval, now()
+                FROM generate_series(1, :rows) AS g, (SELECT CAST(:words AS text[]) AS w) AS words
+                """
+            ).bindparams(vendor=vendor_id, rows=rows, words=words)
+        )
+        await session.commit()
+
+
+async def measure(iterations: int, fuzzy: bool) -> list[float]:
+    service = ProductService()
+    timings = []
+    async with AsyncSessionLocal() as session:
+        for _ in range(iterations):
+            query = random.choice(QUERIES)
+            started = time.perf_counter()
+            # Bypass the Redis search cache so every iteration hits Postgres.
+            await service._find_products(
+                session, query, limit=20, cursor=None, fuzzy=fuzzy, filters=None, facets=False
+            )
+            timings.append((time.perf_counter() - started) * 1000)
+            await session.rollback()
+    return timings
+
+
+def report(label: str, timings: list[float]):
+    cuts = statistics.quantiles(timings, n=100)
+    print(
+        f"{label:>6}: n={len(timings)} p50={cuts[49]:.2f}ms "
+        f"p95={cuts[94]:.2f}ms p99={cuts[98]:.2f}ms max={max(timings):.2f}ms"
+    )
+
+
+async def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--rows", type=int, default=1_000_000)
+    parser.add_argument("--iterations", type=int, default=500)
+    parser.add_argument("--skip-seed", action="store_true")
+    args = parser.parse_args()
+    engine.echo = False
+
+    if not args.skip_seed:
+        started = time.perf_counter()
+        await seed(args.rows)
+        print(f"seeded {args.rows} products in {time.perf_counter() - started:.1f}s")
+
+    report("exact", await measure(args.iterations, fuzzy=False))
+    report("fuzzy", await measure(args.iterations, fuzzy=True))
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
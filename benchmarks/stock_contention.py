@@ -0,0 +1,119 @@
+"""Stock contention load test.
+
+Creates one product with a fixed stock in the database configured by
+DATABASE_URL and lets many concurrent buyers reserve it until it sells out,
+once through the conditional-UPDATE path and once through the Redis hot-SKU
+path. Fails if more units were reserved than existed, and reports
+reservations per second for the SKU.
+
+    python -m benchmarks.stock_contention --stock 2000 --concurrency 200
+"""
+import argparse
+import asyncio
+import time
+import uuid
+
+import redis.asyncio as red_db
+from fastapi import HTTPException
+from sqlalchemy import text
+from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
+from sqlmodel.ext.asyncio.session import AsyncSession
+
+from config import settings
+from products.stock import HOT_KEY, StockService, pool_keys
+
+
+async def seed(session_factory, stock: int):
+    vendor_id = uuid.uuid4()
+    product_id = uuid.uuid4()
+    async with session_factory() as session:
+        await session.execute(
+            text(
+                "INSERT INTO \"user\" (user_id, username, email, role, is_verified, is_active, password_hash, created_at, updated_at) "
+                "VALUES (:id, :name, :email, 'vendor', true, true, '', now(), now())"
+            ).bindparams(id=vendor_id, name=f"bench_{vendor_id.hex[:8]}", email=f"{vendor_id.hex[:8]}@bench.local")
+        )
+        await session.execute(
+            text(
+                "INSERT INTO product (product_id, vendor_id, name, description, price, stock, image_urls, created_at, updated_at) "
+                "VALUES (:id, :vendor, :name, 'flash sale', 99, :stock, '[]', now(), now())"
+            ).bindparams(id=product_id, vendor=vendor_id, name=f"flash_{product_id.hex[:8]}", stock=stock)
+        )
+        await session.commit()
+    return vendor_id, product_id
+
+
+async def buyer(service: StockService, session_factory, product_id, counters: dict):
+    while True:
+        async with session_factory() as session:
+            try:
+                await service.reserve(session, product_id, 1, None)
+            except HTTPException as e:
+                if e.status_code == 409:
+                    return
+                raise
+        counters["reserved"] += 1
+
+
+async def run_mode(mode: str, stock: int, concurrency: int, allocation: int, session_factory, client):
+    service = StockService(client)
+    vendor_id, product_id = await seed(session_factory, stock)
+    if mode == "hot":
+        await client.hset(HOT_KEY, str(product_id), allocation)
+
+    counters = {"reserved": 0}
+    started = time.perf_counter()
+    await asyncio.gather(
+        *(buyer(service, session_factory, product_id, counters) for _ in range(concurrency))
+    )
+    elapsed = time.perf_counter() - started
+
+    async with session_factory() as session:
+        remaining = (
+            await session.execute(
+                text("SELECT stock FROM product WHERE product_id = :id").bindparams(id=product_id)
+            )
+        ).scalar_one()
+    pool = int(await client.get(pool_keys(product_id)[0]) or 0)
+    reserved = counters["reserved"]
+    print(
+        f"{mode:<4} stock={stock} reserved={reserved} left_in_db={remaining} left_in_pool={pool} "
+        f"elapsed={elapsed:.2f}s throughput={reserved / elapsed:.0f} reservations/s"
+    )
+    assert reserved + remaining + pool == stock, "units were lost or double counted"
+    assert reserved <= stock, "oversold"
+
+    await client.hdel(HOT_KEY, str(product_id))
+    await client.delete(*pool_keys(product_id))
+    async with session_factory() as session:
+        await session.execute(text("DELETE FROM product WHERE product_id = :id").bindparams(id=product_id))
+        await session.execute(text("DELETE FROM \"user\" WHERE user_id = :id").bindparams(id=vendor_id))
+        await session.commit()
+
+
+async def run(stock: int, concurrency: int, allocation: int, modes: list[str]):
+    engine = create_async_engine(
+        settings.DATABASE_URL, pool_size=concurrency, max_overflow=0
+    )
+    session_factory = async_sessionmaker(bind=engine, class_=AsyncSession, expire_on_commit=False)
+    client = red_db.from_url(settings.REDIS_URL)
+    try:
+        for mode in modes:
+            await run_mode(mode, stock, concurrency, allocation, session_factory, client)
+    finally:
+        await engine.dispose()
+        await client.aclose()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Concurrent stock reservation load test")
+    parser.add_argument("--stock", type=int, default=2000)
+    parser.add_argument("--concurrency", type=int, default=200)
+    parser.add_argument("--allocation", type=int, default=settings.STOCK_HOT_ALLOCATION)
+    parser.add_argument("--modes", nargs="+", choices=["db", "hot"], default=["db", "hot"])
+    args = parser.parse_args()
+    asyncio.run(run(args.stock, args.concurrency, args.allocation, args.modes))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,42 @@
+import uuid
+from uuid import UUID
+
+from fastapi import Depends, HTTPException, Request, Response, status
+from sqlmodel.ext.asyncio.session import AsyncSession
+
+from auth.dependencies import OptionalAccessTokenBearer, get_current_user
+from config import settings
+from db.models import User
+from db.session import get_session
+from utils.tokens import create_guest_token, decode_guest_token
+
+GUEST_COOKIE = "guest_cart"
+
+
+def set_guest_cookie(response: Response, guest_id: UUID):
+    response.set_cookie(
+        key=GUEST_COOKIE,
+        value=create_guest_token(guest_id),
+        max_age=settings.CART_GUEST_TTL_SECONDS,
+        httponly=True,
+        secure=True,
+        samesite="lax",
+    )
+
+
+async def get_cart_owner(
+    request: Request,
+    response: Response,
+    session: AsyncSession = Depends(get_session),
+    token_details=Depends(OptionalAccessTokenBearer()),
+) -> tuple[User | None, UUID | None]:
+    if token_details:
+        user = await get_current_user(token_details, session)
+        if not user:
+            raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="User not found")
+        return user, None
+
+    guest_id = decode_guest_token(request.cookies.get(GUEST_COOKIE)) or uuid.uuid4()
+    # Re-signed on every request so an active guest cart keeps its cookie.
+    set_guest_cookie(response, guest_id)
+    return None, guest_id
@@ -1,10 +1,10 @@
 from fastapi import APIRouter, Depends
+from uuid import UUID
 from sqlmodel.ext.asyncio.session import AsyncSession
-from auth.dependencies import AccessTokenBearer, get_current_user
-from schemas import CartItemCreate, CartItemResponse
-from db.models import User
+from cart.dependencies import get_cart_owner
+from cart.schemas import CartItemBase, CartItemCreate, CartOperation, CartPatch, CartView
 from cart.services import CartService
-from typing import List
+from typing import List, Literal
 
 from db.session import get_session
 
@@ -13,18 +13,46 @@ Cart_router = APIRouter(prefix="/cart", tags=["Cart"])
 cart_services= CartService()
 
 
-@Cart_router.get("/", response_model=List[CartItemResponse])
-async def get_cart_items(session: AsyncSession= Depends(get_session), token_details= Depends(AccessTokenBearer)):
-    user_details:User| None = await get_current_user(token_details, session)
-    return await cart_services.get_cart_items(user_details, session)
-
-
-@Cart_router.post("/add")
-async def add_to_cart(Items: CartItemCreate, session:AsyncSession=Depends(get_session), token_details= Depends(AccessTokenBearer)):
-    user_details:User| None = await get_current_user(token_details, session)
-    return await cart_services.add_to_cart(user_details, Items, session)
-
-
-@Cart_router.delete("/{item_id}")
-async def remove_from_cart():
-    pass
+@Cart_router.get("/", response_model=CartView)
+async def get_cart(
+    image_size: Literal["thumb", "card", "detail", "original"] = "thumb",
+    session: AsyncSession= Depends(get_session),
+    owner=Depends(get_cart_owner),
+):
+    user_details, guest_id = owner
+    return await cart_services.get_cart(user_details, session, image_size, guest_id)
+
+
+@Cart_router.get("/items", response_model=List[CartItemBase])
+async def get_cart_items(session: AsyncSession= Depends(get_session), owner=Depends(get_cart_owner)):
+    user_details, guest_id = owner
+    return await cart_services.get_cart_items(user_details, session, guest_id)
+
+
+@Cart_router.post("/add", response_model=CartItemBase)
+async def add_to_cart(Items: CartItemCreate, session:AsyncSession=Depends(get_session), owner=Depends(get_cart_owner)):
+    user_details, guest_id = owner
+    return await cart_services.add_to_cart(user_details, Items, session, guest_id)
+
+
+@Cart_router.patch("/", response_model=CartView)
+async def update_cart(
+    patch: CartPatch,
+    image_size: Literal["thumb", "card", "detail", "original"] = "thumb",
+    session: AsyncSession= Depends(get_session),
+    owner=Depends(get_cart_owner),
+):
+    user_details, guest_id = owner
+    return await cart_services.update_cart(user_details, patch.operations, session, image_size, guest_id)
+
+
+@Cart_router.delete("/{product_id}", response_model=CartView)
+async def remove_from_cart(
+    product_id: UUID,
+    image_size: Literal["thumb", "card", "detail", "original"] = "thumb",
+    session:AsyncSession=Depends(get_session),
+    owner=Depends(get_cart_owner),
+):
+    user_details, guest_id = owner
+    operation = CartOperation(op="remove", product_id=product_id, quantity=0)
+    return await cart_services.update_cart(user_details, [operation], session, image_size, guest_id)
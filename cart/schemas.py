@@ -1,4 +1,4 @@
-from typing import List, Optional
+from typing import List, Literal, Optional
 from uuid import UUID
 from datetime import datetime
 from pydantic import BaseModel, Field
@@ -14,6 +14,15 @@ class CartItemCreate(CartItemBase):
 class CartItemUpdate(BaseModel):
     quantity: int = Field(ge=1)
 
+class CartOperation(BaseModel):
+    op: Literal["add", "set", "remove"]
+    product_id: UUID
+    # added for "add", the new quantity for "set" (0 removes), ignored for "remove"
+    quantity: int = Field(default=1, ge=0)
+
+class CartPatch(BaseModel):
+    operations: List[CartOperation] = Field(min_length=1, max_length=200)
+
 class CartItemResponse(CartItemBase):
     cart_item_id: UUID
     cart_id: UUID
@@ -38,3 +47,23 @@ class CartResponse(CartBase):
 
     class Config:
         from_attributes = True
+
+
+# ----------------- Cart View Schemas -----------------#
+class CartLine(BaseModel):
+    product_id: UUID
+    name: str
+    price: float
+    quantity: int
+    stock: int
+    image_url: Optional[str] = None
+    line_total: float
+    out_of_stock: bool
+
+
+class CartView(BaseModel):
+    items: List[CartLine] = []
+    item_count: int = 0
+    total_quantity: int = 0
+    subtotal: float = 0
+    has_out_of_stock: bool = False
@@ -1,51 +1,341 @@
 import uuid
 from datetime import datetime, timezone
+from fastapi import HTTPException, status
+from sqlalchemy import Integer, column, delete, func, literal, values
+from sqlalchemy.dialects.postgresql import UUID as PG_UUID, insert
+from sqlalchemy.exc import IntegrityError
+from redis.exceptions import RedisError
 from sqlmodel.ext.asyncio.session import AsyncSession
 from sqlmodel import select
 from db.models import remove_timezone
 
-from schemas import CartItemCreate
-from db.models import Cart, CartItem, User
+from cart.schemas import CartItemCreate, CartLine, CartOperation, CartView
+from cart.store import cart_store
+from db.models import Cart, CartItem, Product, User
+from products.stock import stock_service
+from products.variants import preview_image_url
+
+PRODUCT_COLUMNS = (
+    Product.product_id,
+    Product.name,
+    Product.price,
+    Product.stock,
+    Product.image_urls,
+    Product.image_variants,
+)
+
+
+def guest_cart_unavailable() -> HTTPException:
+    # Guest carts only exist in Redis.
+    return HTTPException(
+        status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+        detail="GUEST CARTS ARE TEMPORARILY UNAVAILABLE, PLEASE LOG IN",
+    )
+
 
 class CartService:
-    async def get_cart_items(self, user_details:User|None, session:AsyncSession):
-        if user_details:
-            user_id= user_details.user_id
-        statement= select(Cart).where(Cart.user_id == user_id)
+    async def _ensure_products(self, session: AsyncSession, product_ids):
+        # Redis accepts any id, so check against Postgres before writing.
+        wanted = set(product_ids)
+        if not wanted:
+            return
+        result = await session.exec(
+            select(Product.product_id).where(Product.product_id.in_(wanted))  # type: ignore
+        )
+        if wanted - set(result.all()):
+            raise HTTPException(
+                status_code=status.HTTP_404_NOT_FOUND, detail="Product not found"
+            )
+
+    async def get_cart_items(self, user_details:User|None, session:AsyncSession, guest_id: uuid.UUID | None = None):
+        if user_details is None:
+            try:
+                items = await cart_store.guest_items(guest_id)  # type: ignore
+            except RedisError:
+                raise guest_cart_unavailable()
+            return [
+                {"product_id": product_id, "quantity": quantity}
+                for product_id, quantity in items.items()
+            ]
 
+        user_id= user_details.user_id
+        try:
+            items = await cart_store.items(session, user_id)
+            return [
+                {"product_id": product_id, "quantity": quantity}
+                for product_id, quantity in items.items()
+            ]
+        except RedisError:
+            pass
+
+        statement = (
+            select(CartItem.product_id, CartItem.quantity)
+            .join(Cart, Cart.cart_id == CartItem.cart_id)  # type: ignore
+            .where(Cart.user_id == user_id)
+        )
         result = await session.exec(statement)
-        cart = result.one_or_none()
+        return [
+            {"product_id": product_id, "quantity": quantity}
+            for product_id, quantity in result.all()
+        ]
+
+    async def _product_rows(self, session: AsyncSession, items: dict[uuid.UUID, int]):
+        result = await session.exec(
+            select(*PRODUCT_COLUMNS).where(Product.product_id.in_(list(items)))  # type: ignore
+        )
+        return [(*row, items[row.product_id]) for row in result.all()]
 
-        return cart.cart_items if cart else []
+    def _view(self, rows, pooled: dict, image_size: str) -> CartView:
+        lines = []
+        for product_id, name, price, stock, image_urls, image_variants, quantity in rows:
+            available = stock + pooled.get(product_id, 0)
+            lines.append(
+                CartLine(
+                    product_id=product_id,
+                    name=name,
+                    price=price,
+                    quantity=quantity,
+                    stock=available,
+                    image_url=preview_image_url(image_urls, image_variants, image_size),
+                    line_total=round(price * quantity, 2),
+                    out_of_stock=quantity > available,
+                )
+            )
+        lines.sort(key=lambda line: line.name.lower())
+        return CartView(
+            items=lines,
+            item_count=len(lines),
+            total_quantity=sum(line.quantity for line in lines),
+            subtotal=round(sum(line.line_total for line in lines), 2),
+            has_out_of_stock=any(line.out_of_stock for line in lines),
+        )
 
-    async def add_to_cart(self, user_details: User|None, item: CartItemCreate, session:AsyncSession):
-        if user_details:
-            user_id= user_details.user_id
+    async def get_cart(
+        self,
+        user_details: User|None,
+        session: AsyncSession,
+        image_size: str = "card",
+        guest_id: uuid.UUID | None = None,
+    ):
+        if user_details is None:
+            try:
+                items = await cart_store.guest_items(guest_id)  # type: ignore
+                pooled = await stock_service.pooled(list(items))
+            except RedisError:
+                raise guest_cart_unavailable()
+            rows = await self._product_rows(session, items) if items else []
+            return self._view(rows, pooled, image_size)
 
-        statement= select(Cart).where(Cart.user_id == user_id)
+        user_id= user_details.user_id
+        pooled = {}
+        try:
+            items = await cart_store.items(session, user_id)
+            if not items:
+                return CartView()
+            rows = await self._product_rows(session, items)
+            pooled = await stock_service.pooled([row[0] for row in rows])
+        except RedisError:
+            result = await session.exec(
+                select(*PRODUCT_COLUMNS, CartItem.quantity)
+                .join(CartItem, CartItem.product_id == Product.product_id)  # type: ignore
+                .join(Cart, Cart.cart_id == CartItem.cart_id)  # type: ignore
+                .where(Cart.user_id == user_id)
+            )
+            rows = result.all()
+        return self._view(rows, pooled, image_size)
 
-        result = await session.exec(statement)
-        cart = result.one_or_none()
+    async def merge_guest_cart(self, user_details: User, guest_id: uuid.UUID, session: AsyncSession):
+        # Best effort: a failed merge must not fail the login, and the guest
+        # cart and its cookie are kept for the next login.
+        try:
+            await cart_store.merge_guest(session, user_details.user_id, guest_id)
+        except RedisError:
+            return False
+        return True
 
-        if not cart:
-            cart = Cart(user_id=user_id)
-            session.add(cart)
+    def _upsert_item_statement(self, user_id: uuid.UUID, item: CartItemCreate):
+        # Creates the cart if needed and adds to an existing line in one
+        # statement; the unique constraints make concurrent clicks merge
+        # instead of inserting duplicate rows.
+        now = remove_timezone(datetime.now(timezone.utc))
+        cart_insert = insert(Cart).values(
+            cart_id=uuid.uuid4(), user_id=user_id, created_at=now, updated_at=now
+        )
+        cart_row = (
+            cart_insert.on_conflict_do_update(
+                index_elements=[Cart.user_id],
+                set_={"updated_at": cart_insert.excluded.updated_at},
+            )
+            .returning(Cart.cart_id)
+            .cte("cart_row")
+        )
+        columns = CartItem.__table__.c  # type: ignore
+        item_insert = insert(CartItem).from_select(
+            ["cart_item_id", "cart_id", "product_id", "quantity", "updated_at"],
+            select(
+                literal(uuid.uuid4(), columns.cart_item_id.type),
+                cart_row.c.cart_id,
+                literal(item.product_id, columns.product_id.type),
+                literal(item.quantity, columns.quantity.type),
+                literal(now, columns.updated_at.type),
+            ),
+        )
+        return item_insert.on_conflict_do_update(
+            constraint="uq_cartitem_cart_id_product_id",
+            set_={
+                "quantity": CartItem.quantity + item_insert.excluded.quantity,
+                "updated_at": item_insert.excluded.updated_at,
+            },
+        ).returning(*columns)
+
+    async def add_to_cart(
+        self,
+        user_details: User|None,
+        item: CartItemCreate,
+        session:AsyncSession,
+        guest_id: uuid.UUID | None = None,
+    ):
+        await self._ensure_products(session, [item.product_id])
+        if user_details is None:
+            try:
+                quantity = await cart_store.guest_apply(
+                    guest_id, [("add", item.product_id, item.quantity)]  # type: ignore
+                )
+            except RedisError:
+                raise guest_cart_unavailable()
+            return {"product_id": item.product_id, "quantity": quantity}
+
+        user_id= user_details.user_id
+
+        # Live carts are kept in Redis and flushed to Postgres in the
+        # background; Postgres is written directly only when Redis is down.
+        try:
+            quantity = await cart_store.add(session, user_id, item.product_id, item.quantity)
+            return {"product_id": item.product_id, "quantity": quantity}
+        except RedisError:
+            pass
+
+        try:
+            result = await session.exec(self._upsert_item_statement(user_id, item))  # type: ignore
+            row = result.one()
+            await cart_store.mark_stale(session, user_id)
             await session.commit()
-            await session.refresh(cart)
+        except IntegrityError:
+            await session.rollback()
+            raise HTTPException(
+                status_code=status.HTTP_404_NOT_FOUND, detail="Product not found"
+            )
+        return {"product_id": row.product_id, "quantity": row.quantity}
+
+    async def _apply_operations(self, user_id: uuid.UUID, operations: list[tuple], session: AsyncSession):
+        # Fold the operations into one absolute or relative change per
+        # product, then write them with at most four statements.
+        changes: dict[uuid.UUID, tuple[bool, int]] = {}
+        for op, product_id, quantity in operations:
+            absolute, current = changes.get(product_id, (False, 0))
+            if op == "add":
+                changes[product_id] = (absolute, current + quantity)
+            else:
+                changes[product_id] = (True, quantity)
 
-        statement = select(CartItem).where(
-            (CartItem.cart_id == cart.cart_id) & (CartItem.product_id == item.product_id)
+        now = remove_timezone(datetime.now(timezone.utc))
+        cart_insert = insert(Cart).values(
+            cart_id=uuid.uuid4(), user_id=user_id, created_at=now, updated_at=now
         )
-        result = await session.exec(statement)
-        existing_item = result.one_or_none()
+        result = await session.exec(
+            cart_insert.on_conflict_do_update(  # type: ignore
+                index_elements=[Cart.user_id],
+                set_={"updated_at": cart_insert.excluded.updated_at},
+            ).returning(Cart.cart_id)
+        )
+        cart_id = result.scalar_one()
+
+        columns = CartItem.__table__.c  # type: ignore
+        for absolute in (True, False):
+            rows = [
+                (product_id, quantity)
+                for product_id, (is_absolute, quantity) in changes.items()
+                if is_absolute == absolute and quantity > 0
+            ]
+            if not rows:
+                continue
+            batch = values(
+                column("product_id", PG_UUID(as_uuid=True)),
+                column("quantity", Integer),
+                name="changes",
+            ).data(rows)
+            item_insert = insert(CartItem).from_select(
+                ["cart_item_id", "cart_id", "product_id", "quantity", "updated_at"],
+                select(
+                    func.gen_random_uuid(),
+                    literal(cart_id, columns.cart_id.type),
+                    batch.c.product_id,
+                    batch.c.quantity,
+                    literal(now, columns.updated_at.type),
+                )
+                .select_from(batch)
+                .join(Product, Product.product_id == batch.c.product_id),  # type: ignore
+            )
+            quantity = item_insert.excluded.quantity
+            if not absolute:
+                quantity = CartItem.quantity + quantity
+            await session.exec(
+                item_insert.on_conflict_do_update(  # type: ignore
+                    constraint="uq_cartitem_cart_id_product_id",
+                    set_={"quantity": quantity, "updated_at": item_insert.excluded.updated_at},
+                )
+            )
 
-        if existing_item:
-            existing_item.quantity += item.quantity
-            existing_item.updated_at = remove_timezone(datetime.now(timezone.utc))
-        else:
-            new_item = CartItem(cart_id=cart.cart_id, **item.model_dump())
-            session.add(new_item)
+        removed = [
+            product_id
+            for product_id, (is_absolute, quantity) in changes.items()
+            if is_absolute and quantity <= 0
+        ]
+        if removed:
+            await session.exec(
+                delete(CartItem).where(
+                    CartItem.cart_id == cart_id,
+                    CartItem.product_id.in_(removed),  # type: ignore
+                )  # type: ignore
+            )
 
-        await session.commit()
-        return existing_item or new_item
+    async def update_cart(
+        self,
+        user_details: User|None,
+        operations: list[CartOperation],
+        session: AsyncSession,
+        image_size: str = "thumb",
+        guest_id: uuid.UUID | None = None,
+    ):
+        batch = [
+            ("set", operation.product_id, 0)
+            if operation.op == "remove"
+            else (operation.op, operation.product_id, operation.quantity)
+            for operation in operations
+        ]
+        # Removing a line of a deleted product stays allowed.
+        await self._ensure_products(
+            session, [product_id for _, product_id, quantity in batch if quantity > 0]
+        )
+        if user_details is None:
+            try:
+                await cart_store.guest_apply(guest_id, batch)  # type: ignore
+            except RedisError:
+                raise guest_cart_unavailable()
+            return await self.get_cart(None, session, image_size, guest_id)
 
+        user_id= user_details.user_id
+        try:
+            await cart_store.apply(session, user_id, batch)
+        except RedisError:
+            try:
+                await self._apply_operations(user_id, batch, session)
+                await cart_store.mark_stale(session, user_id)
+                await session.commit()
+            except Exception as e:
+                await session.rollback()
+                raise HTTPException(
+                    status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+                    detail=f"FAILED TO UPDATE CART: {str(e)}",
+                )
+        return await self.get_cart(user_details, session, image_size)
@@ -0,0 +1,449 @@
+import os
+import socket
+import uuid
+from datetime import datetime, timezone
+from uuid import UUID
+
+import redis.asyncio as red_db
+from redis.exceptions import ResponseError
+from sqlalchemy import ARRAY, Integer, any_, bindparam, column, delete, exists, func, literal, update, values
+from sqlalchemy.dialects.postgresql import UUID as PG_UUID, insert
+from sqlmodel import select
+from sqlmodel.ext.asyncio.session import AsyncSession
+
+from config import settings
+from db.models import Cart, CartItem, Product, User, remove_timezone
+from db.redis import redis_client
+from db.session import worker_session_factory
+
+# The live cart is a hash of product_id -> quantity under cart:{user_id}.
+# Every change also appends the user id to a journal stream in the same
+# script; a consumer group flushes snapshots of the touched carts to
+# Postgres and only acknowledges entries after the commit, so a crashed
+# flusher's entries are claimed and replayed by the next one.
+JOURNAL_KEY = "cart:journal"
+FLUSH_GROUP = "cart-flushers"
+LOADED_FIELD = "_loaded"
+
+
+def cart_key(user_id) -> str:
+    return f"cart:{user_id}"
+
+
+def guest_cart_key(guest_id) -> str:
+    return f"guest_cart:{guest_id}"
+
+
+# KEYS: cart, journal, guest cart  ARGV: ttl, user, maxlen, then op,
+# product, quantity for every operation. All operations apply atomically
+# and are journaled once. Returns the last quantity, or -1 when the cart is
+# not loaded yet. Guest carts pass only KEYS[1]: they are never loaded from
+# or flushed to Postgres.
+MUTATE_SCRIPT = """
+if KEYS[2] and redis.call('EXISTS', KEYS[1]) == 0 then
+    return -1
+end
+local quantity = 0
+for i = 4, #ARGV, 3 do
+    local op, product = ARGV[i], ARGV[i + 1]
+    if op == 'add' then
+        quantity = redis.call('HINCRBY', KEYS[1], product, ARGV[i + 2])
+        if quantity <= 0 then
+            redis.call('HDEL', KEYS[1], product)
+            quantity = 0
+        end
+    elseif op == 'set' then
+        quantity = tonumber(ARGV[i + 2])
+        if quantity > 0 then
+            redis.call('HSET', KEYS[1], product, quantity)
+        else
+            redis.call('HDEL', KEYS[1], product)
+        end
+    elseif op == 'clear' then
+        local loaded = redis.call('HGET', KEYS[1], '%(loaded)s') or '1'
+        redis.call('DEL', KEYS[1])
+        redis.call('HSET', KEYS[1], '%(loaded)s', loaded)
+    elseif op == 'merge' then
+        local guest = redis.call('HGETALL', KEYS[3])
+        for j = 1, #guest, 2 do
+            redis.call('HINCRBY', KEYS[1], guest[j], guest[j + 1])
+        end
+        redis.call('DEL', KEYS[3])
+    end
+end
+if redis.call('EXISTS', KEYS[1]) == 1 then
+    redis.call('EXPIRE', KEYS[1], ARGV[1])
+end
+if KEYS[2] then
+    redis.call('XADD', KEYS[2], 'MAXLEN', '~', ARGV[3], '*', 'user_id', ARGV[2])
+end
+return quantity
+""" % {"loaded": LOADED_FIELD}
+
+# KEYS: cart  ARGV: ttl, cart version, product, quantity, product, ...
+# Only fills a cold cart; a concurrent writer that loaded it first wins.
+LOAD_SCRIPT = """
+if redis.call('EXISTS', KEYS[1]) == 1 then
+    return 0
+end
+redis.call('HSET', KEYS[1], '%s', ARGV[2])
+for i = 3, #ARGV, 2 do
+    redis.call('HSET', KEYS[1], ARGV[i], ARGV[i + 1])
+end
+redis.call('EXPIRE', KEYS[1], ARGV[1])
+return 1
+""" % LOADED_FIELD
+
+
+def _outdated(raw: dict, version: int | None) -> bool:
+    # The hash was loaded before a write that went straight to Postgres.
+    return bool(raw) and version is not None and int(raw.get(LOADED_FIELD.encode(), 1)) < version
+
+
+def _parse(raw: dict) -> dict[UUID, int]:
+    return {
+        UUID(field.decode()): int(quantity)
+        for field, quantity in raw.items()
+        if field.decode() != LOADED_FIELD
+    }
+
+
+class CartStore:
+    def __init__(self, client=redis_client):
+        self.client = client
+        self._mutate = client.register_script(MUTATE_SCRIPT)
+        self._load = client.register_script(LOAD_SCRIPT)
+        # Users whose cart was written to Postgres while Redis was
+        # unreachable; their cached copy is dropped once Redis is back.
+        self._stale_users: set[UUID] = set()
+
+    async def mark_stale(self, session: AsyncSession, user_id: UUID):
+        # Called in the transaction of a write that bypassed Redis. This
+        # process drops its copy right away; every other one finds the
+        # bumped version through the flusher or checkout.
+        self._stale_users.add(user_id)
+        await session.exec(
+            update(Cart)  # type: ignore
+            .where(Cart.user_id == user_id)
+            .values(version=Cart.version + 1, redis_stale=True)
+        )
+
+    async def _drop_stale(self):
+        if self._stale_users:
+            stale = list(self._stale_users)
+            await self.client.delete(*(cart_key(user_id) for user_id in stale))
+            self._stale_users.difference_update(stale)
+
+    async def _load_from_db(self, session: AsyncSession, user_id: UUID):
+        result = await session.exec(
+            select(Cart.version, CartItem.product_id, CartItem.quantity)
+            .outerjoin(CartItem, CartItem.cart_id == Cart.cart_id)  # type: ignore
+            .where(Cart.user_id == user_id)
+        )
+        rows = result.all()
+        # A cart without a row gets the version its row will be created with.
+        args: list = [settings.CART_TTL_SECONDS, rows[0][0] if rows else 1]
+        for _, product_id, quantity in rows:
+            if product_id:
+                args.extend([str(product_id), quantity])
+        await self._load(keys=[cart_key(user_id)], args=args)
+
+    async def items(self, session: AsyncSession, user_id: UUID, version: int | None = None) -> dict[UUID, int]:
+        # Pass the cart version when the caller holds the cart row lock, so
+        # a hash older than the last direct Postgres write is reloaded.
+        await self._drop_stale()
+        raw = await self.client.hgetall(cart_key(user_id))
+        if _outdated(raw, version):
+            await self.client.delete(cart_key(user_id))
+            raw = {}
+        if not raw:
+            await self._load_from_db(session, user_id)
+            raw = await self.client.hgetall(cart_key(user_id))
+        return _parse(raw)
+
+    async def apply(
+        self, session: AsyncSession, user_id: UUID, operations: list[tuple], guest_id: UUID | None = None
+    ) -> int:
+        # operations: (op, product_id, quantity) with op in add/set/clear/merge
+        args: list = [settings.CART_TTL_SECONDS, str(user_id), settings.CART_JOURNAL_MAXLEN]
+        for op, product_id, quantity in operations:
+            args.extend([op, str(product_id or ""), quantity])
+        keys = [cart_key(user_id), JOURNAL_KEY]
+        if guest_id:
+            keys.append(guest_cart_key(guest_id))
+        await self._drop_stale()
+        result = await self._mutate(keys=keys, args=args)
+        if result == -1:
+            await self._load_from_db(session, user_id)
+            result = await self._mutate(keys=keys, args=args)
+        return int(result)
+
+    async def add(self, session: AsyncSession, user_id: UUID, product_id: UUID, quantity: int) -> int:
+        return await self.apply(session, user_id, [("add", product_id, quantity)])
+
+    async def set(self, session: AsyncSession, user_id: UUID, product_id: UUID, quantity: int) -> int:
+        return await self.apply(session, user_id, [("set", product_id, quantity)])
+
+    async def remove(self, session: AsyncSession, user_id: UUID, product_id: UUID) -> int:
+        return await self.apply(session, user_id, [("set", product_id, 0)])
+
+    async def clear(self, session: AsyncSession, user_id: UUID):
+        await self.apply(session, user_id, [("clear", None, 0)])
+
+    async def merge_guest(self, session: AsyncSession, user_id: UUID, guest_id: UUID):
+        # Adds the guest quantities to the user's cart and deletes the guest
+        # cart in the same script, so a retried login cannot merge twice.
+        await self.apply(session, user_id, [("merge", None, 0)], guest_id)
+
+    async def guest_items(self, guest_id: UUID) -> dict[UUID, int]:
+        return _parse(await self.client.hgetall(guest_cart_key(guest_id)))
+
+    async def guest_apply(self, guest_id: UUID, operations: list[tuple]) -> int:
+        args: list = [settings.CART_GUEST_TTL_SECONDS, "", 0]
+        for op, product_id, quantity in operations:
+            args.extend([op, str(product_id or ""), quantity])
+        return int(await self._mutate(keys=[guest_cart_key(guest_id)], args=args))
+
+async def lock_carts(session: AsyncSession, user_ids) -> dict[UUID, int]:
+    # Creates missing cart rows and row-locks all of them until the
+    # transaction ends. Writers take this lock before reading Redis, so a
+    # snapshot read earlier can never be written over a newer one. Sorted so
+    # concurrent writers (flushers, checkout) lock carts in the same order.
+    # Users deleted in the meantime are skipped; returns the version of
+    # every cart locked.
+    if not user_ids:
+        return {}
+    now = remove_timezone(datetime.now(timezone.utc))
+    cart_insert = insert(Cart).from_select(
+        ["cart_id", "user_id", "created_at", "updated_at"],
+        select(
+            func.gen_random_uuid(),
+            User.user_id,
+            literal(now, Cart.__table__.c.created_at.type),  # type: ignore
+            literal(now, Cart.__table__.c.updated_at.type),  # type: ignore
+        )
+        .where(
+            User.user_id == any_(
+                bindparam("user_ids", sorted(set(user_ids)), type_=ARRAY(PG_UUID(as_uuid=True)))
+            )
+        )
+        .order_by(User.user_id),
+    )
+    result = await session.exec(
+        cart_insert.on_conflict_do_update(  # type: ignore
+            index_elements=[Cart.user_id],
+            set_={"updated_at": cart_insert.excluded.updated_at},
+        ).returning(Cart.user_id, Cart.version)
+    )
+    return dict(result.all())
+
+
+async def write_snapshots(session: AsyncSession, snapshots: dict[UUID, dict[UUID, int]]):
+    # Idempotent: every cart is written as the absolute state it had in
+    # Redis, so replaying a batch twice leaves the same rows behind. Callers
+    # should hold lock_carts for these users from before the Redis read.
+    if not snapshots:
+        return
+    now = remove_timezone(datetime.now(timezone.utc))
+    user_ids = sorted(snapshots)
+    await lock_carts(session, user_ids)
+
+    rows = [
+        (user_id, product_id, quantity)
+        for user_id in user_ids
+        for product_id, quantity in snapshots[user_id].items()
+    ]
+    snapshot = None
+    if rows:
+        snapshot = values(
+            column("user_id", PG_UUID(as_uuid=True)),
+            column("product_id", PG_UUID(as_uuid=True)),
+            column("quantity", Integer),
+            name="snapshot",
+        ).data(rows)
+        # Joining product drops lines for products deleted in the meantime.
+        item_insert = insert(CartItem).from_select(
+            ["cart_item_id", "cart_id", "product_id", "quantity", "updated_at"],
+            select(
+                func.gen_random_uuid(),
+                Cart.cart_id,
+                snapshot.c.product_id,
+                snapshot.c.quantity,
+                literal(now, CartItem.__table__.c.updated_at.type),  # type: ignore
+            )
+            .select_from(snapshot)
+            .join(Cart, Cart.user_id == snapshot.c.user_id)  # type: ignore
+            .join(Product, Product.product_id == snapshot.c.product_id),  # type: ignore
+        )
+        await session.exec(
+            item_insert.on_conflict_do_update(  # type: ignore
+                constraint="uq_cartitem_cart_id_product_id",
+                set_={
+                    "quantity": item_insert.excluded.quantity,
+                    "updated_at": item_insert.excluded.updated_at,
+                },
+            )
+        )
+
+    stale = delete(CartItem).where(
+        CartItem.cart_id == Cart.cart_id,
+        Cart.user_id.in_(user_ids),  # type: ignore
+    )
+    if snapshot is not None:
+        stale = stale.where(
+            ~exists().where(
+                snapshot.c.user_id == Cart.user_id,
+                snapshot.c.product_id == CartItem.product_id,
+            )
+        )
+    await session.exec(stale)  # type: ignore
+
+
+async def _ensure_group(client):
+    try:
+        await client.xgroup_create(JOURNAL_KEY, FLUSH_GROUP, id="0", mkstream=True)
+    except ResponseError as e:
+        if "BUSYGROUP" not in str(e):
+            raise
+
+
+async def _clear_stale(session: AsyncSession, user_ids: list):
+    if user_ids:
+        await session.exec(
+            update(Cart)  # type: ignore
+            .where(Cart.user_id.in_(user_ids), Cart.redis_stale)  # type: ignore
+            .values(redis_stale=False)
+        )
+
+
+async def drop_outdated_carts(client, session_factory) -> int:
+    # Carts written straight to Postgres while Redis was down may still have
+    # their older hash in Redis, served by workers that never saw the
+    # outage; drop those so the next read loads from Postgres.
+    dropped = 0
+    while True:
+        async with session_factory() as session:
+            result = await session.exec(
+                select(Cart.user_id, Cart.version)
+                .where(Cart.redis_stale)
+                .order_by(Cart.user_id)
+                .limit(settings.CART_FLUSH_BATCH_SIZE)
+                .with_for_update(skip_locked=True)
+            )
+            rows = result.all()
+            if not rows:
+                return dropped
+            async with client.pipeline(transaction=False) as pipe:
+                for user_id, _ in rows:
+                    pipe.hget(cart_key(user_id), LOADED_FIELD)
+                loaded = await pipe.execute()
+            outdated = [
+                user_id
+                for (user_id, version), seen in zip(rows, loaded)
+                if seen is not None and int(seen) < version
+            ]
+            if outdated:
+                await client.delete(*(cart_key(user_id) for user_id in outdated))
+            await _clear_stale(session, [user_id for user_id, _ in rows])
+            await session.commit()
+        dropped += len(outdated)
+        if len(rows) < settings.CART_FLUSH_BATCH_SIZE:
+            return dropped
+
+
+async def flush_journal(client, session_factory, consumer: str) -> dict:
+    await _ensure_group(client)
+    dropped = await drop_outdated_carts(client, session_factory)
+    flushed = 0
+    replayed = 0
+    entries_seen = 0
+    while True:
+        # Entries a dead flusher read but never acknowledged come first.
+        # XAUTOCLAIM needs Redis >= 6.2; 7.0 appends a third element with
+        # deleted ids, so only the claimed entries are picked out.
+        claimed = (
+            await client.xautoclaim(
+                JOURNAL_KEY,
+                FLUSH_GROUP,
+                consumer,
+                min_idle_time=settings.CART_FLUSH_CLAIM_IDLE_MS,
+                start_id="0-0",
+                count=settings.CART_FLUSH_BATCH_SIZE,
+            )
+        )[1]
+        entries = [entry for entry in claimed if entry and entry[1]]
+        replayed += len(entries)
+        if not entries:
+            response = await client.xreadgroup(
+                FLUSH_GROUP,
+                consumer,
+                {JOURNAL_KEY: ">"},
+                count=settings.CART_FLUSH_BATCH_SIZE,
+            )
+            entries = response[0][1] if response else []
+        if not entries:
+            break
+        entries_seen += len(entries)
+
+        user_ids = sorted({UUID(fields[b"user_id"].decode()) for _, fields in entries})
+        async with session_factory() as session:
+            # Lock first so a concurrent flusher or checkout holding these
+            # carts finishes before the hashes are read.
+            present = await lock_carts(session, user_ids)
+            live = [user_id for user_id in user_ids if user_id in present]
+            async with client.pipeline(transaction=False) as pipe:
+                for user_id in live:
+                    pipe.hgetall(cart_key(user_id))
+                carts = await pipe.execute()
+            # A missing key means the cart expired or was dropped in favour
+            # of Postgres; there is nothing newer to write. Neither is there
+            # in a hash loaded before a direct Postgres write.
+            outdated = [
+                user_id for user_id, raw in zip(live, carts) if _outdated(raw, present[user_id])
+            ]
+            if outdated:
+                await client.delete(*(cart_key(user_id) for user_id in outdated))
+            snapshots = {
+                user_id: _parse(raw)
+                for user_id, raw in zip(live, carts)
+                if raw and user_id not in outdated
+            }
+            await write_snapshots(session, snapshots)
+            await _clear_stale(session, live)
+            await session.commit()
+        await client.xack(JOURNAL_KEY, FLUSH_GROUP, *(entry_id for entry_id, _ in entries))
+        # Entries and carts of deleted users would otherwise be replayed
+        # forever.
+        gone = {user_id for user_id in user_ids if user_id not in present}
+        if gone:
+            await client.xdel(
+                JOURNAL_KEY,
+                *(
+                    entry_id
+                    for entry_id, fields in entries
+                    if UUID(fields[b"user_id"].decode()) in gone
+                ),
+            )
+            await client.delete(*(cart_key(user_id) for user_id in gone))
+        flushed += len(snapshots)
+    return {
+        "entries": entries_seen,
+        "replayed": replayed,
+        "carts_flushed": flushed,
+        "outdated_dropped": dropped,
+    }
+
+
+async def run_cart_flush():
+    client = red_db.from_url(settings.REDIS_URL)
+    worker_engine, session_factory = worker_session_factory()
+    try:
+        return await flush_journal(
+            client, session_factory, f"{socket.gethostname()}-{os.getpid()}"
+        )
+    finally:
+        await worker_engine.dispose()
+        await client.aclose()
+
+
+cart_store = CartStore()
@@ -1,16 +1,22 @@
-from fastapi import APIRouter, Depends
+from fastapi import APIRouter, Depends, Header, Query
 from sqlmodel.ext.asyncio.session import AsyncSession
 from db.session import get_session
+from db.models import User, UserRole
+from auth.dependencies import RoleChecker
 from categories.services import CategoryService
-from categories.schemas import CategoryCreate, CategoryResponse
+from categories.schemas import CategoryCreate, CategoryResponse, CategoryUpdate
+from products.services import ProductService
+from typing import Literal, Optional
+import uuid
 
 
 Category_router = APIRouter(prefix="/categories", tags=["Categories"])
 category_services= CategoryService()
+product_services = ProductService()
 
 @Category_router.get("/")
-async def get_all_categories():
-    pass
+async def get_all_categories(if_none_match: Optional[str] = Header(None)):
+    return await category_services.get_category_tree(if_none_match)
 
 
 @Category_router.post("/" , response_model=CategoryResponse)
@@ -18,6 +24,30 @@ async def create_category(category_data:CategoryCreate, session:AsyncSession= De
     new_category = await category_services.create_category(session, category_data)
     return new_category
 
+
+@Category_router.patch("/{category_id}", response_model=CategoryResponse)
+async def update_category(
+    category_id: uuid.UUID,
+    category_data: CategoryUpdate,
+    session: AsyncSession = Depends(get_session),
+    _: User = Depends(RoleChecker([UserRole.admin])),
+):
+    return await category_services.update_category(session, category_id, category_data)
+
+
+@Category_router.get("/{category_id}/products", response_model=dict)
+async def get_category_products(
+    category_id: uuid.UUID,
+    session: AsyncSession = Depends(get_session),
+    limit: int = Query(20, ge=1, le=100),
+    cursor: Optional[str] = None,
+    image_size: Literal["thumb", "card", "detail", "original"] = "card",
+):
+    return await product_services.get_category_products(
+        session, category_id, limit=limit, cursor=cursor, image_size=image_size
+    )
+
+
 @Category_router.get("/{category_id}")
-async def get_category(categoty_id):
-    pass
\ No newline at end of file
+async def get_category(category_id: uuid.UUID, if_none_match: Optional[str] = Header(None)):
+    return await category_services.get_category(category_id, if_none_match)
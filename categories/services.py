@@ -1,19 +1,76 @@
+from datetime import datetime, timezone
+from uuid import UUID
 from fastapi import HTTPException, status
-from db.models import Category
-from categories.schemas import CategoryCreate
+from sqlalchemy.exc import IntegrityError
+from db.models import Category, remove_timezone
+from categories.schemas import CategoryCreate, CategoryUpdate
+from categories.tree import category_tree, etag_response
 from sqlmodel.ext.asyncio.session import AsyncSession
+from products.cache import search_cache
+from products.suggest import CATEGORY, suggestion_index
 
 
 class CategoryService:
+    async def get_category_tree(self, if_none_match: str | None = None):
+        try:
+            snapshot = await category_tree.get()
+        except Exception as e:
+            raise HTTPException(status_code=status.HTTP_500_INTERNAL_SERVER_ERROR, detail=f"FAILED TO FETCH CATEGORIES: {str(e)}")
+        return etag_response(snapshot.body, snapshot.etag, if_none_match)
+
+    async def get_category(self, category_id: UUID, if_none_match: str | None = None):
+        try:
+            snapshot = await category_tree.get()
+        except Exception as e:
+            raise HTTPException(status_code=status.HTTP_500_INTERNAL_SERVER_ERROR, detail=f"FAILED TO FETCH CATEGORY: {str(e)}")
+        node = snapshot.node(str(category_id))
+        if not node:
+            raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Category not found")
+        body, etag = node
+        return etag_response(body, etag, if_none_match)
+
     async def create_category(self, session:AsyncSession, category_data:CategoryCreate):
         try:
             category_data_dict= category_data.model_dump()
             new_category= Category(**category_data_dict)
             session.add(new_category)
             await session.commit()
+            suggestion_index.add(new_category.category_name, CATEGORY)
+            category_tree.mark_stale()
+            await search_cache.invalidate()
             return new_category
         except Exception as e:
             await session.rollback()
             raise HTTPException(status_code=status.HTTP_500_INTERNAL_SERVER_ERROR, detail={"Failed to create category."})
 
+    async def update_category(self, session: AsyncSession, category_id: UUID, category_data: CategoryUpdate):
+        category = await session.get(Category, category_id)
+        if not category:
+            raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Category not found")
+
+        # The closure table follows parent changes through a trigger, which
+        # also rejects moving a category below its own subtree.
+        previous_name = category.category_name
+        update_data = category_data.model_dump(exclude_unset=True)
+        if update_data.get("name"):
+            category.category_name = update_data["name"]
+        if "parent_category_id" in update_data:
+            if update_data["parent_category_id"] == category_id:
+                raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="A category cannot be its own parent")
+            category.parent_category_id = update_data["parent_category_id"]
+        category.updated_at = remove_timezone(datetime.now(timezone.utc))
+        try:
+            await session.commit()
+        except IntegrityError as e:
+            await session.rollback()
+            raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=f"Invalid category move: {str(e.orig)}")
+        except Exception as e:
+            await session.rollback()
+            raise HTTPException(status_code=status.HTTP_500_INTERNAL_SERVER_ERROR, detail=f"FAILED TO UPDATE CATEGORY: {str(e)}")
 
+        category_tree.mark_stale()
+        if category.category_name != previous_name:
+            suggestion_index.remove(previous_name, CATEGORY)
+            suggestion_index.add(category.category_name, CATEGORY)
+            await search_cache.invalidate()
+        return category
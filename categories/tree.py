@@ -0,0 +1,164 @@
+import asyncio
+import hashlib
+import json
+import logging
+import time
+
+import asyncpg
+from fastapi import Response, status
+from sqlmodel import select
+
+from config import settings
+from db.models import Category
+from db.session import AsyncSessionLocal
+
+logger = logging.getLogger(__name__)
+
+CHANNEL = "category_tree"
+
+
+def _etag(body: bytes) -> str:
+    return f'"{hashlib.sha1(body).hexdigest()}"'
+
+
+def _dumps(payload) -> bytes:
+    return json.dumps(payload, separators=(",", ":")).encode()
+
+
+class CategoryTreeSnapshot:
+    def __init__(self, rows):
+        nodes = {
+            str(category_id): {
+                "category_id": str(category_id),
+                "category_name": name,
+                "parent_category_id": str(parent_id) if parent_id else None,
+                "image_url": image_url,
+                "product_count": product_count,
+                "subtree_product_count": product_count,
+                "children": [],
+            }
+            for category_id, name, parent_id, image_url, product_count in rows
+        }
+        roots = []
+        for node in sorted(nodes.values(), key=lambda node: node["category_name"].lower()):
+            parent = nodes.get(node["parent_category_id"] or "")
+            (parent["children"] if parent else roots).append(node)
+
+        # Post-order walk without recursion so deep trees are fine.
+        order = []
+        stack = list(roots)
+        while stack:
+            node = stack.pop()
+            order.append(node)
+            stack.extend(node["children"])
+        for node in reversed(order):
+            parent = nodes.get(node["parent_category_id"] or "")
+            if parent:
+                parent["subtree_product_count"] += node["subtree_product_count"]
+
+        self.nodes = nodes
+        self.body = _dumps({"categories": roots, "total": len(nodes)})
+        self.etag = _etag(self.body)
+        self._node_bodies: dict[str, tuple[bytes, str]] = {}
+
+    def ancestors(self, category_id: str) -> list[dict]:
+        path = []
+        node = self.nodes.get(category_id)
+        while node and node["parent_category_id"] and len(path) < len(self.nodes):
+            node = self.nodes.get(node["parent_category_id"])
+            if node:
+                path.append(
+                    {"category_id": node["category_id"], "category_name": node["category_name"]}
+                )
+        return list(reversed(path))
+
+    def node(self, category_id: str) -> tuple[bytes, str] | None:
+        if category_id not in self.nodes:
+            return None
+        if category_id not in self._node_bodies:
+            body = _dumps({**self.nodes[category_id], "ancestors": self.ancestors(category_id)})
+            self._node_bodies[category_id] = (body, _etag(body))
+        return self._node_bodies[category_id]
+
+
+class CategoryTreeCache:
+    # Per-process snapshot of the whole tree. Postgres NOTIFY on
+    # category/productcategory changes marks it stale; the next request
+    # rebuilds it once while concurrent requests wait for that rebuild. The
+    # max age bounds staleness if the listener connection is lost.
+    def __init__(self, session_factory=AsyncSessionLocal):
+        self.session_factory = session_factory
+        self._snapshot: CategoryTreeSnapshot | None = None
+        self._built_at = 0.0
+        self._stale = True
+        self._lock = asyncio.Lock()
+        self._connection = None
+
+    def mark_stale(self, *_):
+        self._stale = True
+
+    def _fresh(self) -> bool:
+        return (
+            self._snapshot is not None
+            and not self._stale
+            and time.monotonic() - self._built_at < settings.CATEGORY_TREE_MAX_AGE_SECONDS
+        )
+
+    async def get(self) -> CategoryTreeSnapshot:
+        if self._fresh():
+            return self._snapshot  # type: ignore
+        async with self._lock:
+            if not self._fresh():
+                # Cleared before reading, so a notification that arrives
+                # during the rebuild triggers another one.
+                self._stale = False
+                try:
+                    self._snapshot = await self._build()
+                except Exception:
+                    self._stale = True
+                    raise
+                self._built_at = time.monotonic()
+        return self._snapshot  # type: ignore
+
+    async def _build(self) -> CategoryTreeSnapshot:
+        async with self.session_factory() as session:
+            result = await session.exec(
+                select(
+                    Category.category_id,
+                    Category.category_name,
+                    Category.parent_category_id,
+                    Category.image_url,
+                    Category.product_count,
+                )
+            )
+            rows = result.all()
+        return await asyncio.to_thread(CategoryTreeSnapshot, rows)
+
+    async def start_listener(self):
+        dsn = settings.DATABASE_URL.replace("postgresql+asyncpg://", "postgresql://")
+        try:
+            self._connection = await asyncpg.connect(dsn)
+            await self._connection.add_listener(CHANNEL, self.mark_stale)
+            self._connection.add_termination_listener(self._on_disconnect)
+        except Exception as e:
+            self._connection = None
+            logger.warning("Category tree listener unavailable, using max age only: %s", e)
+
+    def _on_disconnect(self, *_):
+        self._connection = None
+        self.mark_stale()
+
+    async def stop_listener(self):
+        if self._connection is not None:
+            connection, self._connection = self._connection, None
+            await connection.close()
+
+
+def etag_response(body: bytes, etag: str, if_none_match: str | None) -> Response:
+    headers = {"ETag": etag, "Cache-Control": "no-cache"}
+    if if_none_match and etag in [tag.strip().removeprefix("W/") for tag in if_none_match.split(",")]:
+        return Response(status_code=status.HTTP_304_NOT_MODIFIED, headers=headers)
+    return Response(content=body, media_type="application/json", headers=headers)
+
+
+category_tree = CategoryTreeCache()
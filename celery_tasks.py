@@ -2,6 +2,13 @@ from celery import Celery
 from pydantic import EmailStr
 from asgiref.sync import async_to_sync
 from utils.mail import send_email
+from products.imports import run_import_job
+from products.media_gc import collect
+from products.stock import run_stock_expiry
+from cart.store import run_cart_flush
+from orders.outbox import run_outbox_relay
+from services.notifications import run_outbox_handlers
+from products.variants import generate_product_variants, record_image_variants
 from config import settings
 
 
@@ -32,3 +39,66 @@ def send_password_reset_email(email: EmailStr, token: str):
         template_name="reset_password.html",
         template_data={"verification_url": verification_url},
     )
+
+
+@celery.task
+def import_products_file(job_id: str, path: str, file_format: str, vendor_id: str):
+    async_to_sync(run_import_job)(job_id, path, file_format, vendor_id)
+
+
+@celery.task
+def generate_image_variants(product_id: str, image_urls: list[str]):
+    # Resizing runs here in the worker process pool, never in the API.
+    variants, errors = generate_product_variants(image_urls)
+    async_to_sync(record_image_variants)(product_id, variants)
+    return {"generated": sorted(variants), "errors": errors}
+
+
+@celery.task
+def collect_orphan_images(full: bool = False, dry_run: bool = False):
+    return async_to_sync(collect)(full=full, dry_run=dry_run)
+
+
+@celery.task
+def expire_stock_reservations():
+    return async_to_sync(run_stock_expiry)()
+
+
+@celery.task
+def flush_cart_journal():
+    return async_to_sync(run_cart_flush)()
+
+
+@celery.task
+def relay_outbox():
+    return async_to_sync(run_outbox_relay)(handle_outbox_events.delay)
+
+
+@celery.task
+def handle_outbox_events(events: list[dict]):
+    return async_to_sync(run_outbox_handlers)(events)
+
+
+celery.conf.beat_schedule = {
+    "collect-orphan-images": {
+        "task": collect_orphan_images.name,
+        "schedule": settings.MEDIA_GC_INTERVAL_SECONDS,
+    },
+    "sweep-orphan-images": {
+        "task": collect_orphan_images.name,
+        "schedule": settings.MEDIA_GC_SWEEP_INTERVAL_SECONDS,
+        "kwargs": {"full": True},
+    },
+    "expire-stock-reservations": {
+        "task": expire_stock_reservations.name,
+        "schedule": settings.STOCK_EXPIRY_INTERVAL_SECONDS,
+    },
+    "flush-cart-journal": {
+        "task": flush_cart_journal.name,
+        "schedule": settings.CART_FLUSH_INTERVAL_SECONDS,
+    },
+    "relay-outbox": {
+        "task": relay_outbox.name,
+        "schedule": settings.OUTBOX_RELAY_INTERVAL_SECONDS,
+    },
+}
@@ -17,6 +17,40 @@ class Settings(BaseSettings):
     REDIS_URL: str = os.getenv("REDIS_URL", "redis://127.0.0.1:6379/0")
     DATABASE_URL: str = os.getenv("DATABASE_URL", "sqlite:///./test.db")
 
+    SEARCH_SIMILARITY_THRESHOLD: float = 0.3
+    SEARCH_CACHE_TTL_SECONDS: int = 60
+    SEARCH_CACHE_MAX_ENTRIES: int = 10_000
+    SEARCH_CACHE_MAX_ENTRY_BYTES: int = 256 * 1024
+    SUGGEST_REFRESH_SECONDS: int = 30
+    SUGGEST_MAX_AGE_SECONDS: int = 600
+    BULK_IMPORT_CHUNK_SIZE: int = 500
+    IMPORT_DIR: str = os.getenv("IMPORT_DIR", "uploads/imports")
+    IMPORT_MAX_ERRORS: int = 1000
+    IMPORT_JOB_TTL_SECONDS: int = 7 * 24 * 3600
+    EXPORT_BATCH_SIZE: int = 1000
+    MAX_IMAGE_UPLOAD_BYTES: int = 10 * 1024 * 1024
+    IMAGE_UPLOAD_CONCURRENCY: int = 4
+    MEDIA_GC_GRACE_SECONDS: int = 3600
+    MEDIA_GC_BATCH_SIZE: int = 1000
+    MEDIA_GC_INTERVAL_SECONDS: int = 15 * 60
+    MEDIA_GC_SWEEP_INTERVAL_SECONDS: int = 24 * 3600
+    CATEGORY_TREE_MAX_AGE_SECONDS: int = 300
+    STOCK_RESERVATION_TTL_SECONDS: int = 10 * 60
+    STOCK_RESERVATION_MAX_PER_USER: int = 20
+    STOCK_HOT_ALLOCATION: int = 50
+    STOCK_EXPIRY_BATCH_SIZE: int = 1000
+    STOCK_EXPIRY_INTERVAL_SECONDS: int = 60
+    CART_TTL_SECONDS: int = 7 * 24 * 3600
+    CART_JOURNAL_MAXLEN: int = 1_000_000
+    CART_FLUSH_BATCH_SIZE: int = 500
+    CART_FLUSH_INTERVAL_SECONDS: int = 5
+    CART_FLUSH_CLAIM_IDLE_MS: int = 60_000
+    CART_GUEST_TTL_SECONDS: int = 14 * 24 * 3600
+    OUTBOX_BATCH_SIZE: int = 500
+    OUTBOX_RELAY_INTERVAL_SECONDS: int = 2
+    OUTBOX_REDELIVER_SECONDS: int = 300
+    LOW_STOCK_THRESHOLD: int = 5
+
     MAIL_USERNAME: str = os.getenv("MAIL_USERNAME", "")
     MAIL_PASSWORD: SecretStr = SecretStr(os.getenv("MAIL_PASSWORD", ""))
     MAIL_FROM: str = os.getenv("MAIL_FROM", "")
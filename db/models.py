@@ -1,7 +1,7 @@
 import uuid
 from sqlmodel import SQLModel, Field, Relationship, JSON
-from typing import Optional, List
-from sqlalchemy import Column, ForeignKey
+from typing import Dict, Optional, List
+from sqlalchemy import BigInteger, Column, ForeignKey, Index, UniqueConstraint, text
 from sqlalchemy.dialects.postgresql import TSVECTOR, UUID
 from datetime import datetime, timezone
 from enum import Enum
@@ -29,6 +29,8 @@ class UserBase(SQLModel):
 
 
 class User(UserBase, table=True):
+    __table_args__ = (Index("ix_user_created_at_user_id", "created_at", "user_id"),)
+
     user_id: uuid.UUID = Field(default_factory=uuid.uuid4, primary_key=True)
     role: UserRole = Field(default=UserRole.user)
     is_verified: bool = Field(default=False)
@@ -88,6 +90,17 @@ class ProductBase(SQLModel):
 
 
 class Product(ProductBase, table=True):
+    __table_args__ = (
+        Index("ix_product_created_at_product_id", "created_at", "product_id"),
+        Index("ix_product_search_tsv", "search_tsv", postgresql_using="gin"),
+        Index(
+            "ix_product_name_trgm",
+            "name",
+            postgresql_using="gin",
+            postgresql_ops={"name": "gin_trgm_ops"},
+        ),
+    )
+
     product_id: uuid.UUID = Field(default_factory=uuid.uuid4, primary_key=True)
     vendor_id: uuid.UUID = Field(foreign_key="user.user_id", nullable=False)
     created_at: datetime = Field(
@@ -97,7 +110,13 @@ class Product(ProductBase, table=True):
         default_factory=lambda: remove_timezone(datetime.now(timezone.utc))
     )
     image_urls: Optional[List[str]] = Field(default=[], sa_column=Column(JSON))
+    # original url -> size -> format -> variant url, filled in by the worker
+    image_variants: Optional[Dict[str, Dict[str, Dict[str, str]]]] = Field(
+        default={}, sa_column=Column(JSON)
+    )
     name_tsv: str = Field(sa_column=Column(TSVECTOR, index=True))
+    # weighted name (A), category names (B) and description (C), trigger maintained
+    search_tsv: str = Field(sa_column=Column(TSVECTOR))
 
     categories: List["Category"] = Relationship(
         back_populates="products",
@@ -121,6 +140,51 @@ class Product(ProductBase, table=True):
     )
 
 
+# ------------------- Stock Reservation ---------------------#
+class ReservationStatus(str, Enum):
+    active = "active"
+    committed = "committed"
+    released = "released"
+    expired = "expired"
+
+
+class StockReservation(SQLModel, table=True):
+    __table_args__ = (
+        Index(
+            "ix_stockreservation_active_expires_at",
+            "expires_at",
+            postgresql_where=text("status = 'active'"),
+        ),
+        Index(
+            "ix_stockreservation_active_user_id",
+            "user_id",
+            postgresql_where=text("status = 'active'"),
+        ),
+    )
+
+    reservation_id: uuid.UUID = Field(default_factory=uuid.uuid4, primary_key=True)
+    product_id: uuid.UUID = Field(
+        sa_column=Column(
+            UUID(as_uuid=True),
+            ForeignKey("product.product_id", ondelete="CASCADE"),
+            nullable=False,
+            index=True,
+        )
+    )
+    user_id: Optional[uuid.UUID] = Field(
+        default=None, foreign_key="user.user_id", nullable=True
+    )
+    quantity: int = Field(ge=1)
+    status: ReservationStatus = Field(default=ReservationStatus.active)
+    expires_at: datetime
+    created_at: datetime = Field(
+        default_factory=lambda: remove_timezone(datetime.now(timezone.utc))
+    )
+    updated_at: datetime = Field(
+        default_factory=lambda: remove_timezone(datetime.now(timezone.utc))
+    )
+
+
 # ------------------- Order ---------------------#
 class OrderStatus(str, Enum):
     pending = "pending"
@@ -135,10 +199,26 @@ class OrderBase(SQLModel):
 
 
 class Order(OrderBase, table=True):
+    __table_args__ = (
+        UniqueConstraint(
+            "user_id", "idempotency_key", name="uq_order_user_id_idempotency_key"
+        ),
+        # Order history pages are index-only scans, read backwards.
+        Index(
+            "ix_order_user_id_created_at_order_id",
+            "user_id",
+            "created_at",
+            "order_id",
+            postgresql_include=["status", "total"],
+        ),
+    )
+
     order_id: uuid.UUID = Field(default_factory=uuid.uuid4, primary_key=True)
     user_id: Optional[uuid.UUID] = Field(
-        foreign_key="user.user_id", index=True, nullable=True
+        foreign_key="user.user_id", nullable=True
     )
+    # Client supplied Idempotency-Key of the checkout that created the order
+    idempotency_key: Optional[str] = Field(default=None, max_length=255)
     created_at: datetime = Field(
         default_factory=lambda: remove_timezone(datetime.now(timezone.utc))
     )
@@ -196,8 +276,18 @@ class Review(ReviewBase, table=True):
 
 # ---------------- Cart ---------------------#
 class Cart(SQLModel, table=True):
+    __table_args__ = (
+        Index("ix_cart_redis_stale", "user_id", postgresql_where=text("redis_stale")),
+    )
+
     cart_id: uuid.UUID = Field(default_factory=uuid.uuid4, primary_key=True)
-    user_id: uuid.UUID = Field(foreign_key="user.user_id", index=True)
+    user_id: uuid.UUID = Field(foreign_key="user.user_id", index=True, unique=True)
+    # Bumped by every write that bypasses Redis. The live hash remembers the
+    # version it was loaded at, so an older hash is dropped, never flushed;
+    # redis_stale marks carts whose hash still has to be checked. Starts at
+    # 1, the value hashes loaded before versions existed carry.
+    version: int = 1
+    redis_stale: bool = False
     created_at: datetime = Field(
         default_factory=lambda: remove_timezone(datetime.now(timezone.utc))
     )
@@ -213,8 +303,13 @@ class Cart(SQLModel, table=True):
 
 # ---------------- CartItem ---------------------#
 class CartItem(SQLModel, table=True):
+    # Also serves lookups by cart_id, so there is no separate cart_id index.
+    __table_args__ = (
+        UniqueConstraint("cart_id", "product_id", name="uq_cartitem_cart_id_product_id"),
+    )
+
     cart_item_id: uuid.UUID = Field(default_factory=uuid.uuid4, primary_key=True)
-    cart_id: uuid.UUID = Field(foreign_key="cart.cart_id", index=True)
+    cart_id: uuid.UUID = Field(foreign_key="cart.cart_id")
     product_id: uuid.UUID = Field(foreign_key="product.product_id", index=True)
     quantity: int = Field(default=1, ge=1)
     updated_at: datetime = Field(
@@ -251,6 +346,36 @@ class Payment(PaymentBase, table=True):
     order: Optional["Order"] = Relationship(back_populates="payment")
 
 
+# ------------------ Outbox ------------------------#
+class OutboxEvent(SQLModel, table=True):
+    # Written in the same transaction as the change it describes; the relay
+    # hands undelivered events to Celery, oldest first and grouped per
+    # aggregate, and the handlers set processed_at.
+    __table_args__ = (
+        Index(
+            "ix_outboxevent_unprocessed_event_id",
+            "event_id",
+            postgresql_where=text("processed_at IS NULL"),
+        ),
+        Index("ix_outboxevent_aggregate_id_event_id", "aggregate_id", "event_id"),
+    )
+
+    event_id: Optional[int] = Field(
+        default=None, sa_column=Column(BigInteger, primary_key=True, autoincrement=True)
+    )
+    aggregate_type: str
+    aggregate_id: uuid.UUID
+    event_type: str
+    payload: Dict = Field(default={}, sa_column=Column(JSON, nullable=False))
+    created_at: datetime = Field(
+        default_factory=lambda: remove_timezone(datetime.now(timezone.utc))
+    )
+    dispatched_at: Optional[datetime] = None
+    processed_at: Optional[datetime] = None
+    attempts: int = 0
+    last_error: Optional[str] = None
+
+
 # ------------------ Categories------------------------#
 class CategoryBase(SQLModel):
     category_name: str
@@ -260,6 +385,15 @@ class CategoryBase(SQLModel):
 
 
 class Category(CategoryBase, table=True):
+    __table_args__ = (
+        Index(
+            "ix_category_category_name_trgm",
+            "category_name",
+            postgresql_using="gin",
+            postgresql_ops={"category_name": "gin_trgm_ops"},
+        ),
+    )
+
     category_id: uuid.UUID = Field(default_factory=uuid.uuid4, primary_key=True)
     image_url: Optional[str] = None
 
@@ -270,7 +404,34 @@ class Category(CategoryBase, table=True):
         default_factory=lambda: remove_timezone(datetime.now(timezone.utc))
     )
     name_tsv: str = Field(sa_column=Column(TSVECTOR, index=True))
+    # products linked directly to this category, trigger maintained
+    product_count: int = Field(default=0)
 
     products: List["Product"] = Relationship(
         back_populates="categories", link_model=ProductCategory
     )
+
+
+# ------------------- Category Closure ---------------------#
+class CategoryClosure(SQLModel, table=True):
+    # One row per (ancestor, descendant) pair including each category with
+    # itself at depth 0; maintained by triggers on category.
+    __table_args__ = (
+        Index("ix_categoryclosure_descendant_id", "descendant_id", "depth"),
+    )
+
+    ancestor_id: uuid.UUID = Field(
+        sa_column=Column(
+            UUID(as_uuid=True),
+            ForeignKey("category.category_id", ondelete="CASCADE"),
+            primary_key=True,
+        )
+    )
+    descendant_id: uuid.UUID = Field(
+        sa_column=Column(
+            UUID(as_uuid=True),
+            ForeignKey("category.category_id", ondelete="CASCADE"),
+            primary_key=True,
+        )
+    )
+    depth: int = Field(default=0)
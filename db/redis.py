@@ -3,7 +3,8 @@ from config import settings
 
 
 
-token_blocklist = red_db.from_url(settings.REDIS_URL)
+redis_client = red_db.from_url(settings.REDIS_URL)
+token_blocklist = redis_client
 
 
 async def add_jti_to_blocklist(jti: str):
@@ -1,4 +1,5 @@
 from sqlalchemy.ext.asyncio import create_async_engine, async_sessionmaker
+from sqlalchemy.pool import NullPool
 from sqlmodel.ext.asyncio.session import AsyncSession
 from config import settings
 
@@ -17,3 +18,12 @@ AsyncSessionLocal = async_sessionmaker(
 async def get_session():
     async with AsyncSessionLocal() as session:
         yield session
+
+
+def worker_session_factory():
+    # Celery tasks run each job on a fresh event loop, so they get their own
+    # unpooled engine instead of sharing connections bound to another loop.
+    worker_engine = create_async_engine(DATABASE_URL, poolclass=NullPool)
+    return worker_engine, async_sessionmaker(
+        bind=worker_engine, class_=AsyncSession, expire_on_commit=False
+    )
@@ -1,25 +1,36 @@
+from contextlib import asynccontextmanager
+
 from fastapi import FastAPI
-from fastapi.staticfiles import StaticFiles
 from fastapi.openapi.utils import get_openapi
 
 from products.routes import Product_router
 from auth.routes import Auth_router
 from cart.routes import Cart_router
 from categories.routes import Category_router
+from categories.tree import category_tree
 from orders.routes import Order_router
 from payment.routes import Payment_router
 from review.routes import Review_router
 from user.routes import User_router
+from utils.media import MediaFiles
 
 
 version = "v1"
 
 
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    await category_tree.start_listener()
+    yield
+    await category_tree.stop_listener()
+
+
 app = FastAPI(
     title="KiranaKart",
     description=" E-commerce practice project",
     version=version,
-    openapi_url="/openapi.json"
+    openapi_url="/openapi.json",
+    lifespan=lifespan,
 )
 
 def custom_openapi():
@@ -38,7 +49,7 @@ def custom_openapi():
 app.openapi = custom_openapi
 
 
-app.mount("/static", StaticFiles(directory="static"), name="static")
+app.mount("/static", MediaFiles(directory="static"), name="static")
 app.include_router(Product_router)
 app.include_router(Auth_router)
 app.include_router(Cart_router)
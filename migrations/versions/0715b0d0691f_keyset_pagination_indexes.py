@@ -0,0 +1,30 @@
+"""keyset pagination indexes
+
+Revision ID: 0715b0d0691f
+Revises: 829e4635ef5a
+Create Date: 2026-10-18 16:10:00.397791
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '0715b0d0691f'
+down_revision: Union[str, None] = '829e4635ef5a'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_index('ix_product_created_at_product_id', 'product', ['created_at', 'product_id'], unique=False)
+    op.create_index('ix_user_created_at_user_id', 'user', ['created_at', 'user_id'], unique=False)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index('ix_user_created_at_user_id', table_name='user')
+    op.drop_index('ix_product_created_at_product_id', table_name='product')
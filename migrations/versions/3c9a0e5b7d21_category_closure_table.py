@@ -0,0 +1,109 @@
+"""category closure table
+
+Revision ID: 3c9a0e5b7d21
+Revises: b41d7e29c6a3
+Create Date: 2026-10-18 17:31:09.640127
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+
+# revision identifiers, used by Alembic.
+revision: str = '3c9a0e5b7d21'
+down_revision: Union[str, None] = 'b41d7e29c6a3'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_table(
+        'categoryclosure',
+        sa.Column('ancestor_id', postgresql.UUID(as_uuid=True), nullable=False),
+        sa.Column('descendant_id', postgresql.UUID(as_uuid=True), nullable=False),
+        sa.Column('depth', sa.Integer(), nullable=False),
+        sa.ForeignKeyConstraint(['ancestor_id'], ['category.category_id'], ondelete='CASCADE'),
+        sa.ForeignKeyConstraint(['descendant_id'], ['category.category_id'], ondelete='CASCADE'),
+        sa.PrimaryKeyConstraint('ancestor_id', 'descendant_id'),
+    )
+    op.create_index('ix_categoryclosure_descendant_id', 'categoryclosure', ['descendant_id', 'depth'], unique=False)
+
+    op.execute("""
+        WITH RECURSIVE tree(ancestor_id, descendant_id, depth) AS (
+            SELECT category_id, category_id, 0 FROM category
+            UNION ALL
+            SELECT tree.ancestor_id, c.category_id, tree.depth + 1
+            FROM tree
+            JOIN category c ON c.parent_category_id = tree.descendant_id
+        )
+        INSERT INTO categoryclosure (ancestor_id, descendant_id, depth)
+        SELECT ancestor_id, descendant_id, depth FROM tree;
+    """)
+
+    op.execute("""
+        CREATE FUNCTION category_closure_insert() RETURNS trigger AS $$
+        BEGIN
+            INSERT INTO categoryclosure (ancestor_id, descendant_id, depth)
+            SELECT NEW.category_id, NEW.category_id, 0
+            UNION ALL
+            SELECT ancestor_id, NEW.category_id, depth + 1
+            FROM categoryclosure
+            WHERE descendant_id = NEW.parent_category_id;
+            RETURN NULL;
+        END;
+        $$ LANGUAGE plpgsql;
+    """)
+    op.execute("""
+        CREATE TRIGGER category_closure_insert AFTER INSERT ON category
+        FOR EACH ROW EXECUTE FUNCTION category_closure_insert();
+    """)
+
+    # Moving a category re-links its whole subtree: drop the paths from the
+    # old ancestors, then join the new parent's ancestors with the subtree.
+    op.execute("""
+        CREATE FUNCTION category_closure_move() RETURNS trigger AS $$
+        BEGIN
+            IF NEW.parent_category_id IS NOT NULL AND EXISTS (
+                SELECT 1 FROM categoryclosure
+                WHERE ancestor_id = NEW.category_id AND descendant_id = NEW.parent_category_id
+            ) THEN
+                RAISE EXCEPTION 'category % cannot be moved below its own subtree', NEW.category_id
+                    USING ERRCODE = 'check_violation';
+            END IF;
+
+            DELETE FROM categoryclosure stale
+            USING categoryclosure moved
+            WHERE moved.ancestor_id = NEW.category_id
+              AND stale.descendant_id = moved.descendant_id
+              AND stale.ancestor_id NOT IN (
+                  SELECT descendant_id FROM categoryclosure WHERE ancestor_id = NEW.category_id
+              );
+
+            INSERT INTO categoryclosure (ancestor_id, descendant_id, depth)
+            SELECT above.ancestor_id, subtree.descendant_id, above.depth + subtree.depth + 1
+            FROM categoryclosure above
+            CROSS JOIN categoryclosure subtree
+            WHERE above.descendant_id = NEW.parent_category_id
+              AND subtree.ancestor_id = NEW.category_id;
+            RETURN NULL;
+        END;
+        $$ LANGUAGE plpgsql;
+    """)
+    op.execute("""
+        CREATE TRIGGER category_closure_move AFTER UPDATE OF parent_category_id ON category
+        FOR EACH ROW WHEN (OLD.parent_category_id IS DISTINCT FROM NEW.parent_category_id)
+        EXECUTE FUNCTION category_closure_move();
+    """)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.execute("DROP TRIGGER IF EXISTS category_closure_move ON category;")
+    op.execute("DROP TRIGGER IF EXISTS category_closure_insert ON category;")
+    op.execute("DROP FUNCTION IF EXISTS category_closure_move();")
+    op.execute("DROP FUNCTION IF EXISTS category_closure_insert();")
+    op.drop_index('ix_categoryclosure_descendant_id', table_name='categoryclosure')
+    op.drop_table('categoryclosure')
@@ -0,0 +1,28 @@
+"""stock reservation active user index
+
+Revision ID: 3d7a9c41e5b2
+Revises: e1b4f7a25c93
+Create Date: 2026-10-19 11:02:37.418250
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '3d7a9c41e5b2'
+down_revision: Union[str, None] = 'e1b4f7a25c93'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_index('ix_stockreservation_active_user_id', 'stockreservation', ['user_id'], unique=False, postgresql_where=sa.text("status = 'active'"))
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index('ix_stockreservation_active_user_id', table_name='stockreservation', postgresql_where=sa.text("status = 'active'"))
@@ -0,0 +1,31 @@
+"""order idempotency key
+
+Revision ID: 4f2c8a9d1e73
+Revises: 6b8e1d40f2a9
+Create Date: 2026-10-18 21:04:12.518204
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+import sqlmodel
+
+
+# revision identifiers, used by Alembic.
+revision: str = '4f2c8a9d1e73'
+down_revision: Union[str, None] = '6b8e1d40f2a9'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.add_column('order', sa.Column('idempotency_key', sqlmodel.sql.sqltypes.AutoString(length=255), nullable=True))
+    op.create_unique_constraint('uq_order_user_id_idempotency_key', 'order', ['user_id', 'idempotency_key'])
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_constraint('uq_order_user_id_idempotency_key', 'order', type_='unique')
+    op.drop_column('order', 'idempotency_key')
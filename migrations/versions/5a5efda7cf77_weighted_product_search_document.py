@@ -0,0 +1,119 @@
+"""weighted product search document
+
+Revision ID: 5a5efda7cf77
+Revises: 0715b0d0691f
+Create Date: 2026-10-18 16:10:26.932839
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+
+# revision identifiers, used by Alembic.
+revision: str = '5a5efda7cf77'
+down_revision: Union[str, None] = '0715b0d0691f'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.add_column('product', sa.Column('search_tsv', postgresql.TSVECTOR(), nullable=True))
+    op.create_index('ix_product_search_tsv', 'product', ['search_tsv'], unique=False, postgresql_using='gin')
+
+    # name (A), category names (B), description (C)
+    op.execute("""
+        CREATE FUNCTION product_search_document(p_id uuid, p_name text, p_description text)
+        RETURNS tsvector AS $$
+            SELECT setweight(to_tsvector('english', coalesce(p_name, '')), 'A')
+                || setweight(to_tsvector('english', coalesce((
+                       SELECT string_agg(c.category_name, ' ')
+                       FROM productcategory pc
+                       JOIN category c ON c.category_id = pc.category_id
+                       WHERE pc.product_id = p_id
+                   ), '')), 'B')
+                || setweight(to_tsvector('english', coalesce(p_description, '')), 'C');
+        $$ LANGUAGE sql STABLE;
+    """)
+
+    # Extend the existing product trigger function from cfd9cfab7850
+    op.execute("""
+        CREATE OR REPLACE FUNCTION update_product_tsvector() RETURNS trigger AS $$
+        BEGIN
+            NEW.name_tsv := to_tsvector('english', NEW.name);
+            NEW.search_tsv := product_search_document(NEW.product_id, NEW.name, NEW.description);
+            RETURN NEW;
+        END;
+        $$ LANGUAGE plpgsql;
+    """)
+
+    # Re-index products when category links change, once per statement so
+    # bulk link inserts touch each product a single time.
+    op.execute("""
+        CREATE FUNCTION refresh_product_search_from_links() RETURNS trigger AS $$
+        BEGIN
+            IF TG_OP = 'DELETE' THEN
+                UPDATE product p
+                SET search_tsv = product_search_document(p.product_id, p.name, p.description)
+                WHERE p.product_id IN (SELECT DISTINCT product_id FROM old_links);
+            ELSE
+                UPDATE product p
+                SET search_tsv = product_search_document(p.product_id, p.name, p.description)
+                WHERE p.product_id IN (SELECT DISTINCT product_id FROM new_links);
+            END IF;
+            RETURN NULL;
+        END;
+        $$ LANGUAGE plpgsql;
+    """)
+    op.execute("""
+        CREATE TRIGGER productcategory_search_insert AFTER INSERT ON productcategory
+        REFERENCING NEW TABLE AS new_links
+        FOR EACH STATEMENT EXECUTE FUNCTION refresh_product_search_from_links();
+    """)
+    op.execute("""
+        CREATE TRIGGER productcategory_search_delete AFTER DELETE ON productcategory
+        REFERENCING OLD TABLE AS old_links
+        FOR EACH STATEMENT EXECUTE FUNCTION refresh_product_search_from_links();
+    """)
+
+    op.execute("""
+        CREATE FUNCTION refresh_product_search_from_category() RETURNS trigger AS $$
+        BEGIN
+            UPDATE product p
+            SET search_tsv = product_search_document(p.product_id, p.name, p.description)
+            FROM productcategory pc
+            WHERE pc.product_id = p.product_id AND pc.category_id = NEW.category_id;
+            RETURN NULL;
+        END;
+        $$ LANGUAGE plpgsql;
+    """)
+    op.execute("""
+        CREATE TRIGGER category_search_rename AFTER UPDATE OF category_name ON category
+        FOR EACH ROW WHEN (OLD.category_name IS DISTINCT FROM NEW.category_name)
+        EXECUTE FUNCTION refresh_product_search_from_category();
+    """)
+
+    # Populate existing records
+    op.execute("UPDATE product SET search_tsv = product_search_document(product_id, name, description);")
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.execute("DROP TRIGGER IF EXISTS category_search_rename ON category;")
+    op.execute("DROP FUNCTION IF EXISTS refresh_product_search_from_category();")
+    op.execute("DROP TRIGGER IF EXISTS productcategory_search_delete ON productcategory;")
+    op.execute("DROP TRIGGER IF EXISTS productcategory_search_insert ON productcategory;")
+    op.execute("DROP FUNCTION IF EXISTS refresh_product_search_from_links();")
+    op.execute("""
+        CREATE OR REPLACE FUNCTION update_product_tsvector() RETURNS trigger AS $$
+        BEGIN
+            NEW.name_tsv := to_tsvector('english', NEW.name);
+            RETURN NEW;
+        END;
+        $$ LANGUAGE plpgsql;
+    """)
+    op.execute("DROP FUNCTION IF EXISTS product_search_document(uuid, text, text);")
+    op.drop_index('ix_product_search_tsv', table_name='product')
+    op.drop_column('product', 'search_tsv')
@@ -0,0 +1,31 @@
+"""trigram search indexes
+
+Revision ID: 5f5545b74abf
+Revises: 5a5efda7cf77
+Create Date: 2026-10-18 16:11:07.292784
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '5f5545b74abf'
+down_revision: Union[str, None] = '5a5efda7cf77'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.execute("CREATE EXTENSION IF NOT EXISTS pg_trgm;")
+    op.create_index('ix_product_name_trgm', 'product', ['name'], unique=False, postgresql_using='gin', postgresql_ops={'name': 'gin_trgm_ops'})
+    op.create_index('ix_category_category_name_trgm', 'category', ['category_name'], unique=False, postgresql_using='gin', postgresql_ops={'category_name': 'gin_trgm_ops'})
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index('ix_category_category_name_trgm', table_name='category')
+    op.drop_index('ix_product_name_trgm', table_name='product')
@@ -0,0 +1,75 @@
+"""unique cart and cart items
+
+Revision ID: 6b8e1d40f2a9
+Revises: d7f3b2a61c04
+Create Date: 2026-10-18 19:20:33.471925
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '6b8e1d40f2a9'
+down_revision: Union[str, None] = 'd7f3b2a61c04'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    # Fold duplicate carts into each user's oldest cart, then merge duplicate
+    # items by summing their quantities, before adding the constraints.
+    op.execute("""
+        WITH ranked AS (
+            SELECT cart_id, first_value(cart_id) OVER (
+                PARTITION BY user_id ORDER BY created_at, cart_id
+            ) AS keep_id
+            FROM cart
+        )
+        UPDATE cartitem ci
+        SET cart_id = ranked.keep_id
+        FROM ranked
+        WHERE ci.cart_id = ranked.cart_id AND ranked.cart_id <> ranked.keep_id;
+    """)
+    op.execute("""
+        DELETE FROM cart c
+        USING cart older
+        WHERE older.user_id = c.user_id
+          AND (older.created_at, older.cart_id) < (c.created_at, c.cart_id);
+    """)
+    op.execute("""
+        WITH merged AS (
+            SELECT min(cart_item_id::text)::uuid AS keep_id, cart_id, product_id,
+                   sum(quantity) AS quantity, max(updated_at) AS updated_at
+            FROM cartitem
+            GROUP BY cart_id, product_id
+            HAVING count(*) > 1
+        ),
+        removed AS (
+            DELETE FROM cartitem ci
+            USING merged
+            WHERE ci.cart_id = merged.cart_id
+              AND ci.product_id = merged.product_id
+              AND ci.cart_item_id <> merged.keep_id
+        )
+        UPDATE cartitem ci
+        SET quantity = merged.quantity, updated_at = merged.updated_at
+        FROM merged
+        WHERE ci.cart_item_id = merged.keep_id;
+    """)
+
+    op.drop_index(op.f('ix_cart_user_id'), table_name='cart')
+    op.create_index(op.f('ix_cart_user_id'), 'cart', ['user_id'], unique=True)
+    op.drop_index(op.f('ix_cartitem_cart_id'), table_name='cartitem')
+    op.create_unique_constraint('uq_cartitem_cart_id_product_id', 'cartitem', ['cart_id', 'product_id'])
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_constraint('uq_cartitem_cart_id_product_id', 'cartitem', type_='unique')
+    op.create_index(op.f('ix_cartitem_cart_id'), 'cartitem', ['cart_id'], unique=False)
+    op.drop_index(op.f('ix_cart_user_id'), table_name='cart')
+    op.create_index(op.f('ix_cart_user_id'), 'cart', ['user_id'], unique=False)
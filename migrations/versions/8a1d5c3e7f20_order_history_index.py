@@ -0,0 +1,37 @@
+"""order history index
+
+Revision ID: 8a1d5c3e7f20
+Revises: 4f2c8a9d1e73
+Create Date: 2026-10-18 22:10:47.093512
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '8a1d5c3e7f20'
+down_revision: Union[str, None] = '4f2c8a9d1e73'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_index(
+        'ix_order_user_id_created_at_order_id',
+        'order',
+        ['user_id', 'created_at', 'order_id'],
+        unique=False,
+        postgresql_include=['status', 'total'],
+    )
+    # The composite index serves every user_id lookup the old one did.
+    op.drop_index('ix_order_user_id', table_name='order')
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.create_index('ix_order_user_id', 'order', ['user_id'], unique=False)
+    op.drop_index('ix_order_user_id_created_at_order_id', table_name='order')
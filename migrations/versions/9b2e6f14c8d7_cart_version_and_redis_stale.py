@@ -0,0 +1,32 @@
+"""cart version and redis stale marker
+
+Revision ID: 9b2e6f14c8d7
+Revises: 3d7a9c41e5b2
+Create Date: 2026-10-19 14:26:03.551918
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '9b2e6f14c8d7'
+down_revision: Union[str, None] = '3d7a9c41e5b2'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.add_column('cart', sa.Column('version', sa.Integer(), server_default='1', nullable=False))
+    op.add_column('cart', sa.Column('redis_stale', sa.Boolean(), server_default=sa.false(), nullable=False))
+    op.create_index('ix_cart_redis_stale', 'cart', ['user_id'], unique=False, postgresql_where=sa.text('redis_stale'))
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index('ix_cart_redis_stale', table_name='cart', postgresql_where=sa.text('redis_stale'))
+    op.drop_column('cart', 'redis_stale')
+    op.drop_column('cart', 'version')
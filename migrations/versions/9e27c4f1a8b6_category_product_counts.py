@@ -0,0 +1,89 @@
+"""category product counts
+
+Revision ID: 9e27c4f1a8b6
+Revises: 3c9a0e5b7d21
+Create Date: 2026-10-18 18:05:52.113480
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '9e27c4f1a8b6'
+down_revision: Union[str, None] = '3c9a0e5b7d21'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.add_column('category', sa.Column('product_count', sa.Integer(), server_default='0', nullable=False))
+    op.execute("""
+        UPDATE category c
+        SET product_count = counts.total
+        FROM (
+            SELECT category_id, count(*) AS total FROM productcategory GROUP BY category_id
+        ) counts
+        WHERE counts.category_id = c.category_id;
+    """)
+
+    # Adjust counts once per statement from the transition tables, so a bulk
+    # import or a product delete cascading over its links costs one UPDATE.
+    op.execute("""
+        CREATE FUNCTION refresh_category_product_counts() RETURNS trigger AS $$
+        BEGIN
+            IF TG_OP = 'DELETE' THEN
+                UPDATE category c
+                SET product_count = greatest(c.product_count - changed.total, 0)
+                FROM (SELECT category_id, count(*) AS total FROM old_links GROUP BY category_id) changed
+                WHERE changed.category_id = c.category_id;
+            ELSE
+                UPDATE category c
+                SET product_count = c.product_count + changed.total
+                FROM (SELECT category_id, count(*) AS total FROM new_links GROUP BY category_id) changed
+                WHERE changed.category_id = c.category_id;
+            END IF;
+            PERFORM pg_notify('category_tree', TG_TABLE_NAME);
+            RETURN NULL;
+        END;
+        $$ LANGUAGE plpgsql;
+    """)
+    op.execute("""
+        CREATE TRIGGER productcategory_count_insert AFTER INSERT ON productcategory
+        REFERENCING NEW TABLE AS new_links
+        FOR EACH STATEMENT EXECUTE FUNCTION refresh_category_product_counts();
+    """)
+    op.execute("""
+        CREATE TRIGGER productcategory_count_delete AFTER DELETE ON productcategory
+        REFERENCING OLD TABLE AS old_links
+        FOR EACH STATEMENT EXECUTE FUNCTION refresh_category_product_counts();
+    """)
+
+    # Category rows changing (new, renamed, moved, removed) also invalidate
+    # the in-process tree snapshots.
+    op.execute("""
+        CREATE FUNCTION notify_category_tree() RETURNS trigger AS $$
+        BEGIN
+            PERFORM pg_notify('category_tree', TG_TABLE_NAME);
+            RETURN NULL;
+        END;
+        $$ LANGUAGE plpgsql;
+    """)
+    op.execute("""
+        CREATE TRIGGER category_tree_notify
+        AFTER INSERT OR DELETE OR UPDATE OF category_name, parent_category_id, image_url ON category
+        FOR EACH STATEMENT EXECUTE FUNCTION notify_category_tree();
+    """)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.execute("DROP TRIGGER IF EXISTS category_tree_notify ON category;")
+    op.execute("DROP TRIGGER IF EXISTS productcategory_count_delete ON productcategory;")
+    op.execute("DROP TRIGGER IF EXISTS productcategory_count_insert ON productcategory;")
+    op.execute("DROP FUNCTION IF EXISTS notify_category_tree();")
+    op.execute("DROP FUNCTION IF EXISTS refresh_category_product_counts();")
+    op.drop_column('category', 'product_count')
@@ -0,0 +1,28 @@
+"""product image variants
+
+Revision ID: b41d7e29c6a3
+Revises: 5f5545b74abf
+Create Date: 2026-10-18 17:02:41.518203
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'b41d7e29c6a3'
+down_revision: Union[str, None] = '5f5545b74abf'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.add_column('product', sa.Column('image_variants', sa.JSON(), nullable=True))
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_column('product', 'image_variants')
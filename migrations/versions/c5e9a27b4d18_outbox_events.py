@@ -0,0 +1,46 @@
+"""outbox events
+
+Revision ID: c5e9a27b4d18
+Revises: 8a1d5c3e7f20
+Create Date: 2026-10-18 23:02:19.640275
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+import sqlmodel
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'c5e9a27b4d18'
+down_revision: Union[str, None] = '8a1d5c3e7f20'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_table(
+        'outboxevent',
+        sa.Column('event_id', sa.BigInteger(), autoincrement=True, nullable=False),
+        sa.Column('aggregate_type', sqlmodel.sql.sqltypes.AutoString(), nullable=False),
+        sa.Column('aggregate_id', sa.Uuid(), nullable=False),
+        sa.Column('event_type', sqlmodel.sql.sqltypes.AutoString(), nullable=False),
+        sa.Column('payload', sa.JSON(), nullable=False),
+        sa.Column('created_at', sa.DateTime(), nullable=False),
+        sa.Column('dispatched_at', sa.DateTime(), nullable=True),
+        sa.Column('processed_at', sa.DateTime(), nullable=True),
+        sa.Column('attempts', sa.Integer(), nullable=False),
+        sa.Column('last_error', sqlmodel.sql.sqltypes.AutoString(), nullable=True),
+        sa.PrimaryKeyConstraint('event_id'),
+    )
+    op.create_index('ix_outboxevent_unprocessed_event_id', 'outboxevent', ['event_id'], unique=False, postgresql_where=sa.text('processed_at IS NULL'))
+    op.create_index('ix_outboxevent_aggregate_id_event_id', 'outboxevent', ['aggregate_id', 'event_id'], unique=False)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index('ix_outboxevent_aggregate_id_event_id', table_name='outboxevent')
+    op.drop_index('ix_outboxevent_unprocessed_event_id', table_name='outboxevent', postgresql_where=sa.text('processed_at IS NULL'))
+    op.drop_table('outboxevent')
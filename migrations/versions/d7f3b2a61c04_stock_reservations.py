@@ -0,0 +1,46 @@
+"""stock reservations
+
+Revision ID: d7f3b2a61c04
+Revises: 9e27c4f1a8b6
+Create Date: 2026-10-18 18:44:17.902615
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+
+# revision identifiers, used by Alembic.
+revision: str = 'd7f3b2a61c04'
+down_revision: Union[str, None] = '9e27c4f1a8b6'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_table(
+        'stockreservation',
+        sa.Column('reservation_id', sa.Uuid(), nullable=False),
+        sa.Column('product_id', postgresql.UUID(as_uuid=True), nullable=False),
+        sa.Column('user_id', sa.Uuid(), nullable=True),
+        sa.Column('quantity', sa.Integer(), nullable=False),
+        sa.Column('status', sa.Enum('active', 'committed', 'released', 'expired', name='reservationstatus'), nullable=False),
+        sa.Column('expires_at', sa.DateTime(), nullable=False),
+        sa.Column('created_at', sa.DateTime(), nullable=False),
+        sa.Column('updated_at', sa.DateTime(), nullable=False),
+        sa.ForeignKeyConstraint(['product_id'], ['product.product_id'], ondelete='CASCADE'),
+        sa.ForeignKeyConstraint(['user_id'], ['user.user_id']),
+        sa.PrimaryKeyConstraint('reservation_id'),
+    )
+    op.create_index(op.f('ix_stockreservation_product_id'), 'stockreservation', ['product_id'], unique=False)
+    op.create_index('ix_stockreservation_active_expires_at', 'stockreservation', ['expires_at'], unique=False, postgresql_where=sa.text("status = 'active'"))
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index('ix_stockreservation_active_expires_at', table_name='stockreservation', postgresql_where=sa.text("status = 'active'"))
+    op.drop_index(op.f('ix_stockreservation_product_id'), table_name='stockreservation')
+    op.drop_table('stockreservation')
+    sa.Enum(name='reservationstatus').drop(op.get_bind(), checkfirst=True)
@@ -0,0 +1,46 @@
+"""product search trigger on text changes
+
+Revision ID: e1b4f7a25c93
+Revises: c5e9a27b4d18
+Create Date: 2026-10-19 10:14:52.307716
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'e1b4f7a25c93'
+down_revision: Union[str, None] = 'c5e9a27b4d18'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    # The search document only depends on name and description (category
+    # changes are handled by their own triggers), so stock and price writes
+    # must not rebuild it.
+    op.execute("DROP TRIGGER IF EXISTS product_tsv_update ON product;")
+    op.execute("""
+        CREATE TRIGGER product_tsv_insert BEFORE INSERT
+        ON product FOR EACH ROW EXECUTE FUNCTION update_product_tsvector();
+    """)
+    op.execute("""
+        CREATE TRIGGER product_tsv_update BEFORE UPDATE OF name, description
+        ON product FOR EACH ROW
+        WHEN (OLD.name IS DISTINCT FROM NEW.name OR OLD.description IS DISTINCT FROM NEW.description)
+        EXECUTE FUNCTION update_product_tsvector();
+    """)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.execute("DROP TRIGGER IF EXISTS product_tsv_update ON product;")
+    op.execute("DROP TRIGGER IF EXISTS product_tsv_insert ON product;")
+    op.execute("""
+        CREATE TRIGGER product_tsv_update BEFORE INSERT OR UPDATE
+        ON product FOR EACH ROW EXECUTE FUNCTION update_product_tsvector();
+    """)
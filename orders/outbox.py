@@ -0,0 +1,173 @@
+import json
+import time
+from datetime import datetime, timedelta, timezone
+from uuid import UUID
+
+import redis.asyncio as red_db
+from sqlalchemy import exists, func, update
+from sqlalchemy.dialects.postgresql import insert
+from sqlalchemy.orm import aliased
+from sqlmodel import select
+from sqlmodel.ext.asyncio.session import AsyncSession
+
+from config import settings
+from db.models import OutboxEvent, remove_timezone
+from db.redis import redis_client
+from db.session import worker_session_factory
+
+# Delivery is at-least-once: events are marked dispatched only after they
+# were handed to Celery, and anything dispatched but not processed within
+# OUTBOX_REDELIVER_SECONDS is sent again. An aggregate's events are sent as
+# one task in event_id order, and nothing newer for an aggregate is sent
+# while an older event of it is still in flight, so handlers see each
+# order's events in order.
+RELAY_LOCK_ID = 7_340_021
+LAST_RUN_KEY = "outbox:relay:last_run"
+
+
+def _now() -> datetime:
+    return remove_timezone(datetime.now(timezone.utc))
+
+
+def _jsonable(value):
+    return json.loads(json.dumps(value, default=str))
+
+
+async def record_events(session: AsyncSession, events: list[tuple]):
+    # events: (aggregate_type, aggregate_id, event_type, payload). Runs in the
+    # caller's transaction and is committed with it.
+    if not events:
+        return
+    now = _now()
+    await session.exec(
+        insert(OutboxEvent).values(  # type: ignore
+            [
+                {
+                    "aggregate_type": aggregate_type,
+                    "aggregate_id": aggregate_id,
+                    "event_type": event_type,
+                    "payload": _jsonable(payload),
+                    "created_at": now,
+                    "attempts": 0,
+                }
+                for aggregate_type, aggregate_id, event_type, payload in events
+            ]
+        )
+    )
+
+
+def _event_message(event: OutboxEvent) -> dict:
+    return {
+        "event_id": event.event_id,
+        "aggregate_type": event.aggregate_type,
+        "aggregate_id": str(event.aggregate_id),
+        "event_type": event.event_type,
+        "payload": event.payload,
+        "created_at": event.created_at.isoformat(),
+    }
+
+
+async def relay(session_factory, dispatch, client=redis_client) -> dict:
+    started = time.time()
+    async with session_factory() as session:
+        result = await session.exec(select(func.pg_try_advisory_xact_lock(RELAY_LOCK_ID)))
+        if not result.one():
+            return {"skipped": "another relay is running"}
+
+        now = _now()
+        redeliver_before = now - timedelta(seconds=settings.OUTBOX_REDELIVER_SECONDS)
+        earlier = aliased(OutboxEvent)
+        in_flight = exists().where(
+            earlier.aggregate_id == OutboxEvent.aggregate_id,
+            earlier.event_id < OutboxEvent.event_id,
+            earlier.processed_at.is_(None),  # type: ignore
+            earlier.dispatched_at >= redeliver_before,  # type: ignore
+        )
+        result = await session.exec(
+            select(OutboxEvent)
+            .where(
+                OutboxEvent.processed_at.is_(None),  # type: ignore
+                (OutboxEvent.dispatched_at.is_(None))  # type: ignore
+                | (OutboxEvent.dispatched_at < redeliver_before),
+                ~in_flight,
+            )
+            .order_by(OutboxEvent.event_id)
+            .limit(settings.OUTBOX_BATCH_SIZE)
+        )
+        events = result.all()
+
+        batches: dict[UUID, list] = {}
+        for event in events:
+            batches.setdefault(event.aggregate_id, []).append(_event_message(event))
+        for messages in batches.values():
+            dispatch(messages)
+
+        if events:
+            await session.exec(
+                update(OutboxEvent)  # type: ignore
+                .where(OutboxEvent.event_id.in_([event.event_id for event in events]))  # type: ignore
+                .values(dispatched_at=now, attempts=OutboxEvent.attempts + 1)
+            )
+        await session.commit()
+
+    metrics = {
+        "dispatched": len(events),
+        "aggregates": len(batches),
+        "duration_seconds": round(time.time() - started, 3),
+        "finished_at": datetime.now(timezone.utc).isoformat(),
+    }
+    await client.hset(LAST_RUN_KEY, mapping={key: json.dumps(value) for key, value in metrics.items()})
+    return metrics
+
+
+async def mark_processed(session: AsyncSession, event_ids: list[int], failed: tuple[int, str] | None = None):
+    now = _now()
+    if event_ids:
+        await session.exec(
+            update(OutboxEvent)  # type: ignore
+            .where(OutboxEvent.event_id.in_(event_ids))  # type: ignore
+            .values(processed_at=now, last_error=None)
+        )
+    if failed:
+        event_id, error = failed
+        await session.exec(
+            update(OutboxEvent)  # type: ignore
+            .where(OutboxEvent.event_id == event_id)
+            .values(last_error=error[:1000])
+        )
+    await session.commit()
+
+
+async def outbox_stats(session: AsyncSession, client=redis_client) -> dict:
+    now = _now()
+    redeliver_before = now - timedelta(seconds=settings.OUTBOX_REDELIVER_SECONDS)
+    # Only unprocessed rows are read, through the partial index.
+    result = await session.exec(
+        select(
+            func.count().filter(OutboxEvent.dispatched_at.is_(None)),  # type: ignore
+            func.count().filter(OutboxEvent.dispatched_at >= redeliver_before),
+            func.count().filter(OutboxEvent.dispatched_at < redeliver_before),
+            func.count().filter(OutboxEvent.last_error.is_not(None)),  # type: ignore
+            func.min(OutboxEvent.created_at),
+        ).where(OutboxEvent.processed_at.is_(None))  # type: ignore
+    )
+    pending, in_flight, overdue, failing, oldest = result.one()
+    last_run = await client.hgetall(LAST_RUN_KEY)
+    return {
+        "pending": pending,
+        "in_flight": in_flight,
+        "awaiting_redelivery": overdue,
+        "failing": failing,
+        "lag_seconds": round((now - oldest).total_seconds(), 3) if oldest else 0,
+        "last_relay": {key.decode(): json.loads(value) for key, value in last_run.items()} or None,
+    }
+
+
+async def run_outbox_relay(dispatch):
+    client = red_db.from_url(settings.REDIS_URL)
+    worker_engine, session_factory = worker_session_factory()
+    try:
+        return await relay(session_factory, dispatch, client)
+    finally:
+        await worker_engine.dispose()
+        await client.aclose()
@@ -1,19 +1,65 @@
-from fastapi import APIRouter
+from typing import Optional
+from uuid import UUID
+
+from fastapi import APIRouter, Depends, Header, Query, Response, status
+from sqlmodel.ext.asyncio.session import AsyncSession
+
+from auth.dependencies import RoleChecker, get_current_user
+from db.models import User, UserRole
+from db.session import get_session
+from orders.schemes import OrderPage, OrderResponse, OrderStatusBulkResponse, OrderStatusBulkUpdate
+from orders.services import OrderService
 
 
 Order_router = APIRouter(prefix="/orders", tags=["Orders"])
+order_services = OrderService()
+
+
+@Order_router.get("/", response_model=OrderPage)
+async def get_orders(
+    limit: int = Query(20, ge=1, le=100),
+    cursor: Optional[str] = None,
+    session: AsyncSession = Depends(get_session),
+    user: User = Depends(get_current_user),
+):
+    return await order_services.get_orders(user, session, limit, cursor)
+
+
+@Order_router.post("/", status_code=status.HTTP_201_CREATED, response_model=OrderResponse)
+async def create_order(
+    response: Response,
+    idempotency_key: Optional[str] = Header(default=None, alias="Idempotency-Key", max_length=255),
+    session: AsyncSession = Depends(get_session),
+    user: User = Depends(get_current_user),
+):
+    order, replayed = await order_services.checkout(user, idempotency_key, session)
+    if replayed:
+        response.status_code = status.HTTP_200_OK
+        response.headers["Idempotent-Replayed"] = "true"
+    return order
 
 
-@Order_router.get("/")
-async def get_orders():
-    pass
+@Order_router.get("/outbox/stats", response_model=dict)
+async def outbox_stats(
+    session: AsyncSession = Depends(get_session),
+    _: User = Depends(RoleChecker([UserRole.admin])),
+):
+    return await order_services.get_outbox_stats(session)
 
 
-@Order_router.post("/")
-async def create_order():
-    pass
+@Order_router.post("/status", response_model=OrderStatusBulkResponse)
+async def update_order_statuses(
+    update: OrderStatusBulkUpdate,
+    session: AsyncSession = Depends(get_session),
+    _: User = Depends(RoleChecker([UserRole.admin])),
+):
+    return await order_services.update_statuses(update.transitions, session)
 
 
-@Order_router.get("/{order_id}")
-async def get_order():
-    pass
+@Order_router.get("/{order_id}", response_model=OrderResponse)
+async def get_order(
+    order_id: UUID,
+    session: AsyncSession = Depends(get_session),
+    user: User = Depends(get_current_user),
+):
+    return await order_services.get_order(user, order_id, session)
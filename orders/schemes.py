@@ -0,0 +1,48 @@
+from datetime import datetime
+from typing import List, Optional
+from uuid import UUID
+
+from pydantic import BaseModel, Field
+
+from db.models import OrderStatus
+
+
+class OrderItemResponse(BaseModel):
+    product_id: UUID
+    name: Optional[str] = None
+    quantity: int
+    price: float
+
+
+class OrderResponse(BaseModel):
+    order_id: UUID
+    status: OrderStatus
+    total: float
+    created_at: datetime
+    items: List[OrderItemResponse] = []
+
+
+class OrderPage(BaseModel):
+    orders: List[OrderResponse] = []
+    limit: int
+    next_cursor: Optional[str] = None
+
+
+class OrderStatusChange(BaseModel):
+    order_id: UUID
+    status: OrderStatus
+
+
+class OrderStatusBulkUpdate(BaseModel):
+    transitions: List[OrderStatusChange] = Field(min_length=1, max_length=1000)
+
+
+class OrderStatusResult(BaseModel):
+    order_id: UUID
+    result: str
+    status: Optional[OrderStatus] = None
+
+
+class OrderStatusBulkResponse(BaseModel):
+    updated: int
+    results: List[OrderStatusResult]
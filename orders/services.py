@@ -0,0 +1,436 @@
+import uuid
+from datetime import datetime, timezone
+
+from fastapi import HTTPException, status
+from redis.exceptions import RedisError
+from sqlalchemy import ARRAY, Integer, any_, bindparam, column, delete, update, values
+from sqlalchemy.dialects.postgresql import UUID as PG_UUID, insert
+from sqlalchemy.exc import IntegrityError
+from sqlmodel import select
+from sqlmodel.ext.asyncio.session import AsyncSession
+
+from cart.store import cart_store, lock_carts, write_snapshots
+from db.models import Cart, CartItem, Order, OrderItem, OrderStatus, Product, User, remove_timezone
+from orders.outbox import outbox_stats, record_events
+from products.stock import stock_service
+from utils.pagination import keyset_after, keyset_order, next_cursor, parse_created_cursor
+
+
+# Each status can only be reached from the one before it.
+PREVIOUS_STATUS = {
+    OrderStatus.processing: OrderStatus.pending,
+    OrderStatus.shipped: OrderStatus.processing,
+    OrderStatus.delivered: OrderStatus.shipped,
+}
+
+
+class OrderService:
+    async def _items_by_order(self, session: AsyncSession, order_ids: list) -> dict:
+        # One query for the items of a whole page of orders.
+        items: dict = {order_id: [] for order_id in order_ids}
+        if not order_ids:
+            return items
+        result = await session.exec(
+            select(
+                OrderItem.order_id,
+                OrderItem.product_id,
+                Product.name,
+                OrderItem.quantity,
+                OrderItem.price,
+            )
+            .outerjoin(Product, Product.product_id == OrderItem.product_id)  # type: ignore
+            .where(OrderItem.order_id.in_(order_ids))  # type: ignore
+            .order_by(OrderItem.order_id, Product.name)
+        )
+        for order_id, product_id, name, quantity, price in result.all():
+            items[order_id].append(
+                {"product_id": product_id, "name": name, "quantity": quantity, "price": price}
+            )
+        return items
+
+    async def _order_response(self, session: AsyncSession, order: Order):
+        items = await self._items_by_order(session, [order.order_id])
+        return {
+            "order_id": order.order_id,
+            "status": order.status,
+            "total": order.total,
+            "created_at": order.created_at,
+            "items": items[order.order_id],
+        }
+
+    async def get_orders(
+        self,
+        user_details: User,
+        session: AsyncSession,
+        limit: int = 20,
+        cursor: str | None = None,
+    ):
+        try:
+            keyset = (Order.created_at, Order.order_id)
+            statement = select(
+                Order.order_id, Order.status, Order.total, Order.created_at
+            ).where(Order.user_id == user_details.user_id)
+
+            cursor_values = parse_created_cursor(cursor)
+            if cursor_values:
+                statement = keyset_after(statement, keyset, cursor_values)
+
+            statement = keyset_order(statement, keyset).limit(limit)
+
+            result = await session.exec(statement)
+            orders = result.all()
+            items = await self._items_by_order(session, [order.order_id for order in orders])
+
+            return {
+                "orders": [
+                    {**order._mapping, "items": items[order.order_id]} for order in orders
+                ],
+                "limit": limit,
+                "next_cursor": next_cursor(
+                    orders, limit, lambda o: (o.created_at, o.order_id)
+                ),
+            }
+
+        except HTTPException:
+            raise
+        except Exception as e:
+            raise HTTPException(
+                status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+                detail=f"FAILED TO FETCH ORDERS: {str(e)}",
+            )
+
+    async def get_order(self, user_details: User, order_id: uuid.UUID, session: AsyncSession):
+        result = await session.exec(
+            select(Order).where(
+                Order.order_id == order_id, Order.user_id == user_details.user_id
+            )
+        )
+        order = result.first()
+        if not order:
+            raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Order not found")
+        return await self._order_response(session, order)
+
+    async def _existing_order(self, session: AsyncSession, user_id: uuid.UUID, idempotency_key: str | None):
+        if not idempotency_key:
+            return None
+        result = await session.exec(
+            select(Order).where(Order.user_id == user_id, Order.idempotency_key == idempotency_key)
+        )
+        return result.first()
+
+    async def _locked_cart(self, session: AsyncSession, user_id: uuid.UUID):
+        # The cart row is locked before Redis is read, which serialises
+        # checkouts and journal flushes of the same user: whoever gets the
+        # lock next sees the live cart as the previous holder left it. The
+        # live state is then written through so the order is placed from
+        # exactly what the shopper sees.
+        versions = await lock_carts(session, [user_id])
+        try:
+            items = await cart_store.items(session, user_id, versions.get(user_id))
+            await write_snapshots(session, {user_id: items})
+            redis_cart = True
+        except RedisError:
+            redis_cart = False
+        result = await session.exec(select(Cart.cart_id).where(Cart.user_id == user_id))
+        return result.first(), redis_cart
+
+    async def _restore_live_cart(self, session: AsyncSession, user_id: uuid.UUID, removed: list):
+        try:
+            await cart_store.apply(
+                session, user_id, [(op, product_id, -quantity) for op, product_id, quantity in removed]
+            )
+        except RedisError:
+            await cart_store.mark_stale(session, user_id)
+            await session.commit()
+
+    async def checkout(self, user_details: User, idempotency_key: str | None, session: AsyncSession):
+        user_id = user_details.user_id
+
+        # Cheap replay check before taking any lock.
+        order = await self._existing_order(session, user_id, idempotency_key)
+        if order:
+            return await self._order_response(session, order), True
+
+        # Pool units taken or held for this checkout; they go back to the
+        # pools if the transaction does not commit.
+        refund: dict = {}
+        try:
+            cart_id, redis_cart = await self._locked_cart(session, user_id)
+            order = await self._existing_order(session, user_id, idempotency_key)
+            if order:
+                response = await self._order_response(session, order)
+                await session.rollback()
+                return response, True
+            reservations = await stock_service.lock_user_reservations(session, user_id)
+
+            lines = []
+            if cart_id:
+                # Product rows are locked in a fixed order so concurrent
+                # checkouts of overlapping carts cannot deadlock.
+                result = await session.exec(
+                    select(CartItem.product_id, CartItem.quantity, Product.price, Product.stock, Product.name)
+                    .join(Product, Product.product_id == CartItem.product_id)  # type: ignore
+                    .where(CartItem.cart_id == cart_id)
+                    .order_by(Product.product_id)
+                    .with_for_update(of=Product)  # type: ignore
+                )
+                lines = result.all()
+            if not lines:
+                raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Cart is empty")
+
+            # Units the shopper already holds are sold from their
+            # reservations; only the remainder comes out of stock. A
+            # reservation larger than the line hands its surplus back to
+            # product.stock through a negative decrement below.
+            wanted = {product_id: quantity for product_id, quantity, _, _, _ in lines}
+            holds = [
+                (product_id, reservation_id, quantity, False)
+                for product_id, reservation_id, quantity in reservations
+                if product_id in wanted
+            ] + [
+                (product_id, reservation_id, quantity, True)
+                for product_id, reservation_id, quantity in await stock_service.user_pool_holds(
+                    user_id, list(wanted)
+                )
+            ]
+            reserved: dict = {}
+            for product_id, reservation_id, _, pool_hold in holds:
+                if reserved.get(product_id, 0) >= wanted[product_id]:
+                    continue
+                try:
+                    quantity = await stock_service.commit(session, product_id, reservation_id, user_id)
+                except HTTPException:
+                    # Expired or released since it was listed.
+                    continue
+                reserved[product_id] = reserved.get(product_id, 0) + quantity
+                if pool_hold:
+                    refund[product_id] = refund.get(product_id, 0) + quantity
+            needed = {
+                product_id: quantity - reserved.get(product_id, 0)
+                for product_id, quantity in wanted.items()
+            }
+
+            # Hot SKUs keep part of their stock in a Redis pool; take the
+            # shortfall from there before deciding a line cannot be filled.
+            shortfall = {
+                product_id: needed[product_id] - stock
+                for product_id, _, _, stock, _ in lines
+                if needed[product_id] > stock
+            }
+            taken = await stock_service.take_pooled(shortfall) if shortfall else {}
+            for product_id, quantity in taken.items():
+                refund[product_id] = refund.get(product_id, 0) + quantity
+            missing = [str(product_id) for product_id in shortfall if product_id not in taken]
+            if missing:
+                raise HTTPException(
+                    status_code=status.HTTP_409_CONFLICT,
+                    detail={"message": "Insufficient stock", "product_ids": missing},
+                )
+
+            decrements = [
+                (product_id, needed[product_id] - taken.get(product_id, 0))
+                for product_id in wanted
+                if needed[product_id] != taken.get(product_id, 0)
+            ]
+            if decrements:
+                ordered = values(
+                    column("product_id", PG_UUID(as_uuid=True)),
+                    column("quantity", Integer),
+                    name="ordered",
+                ).data(decrements)
+                result = await session.exec(
+                    update(Product)  # type: ignore
+                    .where(
+                        Product.product_id == ordered.c.product_id,
+                        Product.stock >= ordered.c.quantity,
+                    )
+                    .values(stock=Product.stock - ordered.c.quantity)
+                    .returning(Product.product_id)
+                )
+                if len(result.all()) != len(decrements):
+                    raise HTTPException(
+                        status_code=status.HTTP_409_CONFLICT, detail="Insufficient stock"
+                    )
+
+            now = remove_timezone(datetime.now(timezone.utc))
+            order_id = uuid.uuid4()
+            total = round(sum(price * quantity for _, quantity, price, _, _ in lines), 2)
+            await session.exec(
+                insert(Order).values(  # type: ignore
+                    order_id=order_id,
+                    user_id=user_id,
+                    status=OrderStatus.pending,
+                    total=total,
+                    idempotency_key=idempotency_key,
+                    created_at=now,
+                    updated_at=now,
+                )
+            )
+            await session.exec(
+                insert(OrderItem).values(  # type: ignore
+                    [
+                        {
+                            "order_item_id": uuid.uuid4(),
+                            "order_id": order_id,
+                            "product_id": product_id,
+                            "quantity": quantity,
+                            "price": price,
+                            "updated_at": now,
+                        }
+                        for product_id, quantity, price, _, _ in lines
+                    ]
+                )
+            )
+            await session.exec(
+                delete(CartItem).where(
+                    CartItem.cart_id == cart_id,
+                    CartItem.product_id.in_([line[0] for line in lines]),  # type: ignore
+                )  # type: ignore
+            )
+            # Emails, vendor alerts and analytics run from the outbox.
+            await record_events(
+                session,
+                [
+                    (
+                        "order",
+                        order_id,
+                        "order.placed",
+                        {
+                            "order_id": order_id,
+                            "user_id": user_id,
+                            "total": total,
+                            "items": [
+                                {"product_id": product_id, "quantity": quantity, "price": price}
+                                for product_id, quantity, price, _, _ in lines
+                            ],
+                        },
+                    )
+                ],
+            )
+            # Take the ordered quantities out of the live cart while the cart
+            # row is still locked, so the next checkout cannot read them
+            # again; anything added meanwhile stays in it.
+            removed = [("add", product_id, -quantity) for product_id, quantity, _, _, _ in lines]
+            if redis_cart:
+                try:
+                    await cart_store.apply(session, user_id, removed)
+                except RedisError:
+                    redis_cart = False
+            if not redis_cart:
+                await cart_store.mark_stale(session, user_id)
+            try:
+                await session.commit()
+            except Exception:
+                await session.rollback()
+                if redis_cart:
+                    await self._restore_live_cart(session, user_id, removed)
+                raise
+        except HTTPException:
+            await session.rollback()
+            await stock_service.return_pooled(refund)
+            raise
+        except IntegrityError:
+            # A concurrent retry with the same key won the unique constraint.
+            await session.rollback()
+            await stock_service.return_pooled(refund)
+            order = await self._existing_order(session, user_id, idempotency_key)
+            if order:
+                return await self._order_response(session, order), True
+            raise HTTPException(
+                status_code=status.HTTP_409_CONFLICT, detail="Cart changed during checkout"
+            )
+        except Exception as e:
+            await session.rollback()
+            await stock_service.return_pooled(refund)
+            raise HTTPException(
+                status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+                detail=f"FAILED TO PLACE ORDER: {str(e)}",
+            )
+
+        return {
+            "order_id": order_id,
+            "status": OrderStatus.pending,
+            "total": total,
+            "created_at": now,
+            "items": [
+                {"product_id": product_id, "name": name, "quantity": quantity, "price": price}
+                for product_id, quantity, price, _, name in lines
+            ],
+        }, False
+
+    async def get_outbox_stats(self, session: AsyncSession):
+        try:
+            return await outbox_stats(session)
+        except Exception as e:
+            raise HTTPException(
+                status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+                detail=f"FAILED TO FETCH OUTBOX STATS: {str(e)}",
+            )
+
+    async def update_statuses(self, transitions: list, session: AsyncSession):
+        targets = {change.order_id: change.status for change in transitions}
+        by_status: dict[OrderStatus, list] = {}
+        for order_id, target in targets.items():
+            by_status.setdefault(target, []).append(order_id)
+
+        updated: dict = {}
+        try:
+            now = remove_timezone(datetime.now(timezone.utc))
+            for target, order_ids in by_status.items():
+                previous = PREVIOUS_STATUS.get(target)
+                if previous is None:
+                    continue
+                result = await session.exec(
+                    update(Order)  # type: ignore
+                    .where(
+                        Order.order_id == any_(
+                            bindparam("order_ids", order_ids, type_=ARRAY(PG_UUID(as_uuid=True)))
+                        ),
+                        Order.status == previous,
+                    )
+                    .values(status=target, updated_at=now)
+                    .returning(Order.order_id)
+                )
+                for order_id in result.scalars().all():
+                    updated[order_id] = target
+
+            current = {}
+            rejected = [order_id for order_id in targets if order_id not in updated]
+            if rejected:
+                result = await session.exec(
+                    select(Order.order_id, Order.status).where(Order.order_id.in_(rejected))  # type: ignore
+                )
+                current = dict(result.all())
+
+            # One event for the whole batch, so customers are notified by a
+            # single job instead of one per order; the handler remembers each
+            # order it has emailed so a retry only resends the rest.
+            changed: dict[str, list] = {}
+            for order_id, target in updated.items():
+                changed.setdefault(target.value, []).append(order_id)
+            if changed:
+                await record_events(
+                    session,
+                    [("order_batch", uuid.uuid4(), "orders.status_changed", {"orders": changed})],
+                )
+            await session.commit()
+        except Exception as e:
+            await session.rollback()
+            raise HTTPException(
+                status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+                detail=f"FAILED TO UPDATE ORDER STATUS: {str(e)}",
+            )
+
+        results = []
+        for order_id, target in targets.items():
+            if order_id in updated:
+                results.append({"order_id": order_id, "result": "updated", "status": target})
+            elif order_id not in current:
+                results.append({"order_id": order_id, "result": "not_found"})
+            elif current[order_id] == target:
+                results.append({"order_id": order_id, "result": "unchanged", "status": target})
+            else:
+                results.append(
+                    {"order_id": order_id, "result": "invalid_transition", "status": current[order_id]}
+                )
+        return {"updated": len(updated), "results": results}
@@ -0,0 +1,200 @@
+import uuid
+from datetime import datetime, timezone
+from typing import List
+
+from sqlalchemy import insert, tuple_
+from sqlmodel import func, select
+from sqlmodel.ext.asyncio.session import AsyncSession
+
+from config import settings
+from db.models import Category, Product, ProductCategory, remove_timezone
+from products.schemes import ProductCreate
+
+# asyncpg refuses statements with more bind parameters than this.
+MAX_BIND_PARAMS = 32767
+CATEGORY_LOCK_ID = 7_340_022
+
+
+def _chunks(items: list, size: int):
+    for start in range(0, len(items), size):
+        yield items[start : start + size]
+
+
+async def _insert_rows(session: AsyncSession, model, rows: list):
+    # Multi-row INSERTs sized by bind parameters rather than row count; column
+    # defaults are bound per row too, so budget for every column.
+    for chunk in _chunks(rows, MAX_BIND_PARAMS // len(model.__table__.columns)):
+        await session.exec(insert(model).values(chunk))  # type: ignore
+
+
+async def _existing_pairs(session: AsyncSession, pairs: list, chunk_size: int) -> set:
+    existing = set()
+    for chunk in _chunks(pairs, chunk_size):
+        result = await session.exec(
+            select(Product.vendor_id, Product.name).where(
+                tuple_(Product.vendor_id, Product.name).in_(chunk)
+            )
+        )
+        existing.update((vendor_id, name) for vendor_id, name in result.all())
+    return existing
+
+
+async def lock_category_names(session: AsyncSession):
+    await session.exec(select(func.pg_advisory_xact_lock(CATEGORY_LOCK_ID)))
+
+
+async def _select_categories(session: AsyncSession, names: set) -> dict:
+    category_ids = {}
+    for chunk in _chunks(sorted(names), MAX_BIND_PARAMS):
+        result = await session.exec(
+            select(Category.category_name, Category.category_id).where(
+                Category.category_name.in_(chunk)  # type: ignore
+            )
+        )
+        category_ids.update({name: category_id for name, category_id in result.all()})
+    return category_ids
+
+
+async def _resolve_categories(session: AsyncSession, names: set, now: datetime):
+    if not names:
+        return {}, set()
+    category_ids = await _select_categories(session, names)
+    missing = names - category_ids.keys()
+    if not missing:
+        return category_ids, set()
+
+    # category_name has no unique constraint, so writers creating
+    # categories by name take this lock and look again before inserting;
+    # it is held until the caller's transaction ends.
+    await lock_category_names(session)
+    category_ids.update(await _select_categories(session, missing))
+    created = missing - category_ids.keys()
+    rows = [
+        {
+            "category_id": uuid.uuid4(),
+            "category_name": name,
+            "created_at": now,
+            "updated_at": now,
+        }
+        for name in sorted(created)
+    ]
+    await _insert_rows(session, Category, rows)
+    category_ids.update({row["category_name"]: row["category_id"] for row in rows})
+    return category_ids, created
+
+
+async def import_products(
+    session: AsyncSession,
+    products_data: List[ProductCreate],
+    chunk_size: int | None = None,
+    commit: bool = True,
+):
+    # Validates the whole upload up front, then writes products and their
+    # category links with multi-row INSERTs per chunk. A chunk that fails is
+    # rolled back to its savepoint and retried row by row so each bad row
+    # reports its own error; the other chunks still commit.
+    chunk_size = chunk_size or settings.BULK_IMPORT_CHUNK_SIZE
+    now = remove_timezone(datetime.now(timezone.utc))
+    errors = []
+    candidates = []
+    seen = set()
+
+    for index, product_data in enumerate(products_data):
+        if not product_data.vendor_id:
+            errors.append({"index": index, "detail": "Vendor ID is required"})
+            continue
+        key = (product_data.vendor_id, product_data.name)
+        if key in seen:
+            errors.append({"index": index, "detail": "Duplicate product in upload"})
+            continue
+        seen.add(key)
+        candidates.append((index, product_data))
+
+    existing = await _existing_pairs(session, list(seen), min(chunk_size, MAX_BIND_PARAMS // 2))
+    rows = []
+    for index, product_data in candidates:
+        if (product_data.vendor_id, product_data.name) in existing:
+            errors.append({"index": index, "detail": "Product already exists"})
+            continue
+        rows.append((index, product_data))
+
+    category_names = {
+        name for _, product_data in rows for name in (product_data.category_names or [])
+    }
+    category_ids, new_category_names = await _resolve_categories(
+        session, category_names, now
+    )
+
+    success = []
+    product_chunk_size = min(chunk_size, MAX_BIND_PARAMS // len(Product.__table__.columns))  # type: ignore
+    for chunk in _chunks(rows, product_chunk_size):
+        prepared = []
+        for index, product_data in chunk:
+            names = sorted(set(product_data.category_names or []))
+            product_id = uuid.uuid4()
+            prepared.append(
+                (
+                    index,
+                    names,
+                    {
+                        "product_id": product_id,
+                        "vendor_id": product_data.vendor_id,
+                        "name": product_data.name,
+                        "description": product_data.description,
+                        "price": product_data.price,
+                        "stock": product_data.stock,
+                        "image_urls": [],
+                        "created_at": now,
+                        "updated_at": now,
+                    },
+                    [
+                        {
+                            "product_id": product_id,
+                            "category_id": category_ids[name],
+                            "created_at": now,
+                        }
+                        for name in names
+                    ],
+                )
+            )
+        if not prepared:
+            continue
+        try:
+            async with session.begin_nested():
+                await _insert_rows(session, Product, [row for _, _, row, _ in prepared])
+                await _insert_rows(
+                    session, ProductCategory, [link for *_, links in prepared for link in links]
+                )
+            inserted = prepared
+        except Exception:
+            # Replay the failed chunk one row at a time so each row reports
+            # its own error.
+            inserted = []
+            for entry in prepared:
+                index, _, row, links = entry
+                try:
+                    async with session.begin_nested():
+                        await _insert_rows(session, Product, [row])
+                        await _insert_rows(session, ProductCategory, links)
+                except Exception as e:
+                    errors.append({"index": index, "detail": f"Failed to insert: {str(e)}"})
+                    continue
+                inserted.append(entry)
+        success.extend(
+            {
+                "index": index,
+                "product_id": row["product_id"],
+                "name": row["name"],
+                "category_names": names,
+            }
+            for index, names, row, _ in inserted
+        )
+
+    if commit:
+        await session.commit()
+
+    return {
+        "success": success,
+        "errors": sorted(errors, key=lambda error: error["index"]),
+        "new_categories": sorted(new_category_names),
+    }
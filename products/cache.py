@@ -0,0 +1,119 @@
+import hashlib
+import json
+import time
+
+from fastapi.encoders import jsonable_encoder
+from redis.exceptions import RedisError
+
+from config import settings
+from db.redis import redis_client
+
+
+GENERATION_KEY = "search:generation"
+ENTRIES_KEY = "search:entries"
+STATS_KEY = "search:stats"
+ENTRY_PREFIX = "search:entry:"
+
+# One round trip per lookup: resolve the current generation, read the entry
+# and count the hit or miss.
+LOOKUP_SCRIPT = """
+local generation = redis.call('GET', KEYS[1]) or '0'
+local value = redis.call('GET', ARGV[1] .. generation .. ':' .. ARGV[2])
+if value then
+    redis.call('HINCRBY', KEYS[2], 'hits', 1)
+else
+    redis.call('HINCRBY', KEYS[2], 'misses', 1)
+end
+return {generation, value}
+"""
+
+# Store an entry and keep the entry index bounded: drop index members older
+# than the TTL, then evict the oldest entries beyond the size limit.
+STORE_SCRIPT = """
+redis.call('SET', KEYS[1], ARGV[1], 'EX', ARGV[2])
+redis.call('ZADD', KEYS[2], ARGV[3], KEYS[1])
+redis.call('ZREMRANGEBYSCORE', KEYS[2], '-inf', tonumber(ARGV[3]) - tonumber(ARGV[2]))
+local excess = redis.call('ZCARD', KEYS[2]) - tonumber(ARGV[4])
+if excess > 0 then
+    local stale = redis.call('ZRANGE', KEYS[2], 0, excess - 1)
+    redis.call('DEL', unpack(stale))
+    redis.call('ZREMRANGEBYRANK', KEYS[2], 0, excess - 1)
+end
+return excess
+"""
+
+
+def normalize_query(query: str) -> str:
+    return " ".join(str(query).lower().split())
+
+
+class SearchCache:
+    def __init__(self, client=redis_client):
+        self.client = client
+        self._lookup = client.register_script(LOOKUP_SCRIPT)
+        self._store = client.register_script(STORE_SCRIPT)
+
+    @staticmethod
+    def fingerprint(params: dict) -> str:
+        payload = json.dumps(jsonable_encoder(params), sort_keys=True, separators=(",", ":"))
+        return hashlib.sha1(payload.encode()).hexdigest()
+
+    async def get(self, params: dict):
+        # Returns (entry_key, cached_value); entry_key is None when Redis is
+        # unavailable so the caller skips the write as well.
+        fingerprint = self.fingerprint(params)
+        try:
+            generation, value = await self._lookup(
+                keys=[GENERATION_KEY, STATS_KEY], args=[ENTRY_PREFIX, fingerprint]
+            )
+        except RedisError:
+            return None, None
+        key = f"{ENTRY_PREFIX}{generation.decode()}:{fingerprint}"
+        return key, json.loads(value) if value else None
+
+    async def set(self, key: str | None, value: dict):
+        if key is None:
+            return
+        payload = json.dumps(jsonable_encoder(value), separators=(",", ":"))
+        if len(payload) > settings.SEARCH_CACHE_MAX_ENTRY_BYTES:
+            return
+        try:
+            await self._store(
+                keys=[key, ENTRIES_KEY],
+                args=[
+                    payload,
+                    settings.SEARCH_CACHE_TTL_SECONDS,
+                    time.time(),
+                    settings.SEARCH_CACHE_MAX_ENTRIES,
+                ],
+            )
+        except RedisError:
+            pass
+
+    async def invalidate(self):
+        # Entries of older generations become unreachable and age out by TTL.
+        try:
+            await self.client.incr(GENERATION_KEY)
+        except RedisError:
+            pass
+
+    async def stats(self):
+        async with self.client.pipeline(transaction=False) as pipe:
+            pipe.hgetall(STATS_KEY)
+            pipe.zcard(ENTRIES_KEY)
+            pipe.get(GENERATION_KEY)
+            counters, entries, generation = await pipe.execute()
+        hits = int(counters.get(b"hits", 0))
+        misses = int(counters.get(b"misses", 0))
+        return {
+            "hits": hits,
+            "misses": misses,
+            "hit_rate": round(hits / (hits + misses), 4) if hits + misses else None,
+            "entries": entries,
+            "generation": int(generation or 0),
+            "ttl_seconds": settings.SEARCH_CACHE_TTL_SECONDS,
+            "max_entries": settings.SEARCH_CACHE_MAX_ENTRIES,
+        }
+
+
+search_cache = SearchCache()
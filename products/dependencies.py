@@ -0,0 +1,20 @@
+from fastapi import Query
+from typing import List, Optional
+from uuid import UUID
+from products.schemes import ProductSearchFilters
+
+
+def search_filters(
+    min_price: Optional[float] = Query(None, ge=0),
+    max_price: Optional[float] = Query(None, ge=0),
+    category_id: Optional[List[UUID]] = Query(None),
+    in_stock: Optional[bool] = None,
+    vendor_id: Optional[UUID] = None,
+) -> ProductSearchFilters:
+    return ProductSearchFilters(
+        min_price=min_price,
+        max_price=max_price,
+        category_ids=category_id,
+        in_stock=in_stock,
+        vendor_id=vendor_id,
+    )
@@ -0,0 +1,233 @@
+import argparse
+import asyncio
+import csv
+import io
+import json
+from typing import AsyncIterator
+from uuid import UUID
+
+from fastapi import HTTPException, status
+from sqlalchemy import func
+from sqlmodel import select
+
+from config import settings
+from db.models import Category, Product, ProductCategory
+from db.session import AsyncSessionLocal, engine
+from utils.pagination import keyset_after, keyset_order
+
+try:
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+except ImportError:  # parquet export is optional
+    pa = None
+    pq = None
+
+
+FORMATS = {
+    "csv": ("text/csv", "csv"),
+    "ndjson": ("application/x-ndjson", "ndjson"),
+    "parquet": ("application/vnd.apache.parquet", "parquet"),
+}
+COLUMNS = [
+    "product_id",
+    "vendor_id",
+    "name",
+    "description",
+    "price",
+    "stock",
+    "category_names",
+    "image_urls",
+    "created_at",
+    "updated_at",
+]
+# Same list separator the CSV importer understands.
+CSV_LIST_SEPARATOR = "|"
+
+
+def _statement(vendor_id: UUID | None):
+    category_names = (
+        select(func.array_agg(Category.category_name))
+        .join(ProductCategory, ProductCategory.category_id == Category.category_id)  # type: ignore
+        .where(ProductCategory.product_id == Product.product_id)
+        .scalar_subquery()
+    )
+    statement = select(
+        Product.product_id,
+        Product.vendor_id,
+        Product.name,
+        Product.description,
+        Product.price,
+        Product.stock,
+        category_names.label("category_names"),
+        Product.image_urls,
+        Product.created_at,
+        Product.updated_at,
+    )
+    if vendor_id:
+        statement = statement.where(Product.vendor_id == vendor_id)
+    return statement
+
+
+async def iter_batches(
+    vendor_id: UUID | None = None,
+    batch_size: int | None = None,
+    session_factory=AsyncSessionLocal,
+) -> AsyncIterator[list]:
+    # Every batch is read through a server-side cursor in its own short
+    # transaction and the next batch resumes from the (created_at,
+    # product_id) keyset, so no snapshot is held open for the whole dump.
+    batch_size = batch_size or settings.EXPORT_BATCH_SIZE
+    keyset = (Product.created_at, Product.product_id)
+    after = None
+    while True:
+        statement = _statement(vendor_id)
+        if after:
+            statement = keyset_after(statement, keyset, after)
+        statement = keyset_order(statement, keyset).limit(batch_size)
+        async with session_factory() as session:
+            result = await session.stream(
+                statement.execution_options(yield_per=batch_size)
+            )
+            rows = [row._asdict() async for row in result]
+        if not rows:
+            return
+        yield rows
+        if len(rows) < batch_size:
+            return
+        after = (rows[-1]["created_at"], rows[-1]["product_id"])
+
+
+def _plain(row: dict) -> dict:
+    return {
+        **row,
+        "product_id": str(row["product_id"]),
+        "vendor_id": str(row["vendor_id"]),
+        "category_names": sorted(row["category_names"] or []),
+        "image_urls": row["image_urls"] or [],
+        "created_at": row["created_at"].isoformat(),
+        "updated_at": row["updated_at"].isoformat(),
+    }
+
+
+async def _encode_csv(batches) -> AsyncIterator[bytes]:
+    buffer = io.StringIO()
+    writer = csv.DictWriter(buffer, fieldnames=COLUMNS)
+    writer.writeheader()
+    yield buffer.getvalue().encode()
+    buffer.seek(0)
+    buffer.truncate()
+    async for rows in batches:
+        for row in rows:
+            row = _plain(row)
+            row["category_names"] = CSV_LIST_SEPARATOR.join(row["category_names"])
+            row["image_urls"] = CSV_LIST_SEPARATOR.join(row["image_urls"])
+            writer.writerow(row)
+        yield buffer.getvalue().encode()
+        buffer.seek(0)
+        buffer.truncate()
+
+
+async def _encode_ndjson(batches) -> AsyncIterator[bytes]:
+    async for rows in batches:
+        yield "".join(json.dumps(_plain(row)) + "\n" for row in rows).encode()
+
+
+class _StreamSink(io.RawIOBase):
+    # Write-only file object that hands out what pyarrow wrote so far while
+    # still reporting absolute offsets from tell(), which the footer needs.
+    def __init__(self):
+        self._chunks: list[bytes] = []
+        self._position = 0
+
+    def writable(self):
+        return True
+
+    def write(self, data):
+        data = bytes(data)
+        self._chunks.append(data)
+        self._position += len(data)
+        return len(data)
+
+    def tell(self):
+        return self._position
+
+    def drain(self) -> bytes:
+        data = b"".join(self._chunks)
+        self._chunks.clear()
+        return data
+
+
+async def _encode_parquet(batches) -> AsyncIterator[bytes]:
+    schema = pa.schema(
+        [
+            ("product_id", pa.string()),
+            ("vendor_id", pa.string()),
+            ("name", pa.string()),
+            ("description", pa.string()),
+            ("price", pa.float64()),
+            ("stock", pa.int64()),
+            ("category_names", pa.list_(pa.string())),
+            ("image_urls", pa.list_(pa.string())),
+            ("created_at", pa.timestamp("us")),
+            ("updated_at", pa.timestamp("us")),
+        ]
+    )
+    sink = _StreamSink()
+    writer = pq.ParquetWriter(sink, schema)
+    async for rows in batches:
+        rows = [
+            {
+                **row,
+                "product_id": str(row["product_id"]),
+                "vendor_id": str(row["vendor_id"]),
+                "category_names": row["category_names"] or [],
+                "image_urls": row["image_urls"] or [],
+            }
+            for row in rows
+        ]
+        writer.write_table(pa.Table.from_pylist(rows, schema=schema))
+        yield sink.drain()
+    writer.close()
+    yield sink.drain()
+
+
+def check_format(file_format: str):
+    if file_format not in FORMATS:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"Unsupported export format: {file_format}",
+        )
+    if file_format == "parquet" and pa is None:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Parquet export requires pyarrow to be installed",
+        )
+
+
+def stream_export(
+    file_format: str, vendor_id: UUID | None = None, session_factory=AsyncSessionLocal
+) -> AsyncIterator[bytes]:
+    check_format(file_format)
+    batches = iter_batches(vendor_id, session_factory=session_factory)
+    encoders = {"csv": _encode_csv, "ndjson": _encode_ndjson, "parquet": _encode_parquet}
+    return encoders[file_format](batches)
+
+
+async def export_to_file(file_format: str, output: str, vendor_id: UUID | None = None):
+    with open(output, "wb") as handle:
+        async for chunk in stream_export(file_format, vendor_id):
+            await asyncio.to_thread(handle.write, chunk)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Export the product catalog")
+    parser.add_argument("--format", choices=sorted(FORMATS), default="csv")
+    parser.add_argument("--output", required=True)
+    parser.add_argument("--vendor-id", type=UUID, default=None)
+    args = parser.parse_args()
+    engine.echo = False
+    asyncio.run(export_to_file(args.format, args.output, args.vendor_id))
+
+
+if __name__ == "__main__":
+    main()
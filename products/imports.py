@@ -0,0 +1,198 @@
+import asyncio
+import csv
+import json
+import os
+import uuid
+from datetime import datetime, timezone
+from itertools import islice
+from typing import Iterator
+
+import redis.asyncio as red_db
+from fastapi import HTTPException, UploadFile, status
+from pydantic import ValidationError
+
+from config import settings
+from db.session import worker_session_factory
+from products.bulk import import_products
+from products.cache import SearchCache
+from products.schemes import ProductCreate
+
+
+FORMATS = {"ndjson", "csv"}
+UPLOAD_CHUNK_BYTES = 1024 * 1024
+CSV_LIST_SEPARATOR = "|"
+
+
+def job_key(job_id: str) -> str:
+    return f"import:job:{job_id}"
+
+
+def errors_key(job_id: str) -> str:
+    return f"import:job:{job_id}:errors"
+
+
+def detect_format(file: UploadFile, requested: str | None) -> str:
+    file_format = requested
+    if not file_format and file.filename:
+        file_format = os.path.splitext(file.filename)[1].lower().lstrip(".")
+        file_format = {"jsonl": "ndjson"}.get(file_format, file_format)
+    if file_format not in FORMATS:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"Unsupported import format: {file_format}",
+        )
+    return file_format
+
+
+async def spool_upload(file: UploadFile, path: str):
+    # Copy the upload to the shared import directory one chunk at a time;
+    # disk writes run in a worker thread to keep the event loop free.
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    buffer = await asyncio.to_thread(open, path, "wb")
+    try:
+        while chunk := await file.read(UPLOAD_CHUNK_BYTES):
+            await asyncio.to_thread(buffer.write, chunk)
+    finally:
+        await asyncio.to_thread(buffer.close)
+
+
+def iter_rows(path: str, file_format: str) -> Iterator[tuple[int, dict | None, str | None]]:
+    # Yields (row_number, raw_row, parse_error) lazily so memory stays flat
+    # regardless of file size.
+    with open(path, "r", encoding="utf-8-sig", newline="") as handle:
+        if file_format == "csv":
+            for row_number, row in enumerate(csv.DictReader(handle), start=1):
+                row = {key: value for key, value in row.items() if key}
+                names = row.get("category_names") or ""
+                row["category_names"] = [
+                    name.strip() for name in names.split(CSV_LIST_SEPARATOR) if name.strip()
+                ]
+                yield row_number, row, None
+            return
+        row_number = 0
+        for line in handle:
+            if not line.strip():
+                continue
+            row_number += 1
+            try:
+                row = json.loads(line)
+            except json.JSONDecodeError as e:
+                yield row_number, None, f"Invalid JSON: {e.msg}"
+                continue
+            if not isinstance(row, dict):
+                yield row_number, None, "Each line must be a JSON object"
+                continue
+            yield row_number, row, None
+
+
+class ImportJobStore:
+    def __init__(self, client):
+        self.client = client
+
+    async def create(self, job_id: str, vendor_id, file_format: str, filename: str | None):
+        async with self.client.pipeline(transaction=True) as pipe:
+            pipe.hset(
+                job_key(job_id),
+                mapping={
+                    "job_id": job_id,
+                    "status": "queued",
+                    "vendor_id": str(vendor_id),
+                    "format": file_format,
+                    "filename": filename or "",
+                    "created_at": datetime.now(timezone.utc).isoformat(),
+                    "processed": 0,
+                    "succeeded": 0,
+                    "failed": 0,
+                },
+            )
+            pipe.expire(job_key(job_id), settings.IMPORT_JOB_TTL_SECONDS)
+            await pipe.execute()
+
+    async def update(self, job_id: str, **fields):
+        await self.client.hset(job_key(job_id), mapping=fields)
+
+    async def record_chunk(self, job_id: str, processed: int, succeeded: int, errors: list):
+        async with self.client.pipeline(transaction=True) as pipe:
+            pipe.hincrby(job_key(job_id), "processed", processed)
+            pipe.hincrby(job_key(job_id), "succeeded", succeeded)
+            pipe.hincrby(job_key(job_id), "failed", len(errors))
+            if errors:
+                pipe.rpush(errors_key(job_id), *(json.dumps(error) for error in errors))
+                pipe.ltrim(errors_key(job_id), 0, settings.IMPORT_MAX_ERRORS - 1)
+                pipe.expire(errors_key(job_id), settings.IMPORT_JOB_TTL_SECONDS)
+            await pipe.execute()
+
+    async def get(self, job_id: str) -> dict | None:
+        job = await self.client.hgetall(job_key(job_id))
+        if not job:
+            return None
+        job = {key.decode(): value.decode() for key, value in job.items()}
+        for counter in ("processed", "succeeded", "failed"):
+            job[counter] = int(job.get(counter, 0))
+        return job
+
+    async def errors(self, job_id: str, offset: int, limit: int) -> list:
+        rows = await self.client.lrange(errors_key(job_id), offset, offset + limit - 1)
+        return [json.loads(row) for row in rows]
+
+
+async def run_import_job(job_id: str, path: str, file_format: str, vendor_id: str):
+    client = red_db.from_url(settings.REDIS_URL)
+    worker_engine, session_factory = worker_session_factory()
+    jobs = ImportJobStore(client)
+    await jobs.update(
+        job_id, status="running", started_at=datetime.now(timezone.utc).isoformat()
+    )
+    try:
+        rows = iter_rows(path, file_format)
+        while chunk := list(islice(rows, settings.BULK_IMPORT_CHUNK_SIZE)):
+            products = []
+            row_numbers = []
+            errors = []
+            for row_number, row, parse_error in chunk:
+                if parse_error:
+                    errors.append({"row": row_number, "detail": parse_error})
+                    continue
+                try:
+                    product = ProductCreate.model_validate(
+                        {"category_names": None, **row, "vendor_id": vendor_id}
+                    )
+                except ValidationError as e:
+                    errors.append({"row": row_number, "detail": e.errors(include_url=False, include_context=False)})
+                    continue
+                products.append(product)
+                row_numbers.append(row_number)
+
+            succeeded = 0
+            if products:
+                async with session_factory() as session:
+                    report = await import_products(session, products)
+                succeeded = len(report["success"])
+                errors.extend(
+                    {"row": row_numbers[error["index"]], "detail": error["detail"]}
+                    for error in report["errors"]
+                )
+            await jobs.record_chunk(job_id, len(chunk), succeeded, errors)
+
+        await SearchCache(client).invalidate()
+        await jobs.update(
+            job_id, status="completed", finished_at=datetime.now(timezone.utc).isoformat()
+        )
+    except Exception as e:
+        await jobs.update(
+            job_id,
+            status="failed",
+            error=str(e),
+            finished_at=datetime.now(timezone.utc).isoformat(),
+        )
+        raise
+    finally:
+        if os.path.exists(path):
+            os.remove(path)
+        await worker_engine.dispose()
+        await client.aclose()
+
+
+def new_import_path(file_format: str) -> tuple[str, str]:
+    job_id = str(uuid.uuid4())
+    return job_id, os.path.join(settings.IMPORT_DIR, f"{job_id}.{file_format}")
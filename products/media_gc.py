@@ -0,0 +1,221 @@
+import argparse
+import asyncio
+import json
+import os
+import re
+import time
+from datetime import datetime, timezone
+
+import redis.asyncio as red_db
+from redis.exceptions import RedisError
+from sqlalchemy import cast, func
+from sqlalchemy.dialects.postgresql import JSONB, array
+from sqlmodel import select
+
+from config import settings
+from db.models import Product
+from db.redis import redis_client
+from db.session import worker_session_factory
+from utils.image_up import STATIC_DIR
+from utils.image_variants import VARIANT_SIZES, variant_urls
+
+PRODUCTS_DIR = os.path.join(STATIC_DIR, "products")
+CANDIDATES_KEY = "media:gc:candidates"
+LAST_RUN_KEY = "media:gc:last_run"
+LOCK_KEY = "media:gc:lock"
+LOCK_SECONDS = 3600
+SAMPLE_SIZE = 20
+VARIANT_SUFFIX = re.compile(r"_(?:%s)$" % "|".join(VARIANT_SIZES))
+
+
+def content_key(path: str) -> str:
+    # Variants share the original's stem, so they live and die with it.
+    stem = os.path.splitext(path.replace("\\", "/").lstrip("/"))[0]
+    return VARIANT_SUFFIX.sub("", stem)
+
+
+async def enqueue_orphans(image_urls: list[str], client=redis_client):
+    if not image_urls:
+        return
+    try:
+        await client.sadd(CANDIDATES_KEY, *image_urls)
+    except RedisError:
+        # The next full sweep finds these files anyway.
+        pass
+
+
+def _scan(root: str) -> list[tuple[str, int, float]]:
+    files = []
+    for directory, _, names in os.walk(root):
+        for name in names:
+            path = os.path.join(directory, name)
+            try:
+                stat_result = os.stat(path)
+            except FileNotFoundError:
+                continue
+            files.append((path, stat_result.st_size, stat_result.st_mtime))
+    return files
+
+
+def _stat_paths(image_urls: list[str]) -> list[tuple[str, int, float]]:
+    files = []
+    for image_url in image_urls:
+        for url in [image_url, *variant_urls(image_url)]:
+            path = url.lstrip("/")
+            try:
+                stat_result = os.stat(path)
+            except FileNotFoundError:
+                continue
+            files.append((path, stat_result.st_size, stat_result.st_mtime))
+    return files
+
+
+def _remove(paths: list[str], cutoff: float) -> tuple[int, int, list]:
+    deleted = 0
+    freed = 0
+    errors = []
+    for path in paths:
+        try:
+            stat_result = os.stat(path)
+            # Re-uploaded since the scan (image_up touches deduplicated files).
+            if stat_result.st_mtime > cutoff:
+                continue
+            os.remove(path)
+        except FileNotFoundError:
+            continue
+        except OSError as e:
+            errors.append({"path": path, "error": str(e)})
+            continue
+        deleted += 1
+        freed += stat_result.st_size
+
+    for directory in sorted({os.path.dirname(path) for path in paths}, reverse=True):
+        try:
+            os.rmdir(directory)
+        except OSError:
+            pass
+    return deleted, freed, errors
+
+
+async def _referenced_keys(session, image_urls: list[str] | None = None) -> set:
+    image_urls_jsonb = cast(Product.image_urls, JSONB)
+    statement = select(func.jsonb_array_elements_text(image_urls_jsonb)).distinct()
+    if image_urls is not None:
+        statement = statement.where(image_urls_jsonb.op("?|")(array(image_urls)))
+    result = await session.stream(statement.execution_options(yield_per=5000))
+    return {content_key(url) async for url in result.scalars()}
+
+
+async def _take_candidates(client, dry_run: bool) -> list[str]:
+    if dry_run:
+        members = await client.srandmember(CANDIDATES_KEY, settings.MEDIA_GC_BATCH_SIZE)
+    else:
+        members = await client.spop(CANDIDATES_KEY, settings.MEDIA_GC_BATCH_SIZE)
+    return [member.decode() for member in members or []]
+
+
+async def collect(full: bool = False, dry_run: bool = False, client=None, session_factory=None):
+    # Candidate runs only look at URLs enqueued by deletes; full sweeps diff
+    # every file under static/images/products against the catalog, which also
+    # catches leftovers of failed uploads. Files touched within the grace
+    # period are never removed, since their product row may not be committed.
+    owns_client = client is None
+    client = client or red_db.from_url(settings.REDIS_URL)
+    worker_engine = None
+    if session_factory is None:
+        worker_engine, session_factory = worker_session_factory()
+
+    started = time.time()
+    cutoff = started - settings.MEDIA_GC_GRACE_SECONDS
+    metrics = {
+        "mode": "full" if full else "candidates",
+        "dry_run": dry_run,
+        "started_at": datetime.now(timezone.utc).isoformat(),
+        "scanned": 0,
+        "young": 0,
+        "orphans": 0,
+        "deleted": 0,
+        "bytes_freed": 0,
+        "errors": 0,
+    }
+    locked = False
+    try:
+        if not dry_run:
+            locked = await client.set(LOCK_KEY, started, nx=True, ex=LOCK_SECONDS)
+            if not locked:
+                return {**metrics, "skipped": "another collection is running"}
+
+        orphans = []
+        while True:
+            if full:
+                candidate_urls = None
+                files = await asyncio.to_thread(_scan, PRODUCTS_DIR)
+            else:
+                candidate_urls = await _take_candidates(client, dry_run)
+                if not candidate_urls:
+                    break
+                files = await asyncio.to_thread(_stat_paths, candidate_urls)
+
+            # Files are listed before references are read, so anything
+            # referenced by the time we look is kept.
+            async with session_factory() as session:
+                referenced = await _referenced_keys(session, candidate_urls)
+
+            metrics["scanned"] += len(files)
+            batch = []
+            for path, size, mtime in files:
+                if mtime > cutoff:
+                    metrics["young"] += 1
+                elif os.path.basename(path).startswith(".") or content_key(path) not in referenced:
+                    batch.append(path)
+            metrics["orphans"] += len(batch)
+            orphans.extend(batch[: SAMPLE_SIZE - len(orphans)])
+
+            if not dry_run and batch:
+                deleted, freed, errors = await asyncio.to_thread(_remove, batch, cutoff)
+                metrics["deleted"] += deleted
+                metrics["bytes_freed"] += freed
+                metrics["errors"] += len(errors)
+            if full or dry_run:
+                break
+
+        metrics["sample"] = orphans
+        metrics["duration_seconds"] = round(time.time() - started, 3)
+        metrics["finished_at"] = datetime.now(timezone.utc).isoformat()
+        if not dry_run:
+            await client.hset(
+                LAST_RUN_KEY,
+                mapping={key: json.dumps(value) for key, value in metrics.items()},
+            )
+        return metrics
+    finally:
+        if locked:
+            await client.delete(LOCK_KEY)
+        if worker_engine is not None:
+            await worker_engine.dispose()
+        if owns_client:
+            await client.aclose()
+
+
+async def gc_stats(client=redis_client) -> dict:
+    async with client.pipeline(transaction=False) as pipe:
+        pipe.hgetall(LAST_RUN_KEY)
+        pipe.scard(CANDIDATES_KEY)
+        last_run, candidates = await pipe.execute()
+    return {
+        "pending_candidates": candidates,
+        "last_run": {key.decode(): json.loads(value) for key, value in last_run.items()} or None,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Remove product images nothing references")
+    parser.add_argument("--full", action="store_true", help="diff every stored file, not just enqueued deletes")
+    parser.add_argument("--dry-run", action="store_true", help="report orphans without deleting")
+    args = parser.parse_args()
+    metrics = asyncio.run(collect(full=args.full, dry_run=args.dry_run))
+    print(json.dumps(metrics, indent=2))
+
+
+if __name__ == "__main__":
+    main()
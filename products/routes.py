@@ -2,10 +2,20 @@ from fastapi import APIRouter, Depends, Query, UploadFile,Form, File
 from sqlmodel.ext.asyncio.session import AsyncSession
 from db.session import get_session
 from db.models import UserRole, User
-from auth.dependencies import RoleChecker
-from typing import List, Optional
-from products.schemes import ProductResponse, ProductCreate, ProductUpdate
+from auth.dependencies import RoleChecker, get_current_user
+from typing import List, Literal, Optional
+from products.schemes import (
+    ProductResponse,
+    ProductCreate,
+    ProductSearchFilters,
+    ProductUpdate,
+    StockReservationCreate,
+    StockReservationResponse,
+)
+from products.dependencies import search_filters
 from products.services import ProductService
+from products.stock import stock_service
+from config import settings
 import uuid
 
 
@@ -17,12 +27,24 @@ product_services = ProductService()
 async def all_products(
     session: AsyncSession = Depends(get_session),
     limit: int = Query(5, ge=1, le=100),  # Limit between 1 and 100
-    cursor: Optional[uuid.UUID] = None,
+    cursor: Optional[str] = None,
+    image_size: Literal["thumb", "card", "detail", "original"] = "card",
 ):
-    products_data = await product_services.get_all_products(session, limit=limit, cursor=cursor)
+    products_data = await product_services.get_all_products(
+        session, limit=limit, cursor=cursor, image_size=image_size
+    )
     return products_data
 
 
+@Product_router.get("/suggest", response_model=dict)
+async def suggest_products(
+    q: str = Query(..., min_length=1, max_length=64),
+    limit: int = Query(10, ge=1, le=25),
+    session: AsyncSession = Depends(get_session),
+):
+    return await product_services.suggest(session, q, limit=limit)
+
+
 @Product_router.post("/", response_model=ProductResponse)
 async def add_product(
     product_data: ProductCreate,
@@ -46,14 +68,85 @@ async def add_products_bulk(
     result = await product_services.create_bulk_products(session, products_data)
     return result
 
+@Product_router.get("/export")
+async def export_products(
+    file_format: Literal["csv", "ndjson", "parquet"] = Query("csv"),
+    vendor: User = Depends(RoleChecker([UserRole.vendor, UserRole.admin])),
+):
+    return product_services.export_products(file_format, vendor.user_id, vendor.role)
+
+
+@Product_router.post("/import", response_model=dict, status_code=202)
+async def upload_product_import(
+    file: UploadFile = File(...),
+    file_format: Optional[Literal["ndjson", "csv"]] = Form(None),
+    vendor: User = Depends(RoleChecker([UserRole.vendor])),
+):
+    return await product_services.start_import(file, file_format, vendor.user_id)
+
+
+@Product_router.get("/import/{job_id}", response_model=dict)
+async def get_import_job(
+    job_id: str,
+    vendor: User = Depends(RoleChecker([UserRole.vendor])),
+):
+    return await product_services.get_import_job(job_id, vendor.user_id)
+
+
+@Product_router.get("/import/{job_id}/errors", response_model=dict)
+async def get_import_errors(
+    job_id: str,
+    offset: int = Query(0, ge=0),
+    limit: int = Query(100, ge=1, le=1000),
+    vendor: User = Depends(RoleChecker([UserRole.vendor])),
+):
+    return await product_services.get_import_errors(job_id, vendor.user_id, offset, limit)
+
+
+@Product_router.get("/search-cache/stats", response_model=dict)
+async def search_cache_stats(
+    _: User = Depends(RoleChecker([UserRole.admin])),
+):
+    return await product_services.search_cache_stats()
+
+
+@Product_router.get("/media-gc/stats", response_model=dict)
+async def media_gc_stats(
+    _: User = Depends(RoleChecker([UserRole.admin])),
+):
+    return await product_services.media_gc_stats()
+
+
+@Product_router.post("/media-gc/run", response_model=dict, status_code=202)
+async def run_media_gc(
+    full: bool = Query(False, description="Diff every stored file, not only deleted products"),
+    dry_run: bool = Query(True, description="Report orphans without deleting them"),
+    _: User = Depends(RoleChecker([UserRole.admin])),
+):
+    return product_services.start_media_gc(full, dry_run)
+
+
 @Product_router.get("/search/{product_query}", response_model=dict)
 async def show_product(
     product_query,
     session: AsyncSession = Depends(get_session),
     limit: int = Query(5, ge=1, le=100),  # Limit between 1 and 100
-    cursor: Optional[uuid.UUID] = None,
+    cursor: Optional[str] = None,
+    fuzzy: bool = Query(False, description="Tolerate typos and partial words"),
+    filters: ProductSearchFilters = Depends(search_filters),
+    facets: bool = Query(True, description="Include category and price facet counts"),
+    image_size: Literal["thumb", "card", "detail", "original"] = "card",
 ):
-    product = await product_services.get_product(session, product_query, limit=limit, cursor=cursor)
+    product = await product_services.get_product(
+        session,
+        product_query,
+        limit=limit,
+        cursor=cursor,
+        fuzzy=fuzzy,
+        filters=filters,
+        facets=facets,
+        image_size=image_size,
+    )
     return product
 
 
@@ -77,4 +170,52 @@ async def upload_product_images(
     files: List[UploadFile] = File(...),
     session: AsyncSession = Depends(get_session),
 ):
-    return await product_services.upload_images(session, product_id, files)
\ No newline at end of file
+    return await product_services.upload_images(session, product_id, files)
+
+
+@Product_router.post("/{product_id}/reservations", response_model=StockReservationResponse, status_code=201)
+async def reserve_stock(
+    product_id: uuid.UUID,
+    reservation: StockReservationCreate,
+    session: AsyncSession = Depends(get_session),
+    user: User = Depends(get_current_user),
+):
+    return await stock_service.reserve(session, product_id, reservation.quantity, user.user_id)
+
+
+@Product_router.delete("/{product_id}/reservations/{reservation_id}", response_model=dict)
+async def release_stock(
+    product_id: uuid.UUID,
+    reservation_id: uuid.UUID,
+    session: AsyncSession = Depends(get_session),
+    user: User = Depends(get_current_user),
+):
+    return await stock_service.release(session, product_id, reservation_id, user.user_id)
+
+
+@Product_router.get("/{product_id}/stock", response_model=dict)
+async def stock_levels(
+    product_id: uuid.UUID,
+    session: AsyncSession = Depends(get_session),
+    _: User = Depends(RoleChecker([UserRole.vendor, UserRole.admin])),
+):
+    return await stock_service.levels(session, product_id)
+
+
+@Product_router.put("/{product_id}/hot", response_model=dict)
+async def promote_hot_product(
+    product_id: uuid.UUID,
+    allocation: int = Query(settings.STOCK_HOT_ALLOCATION, ge=1, le=10_000, description="Units moved to Redis per refill"),
+    session: AsyncSession = Depends(get_session),
+    _: User = Depends(RoleChecker([UserRole.admin])),
+):
+    return await stock_service.promote(session, product_id, allocation)
+
+
+@Product_router.delete("/{product_id}/hot", response_model=dict)
+async def demote_hot_product(
+    product_id: uuid.UUID,
+    session: AsyncSession = Depends(get_session),
+    _: User = Depends(RoleChecker([UserRole.admin])),
+):
+    return await stock_service.demote(session, product_id)
@@ -2,7 +2,7 @@ from sqlmodel import SQLModel
 from sqlmodel import Field
 from db.models import ProductBase
 from datetime import datetime
-from typing import Optional, List
+from typing import Dict, Optional, List
 from uuid import UUID
 
 
@@ -21,6 +21,14 @@ class ProductUpdate(SQLModel):
 
 
 
+class ProductSearchFilters(SQLModel):
+    min_price: Optional[float] = Field(default=None, ge=0)
+    max_price: Optional[float] = Field(default=None, ge=0)
+    category_ids: Optional[List[UUID]] = None
+    in_stock: Optional[bool] = None
+    vendor_id: Optional[UUID] = None
+
+
 class ProductCategoryLink(SQLModel):
     category_id: UUID
     category_name: str
@@ -31,8 +39,22 @@ class ProductResponse(ProductBase):
     created_at: datetime
     categories: List[ProductCategoryLink]
     image_urls: Optional[List[str]]= []
+    image_variants: Optional[Dict[str, Dict[str, Dict[str, str]]]] = {}
+    preview_image_url: Optional[str] = None
 
 
 class ProductListResponse(SQLModel):
     total: int
     products: ProductResponse
+
+
+class StockReservationCreate(SQLModel):
+    quantity: int = Field(default=1, ge=1)
+
+
+class StockReservationResponse(SQLModel):
+    reservation_id: UUID
+    product_id: UUID
+    quantity: int
+    expires_at: datetime
+    source: str
@@ -1,15 +1,40 @@
 from uuid import UUID
-from db.models import Product, Category, ProductCategory
-from products.schemes import ProductCreate, ProductResponse, ProductUpdate
+from db.models import Product, Category, CategoryClosure, ProductCategory
+from products.schemes import (
+    ProductCreate,
+    ProductResponse,
+    ProductSearchFilters,
+    ProductUpdate,
+)
 from categories.services import CategoryService
 from fastapi import UploadFile
+from fastapi.responses import StreamingResponse
 from typing import List, Optional
-from sqlmodel import and_, select, desc
+from sqlmodel import and_, select, union
+from sqlalchemy import String, case, cast, distinct, exists, literal, true, union_all
 from sqlalchemy.orm import selectinload
 from sqlmodel.ext.asyncio.session import AsyncSession
 from sqlalchemy.sql import func
 from db.models import UserRole
+from products.bulk import import_products, lock_category_names
+from products.cache import normalize_query, search_cache
+from products.export import FORMATS as EXPORT_FORMATS, stream_export
+from products.imports import ImportJobStore, detect_format, new_import_path, spool_upload
+from products.media_gc import enqueue_orphans, gc_stats
+from products.suggest import CATEGORY, PRODUCT, suggestion_index
+from products.variants import preview_image_url
 from utils import image_up
+from config import settings
+from db.redis import redis_client
+from celery_tasks import collect_orphan_images, generate_image_variants, import_products_file
+from utils.pagination import (
+    decode_cursor,
+    keyset_after,
+    keyset_order,
+    next_cursor,
+    parse_created_cursor,
+)
+from datetime import datetime
 import os
 import json
 
@@ -17,109 +42,390 @@ import json
 from fastapi import HTTPException, status
 
 category_services = CategoryService()
+import_jobs = ImportJobStore(redis_client)
+
+# Lower bounds of the price facet buckets; the last bucket is open ended.
+PRICE_BUCKETS = (0, 100, 250, 500, 1000, 2500)
 
 
 class ProductService:
+    def _response(self, product: Product, image_size: str = "card") -> ProductResponse:
+        response = ProductResponse.model_validate(product)
+        response.preview_image_url = preview_image_url(
+            response.image_urls, response.image_variants, image_size
+        )
+        return response
+
     async def get_all_products(
-        self, session: AsyncSession, limit: int = 5, cursor: UUID | None = None
+        self,
+        session: AsyncSession,
+        limit: int = 5,
+        cursor: str | None = None,
+        image_size: str = "card",
     ):
         try:
+            keyset = (Product.created_at, Product.product_id)
             statement = select(Product).options(selectinload(Product.categories))  # type: ignore
 
-            if cursor:
-                statement = statement.where(Product.product_id < cursor)
+            cursor_values = parse_created_cursor(cursor)
+            if cursor_values:
+                statement = keyset_after(statement, keyset, cursor_values)
 
-            statement = statement.order_by(desc(Product.created_at)).limit(limit)
+            statement = keyset_order(statement, keyset).limit(limit)
 
             result = await session.exec(statement)
             products = result.all()
             product_responses = [
-                ProductResponse.model_validate(product) for product in products
+                self._response(product, image_size) for product in products
             ]
 
-            next_cursor = products[-1].product_id if len(products) == limit else None
-
             return {
                 "products": product_responses,
                 "limit": limit,
-                "next_cursor": next_cursor,
+                "next_cursor": next_cursor(
+                    products, limit, lambda p: (p.created_at, p.product_id)
+                ),
             }
 
+        except HTTPException:
+            raise
         except Exception as e:
             raise HTTPException(
                 status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
                 detail=f"FAILED TO FETCH PRODUCTS: {str(e)}",
             )
 
+    async def get_category_products(
+        self,
+        session: AsyncSession,
+        category_id: UUID,
+        limit: int = 20,
+        cursor: str | None = None,
+        image_size: str = "card",
+    ):
+        if not await session.get(Category, category_id):
+            raise HTTPException(
+                status_code=status.HTTP_404_NOT_FOUND, detail="Category not found"
+            )
+        try:
+            # One query for the whole subtree: the closure table turns "any
+            # category below this one" into an indexed semi-join, walked in
+            # (created_at, product_id) order.
+            in_subtree = exists().where(
+                ProductCategory.product_id == Product.product_id,
+                CategoryClosure.descendant_id == ProductCategory.category_id,
+                CategoryClosure.ancestor_id == category_id,
+            )
+            keyset = (Product.created_at, Product.product_id)
+            statement = (
+                select(Product)
+                .where(in_subtree)
+                .options(selectinload(Product.categories))  # type: ignore
+            )
+            cursor_values = parse_created_cursor(cursor)
+            if cursor_values:
+                statement = keyset_after(statement, keyset, cursor_values)
+            statement = keyset_order(statement, keyset).limit(limit)
+
+            result = await session.exec(statement)
+            products = result.all()
+            return {
+                "category_id": category_id,
+                "products": [self._response(product, image_size) for product in products],
+                "limit": limit,
+                "next_cursor": next_cursor(
+                    products, limit, lambda p: (p.created_at, p.product_id)
+                ),
+            }
+        except HTTPException:
+            raise
+        except Exception as e:
+            raise HTTPException(
+                status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+                detail=f"FAILED TO FETCH CATEGORY PRODUCTS: {str(e)}",
+            )
+
     async def get_product(
         self,
         session: AsyncSession,
         product_query,
         limit: int = 5,
-        cursor: UUID | None = None,
+        cursor: str | None = None,
+        fuzzy: bool = False,
+        filters: ProductSearchFilters | None = None,
+        facets: bool = False,
+        image_size: str = "card",
+    ):
+        cache_params = {
+            "query": normalize_query(product_query),
+            "limit": limit,
+            "cursor": cursor,
+            "fuzzy": fuzzy,
+            "filters": (filters or ProductSearchFilters()).model_dump(),
+            "facets": facets,
+            "image_size": image_size,
+        }
+        cache_key, cached = await search_cache.get(cache_params)
+        if cached is not None:
+            return cached
+
+        response = await self._find_products(
+            session, product_query, limit, cursor, fuzzy, filters, facets, image_size
+        )
+        await search_cache.set(cache_key, response)
+        return response
+
+    async def _find_products(
+        self,
+        session: AsyncSession,
+        product_query,
+        limit: int,
+        cursor: str | None,
+        fuzzy: bool,
+        filters: ProductSearchFilters | None,
+        facets: bool,
+        image_size: str = "card",
     ):
         try:
-            statement = None
             try:
                 product_uuid = UUID(product_query)
+            except ValueError:
+                product_uuid = None
+
+            if product_uuid:
                 statement = (
                     select(Product)
                     .options(selectinload(Product.categories))  # type: ignore
                     .where(Product.product_id == product_uuid)
                 )
-
-            except ValueError:
-                # Not a valid UUID, perform a name search
-                ts_query = func.plainto_tsquery("english", product_query)
-                statement = (
-                    select(Product)
-                    .options(selectinload(Product.categories))  # type: ignore
-                    .where(Product.name_tsv.op("@@")(ts_query))  # type: ignore
-                    .order_by(
-                        func.ts_rank_cd(Product.name_tsv, ts_query).desc()
-                    )  # Rank results
+                result = await session.exec(statement)
+                return {
+                    "products": [
+                        self._response(product, image_size)
+                        for product in result.all()
+                    ],
+                    "limit": limit,
+                    "next_cursor": None,
+                }
+
+            # Not a valid UUID, run one ranked query over the weighted
+            # name/category/description document.
+            ts_query = func.plainto_tsquery("english", product_query)
+            rank = func.ts_rank_cd(Product.search_tsv, ts_query)
+            if fuzzy:
+                rank = rank + func.word_similarity(product_query, Product.name)
+                match_clause = Product.product_id.in_(  # type: ignore
+                    await self._fuzzy_matches(session, product_query, ts_query)
                 )
-                if cursor:
-                    statement = statement.where(Product.product_id < cursor)
-                statement = statement.limit(limit)
+            else:
+                match_clause = Product.search_tsv.op("@@")(ts_query)  # type: ignore
 
-            result = await session.exec(statement)
-            product_data = result.all()
-
-            if not product_data:
-                category_ts_query = func.plainto_tsquery("english", product_query)
-                category_statement = (
-                    select(Product)
-                    .join(Category, Product.categories)  # type: ignore
-                    .where(Category.name_tsv.op("@@")(category_ts_query))  # type: ignore
-                    .options(selectinload(Product.categories))  # type: ignore
+            filters = filters or ProductSearchFilters()
+            statement = (
+                select(Product, rank)
+                .where(match_clause, *self._filter_clauses(filters))
+                .options(selectinload(Product.categories))  # type: ignore
+            )
+            keyset = (rank, Product.created_at, Product.product_id)
+            if cursor:
+                cursor_values = decode_cursor(
+                    cursor, float, datetime.fromisoformat, UUID
                 )
-                if cursor:
-                    category_statement = category_statement.where(
-                        Product.product_id < cursor
-                    )
-                category_statement = category_statement.limit(limit)
+                statement = keyset_after(statement, keyset, cursor_values)
+            statement = keyset_order(statement, keyset).limit(limit)
 
-                category_result = await session.exec(category_statement)
-                product_data = category_result.all()
+            result = await session.exec(statement)
+            rows = result.all()
+            product_data = [product for product, _ in rows]
+            cursor_key = lambda row: (row[1], row[0].created_at, row[0].product_id)
 
-            next_cursor = (
-                product_data[-1].product_id if len(product_data) == limit else None
-            )
             product_responses = [
-                ProductResponse.model_validate(product) for product in product_data
+                self._response(product, image_size) for product in product_data
             ]
-            return {
+            response = {
                 "products": product_responses,
                 "limit": limit,
-                "next_cursor": next_cursor,  # Ideally, fetch total count separately if needed
+                "next_cursor": next_cursor(rows, limit, cursor_key),
             }
+            # Facets describe the whole result set, so later pages reuse the
+            # ones returned with the first page.
+            if facets and not cursor:
+                response["facets"] = await self._facet_counts(
+                    session, match_clause, filters
+                )
+            return response
+        except HTTPException:
+            raise
         except Exception as e:
             raise HTTPException(
                 status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
                 detail=f"FAILED TO FETCH PRODUCT: {str(e)}",
             )
 
+    def _price_clauses(self, filters: ProductSearchFilters):
+        clauses = []
+        if filters.min_price is not None:
+            clauses.append(Product.price >= filters.min_price)
+        if filters.max_price is not None:
+            clauses.append(Product.price <= filters.max_price)
+        return clauses
+
+    def _category_clauses(self, filters: ProductSearchFilters):
+        if not filters.category_ids:
+            return []
+        return [
+            exists().where(
+                ProductCategory.product_id == Product.product_id,
+                ProductCategory.category_id.in_(filters.category_ids),  # type: ignore
+            )
+        ]
+
+    def _common_clauses(self, filters: ProductSearchFilters):
+        clauses = []
+        if filters.in_stock:
+            clauses.append(Product.stock > 0)
+        if filters.vendor_id:
+            clauses.append(Product.vendor_id == filters.vendor_id)
+        return clauses
+
+    def _filter_clauses(self, filters: ProductSearchFilters):
+        return (
+            self._common_clauses(filters)
+            + self._price_clauses(filters)
+            + self._category_clauses(filters)
+        )
+
+    async def _facet_counts(
+        self, session: AsyncSession, match_clause, filters: ProductSearchFilters
+    ):
+        # Each facet ignores its own filter so the sidebar still shows the
+        # alternatives, and both facets come back from one statement.
+        matches = (
+            select(
+                Product.product_id,
+                Product.price,
+                and_(true(), *self._price_clauses(filters)).label("price_ok"),
+                and_(true(), *self._category_clauses(filters)).label("category_ok"),
+            )
+            .where(match_clause, *self._common_clauses(filters))
+            .cte("matches")
+        )
+
+        category_facet = (
+            select(
+                literal("category", String).label("facet"),
+                cast(Category.category_id, String).label("value"),
+                Category.category_name.label("label"),  # type: ignore
+                func.count(distinct(matches.c.product_id)).label("count"),
+            )
+            .select_from(matches)
+            .join(ProductCategory, ProductCategory.product_id == matches.c.product_id)  # type: ignore
+            .join(Category, Category.category_id == ProductCategory.category_id)  # type: ignore
+            .where(matches.c.price_ok)
+            .group_by(Category.category_id, Category.category_name)
+        )
+
+        bucket = case(
+            *[
+                (matches.c.price < upper, literal(f"{lower}-{upper}", String))
+                for lower, upper in zip(PRICE_BUCKETS, PRICE_BUCKETS[1:])
+            ],
+            else_=literal(f"{PRICE_BUCKETS[-1]}+", String),
+        )
+        buckets = (
+            select(bucket.label("bucket"))
+            .select_from(matches)
+            .where(matches.c.category_ok)
+            .subquery()
+        )
+        price_facet = select(
+            literal("price", String).label("facet"),
+            buckets.c.bucket.label("value"),
+            buckets.c.bucket.label("label"),
+            func.count().label("count"),
+        ).group_by(buckets.c.bucket)
+
+        result = await session.exec(union_all(category_facet, price_facet))  # type: ignore
+        categories = []
+        prices = {}
+        for facet, value, label, count in result.all():
+            if facet == "category":
+                categories.append(
+                    {"category_id": value, "category_name": label, "count": count}
+                )
+            else:
+                prices[value] = count
+
+        bucket_labels = [
+            f"{lower}-{upper}" for lower, upper in zip(PRICE_BUCKETS, PRICE_BUCKETS[1:])
+        ] + [f"{PRICE_BUCKETS[-1]}+"]
+        return {
+            "categories": sorted(categories, key=lambda c: -c["count"]),
+            "price": [
+                {"bucket": label, "count": prices.get(label, 0)} for label in bucket_labels
+            ],
+        }
+
+    async def _fuzzy_matches(self, session: AsyncSession, product_query: str, ts_query):
+        # word_similarity operators (%>) read the threshold from a GUC; scope it
+        # to this transaction so pooled connections are left untouched.
+        await session.exec(
+            select(
+                func.set_config(
+                    "pg_trgm.word_similarity_threshold",
+                    str(settings.SEARCH_SIMILARITY_THRESHOLD),
+                    True,
+                )
+            )
+        )
+        # Each branch is served by its own GIN index; the union lets Postgres
+        # use all three instead of falling back to a sequential scan on OR.
+        return union(
+            select(Product.product_id).where(Product.search_tsv.op("@@")(ts_query)),  # type: ignore
+            select(Product.product_id).where(Product.name.op("%>")(product_query)),  # type: ignore
+            select(ProductCategory.product_id)
+            .join(Category, Category.category_id == ProductCategory.category_id)  # type: ignore
+            .where(Category.category_name.op("%>")(product_query)),  # type: ignore
+        )
+
+    async def search_cache_stats(self):
+        try:
+            return await search_cache.stats()
+        except Exception as e:
+            raise HTTPException(
+                status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+                detail=f"SEARCH CACHE UNAVAILABLE: {str(e)}",
+            )
+
+    async def media_gc_stats(self):
+        try:
+            return await gc_stats()
+        except Exception as e:
+            raise HTTPException(
+                status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+                detail=f"MEDIA GC STATS UNAVAILABLE: {str(e)}",
+            )
+
+    def start_media_gc(self, full: bool, dry_run: bool):
+        try:
+            task = collect_orphan_images.delay(full=full, dry_run=dry_run)
+        except Exception as e:
+            raise HTTPException(
+                status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+                detail=f"FAILED TO START MEDIA GC: {str(e)}",
+            )
+        return {"task_id": task.id, "full": full, "dry_run": dry_run}
+
+    async def suggest(self, session: AsyncSession, prefix: str, limit: int = 10):
+        try:
+            await suggestion_index.ensure_loaded(session)
+        except Exception as e:
+            raise HTTPException(
+                status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+                detail=f"FAILED TO LOAD SUGGESTIONS: {str(e)}",
+            )
+        return {"query": prefix, "suggestions": suggestion_index.suggest(prefix, limit)}
+
     async def create_new_product(
         self, session: AsyncSession, product_data: ProductCreate,
     ):
@@ -141,11 +447,20 @@ class ProductService:
                 raise HTTPException(status_code=400, detail="Product already exists")
 
             category_ids = []
+            categories = []
+            missing_names = set()
             if category_names:
                 result = await session.exec(select(Category).where(Category.category_name.in_(category_names)))  # type: ignore
                 categories = list(result.all())
                 existing_names = {category.category_name for category in categories}
                 missing_names = set(category_names) - existing_names
+                if missing_names:
+                    # Same lock as bulk imports, so a name is only created once.
+                    await lock_category_names(session)
+                    result = await session.exec(select(Category).where(Category.category_name.in_(missing_names)))  # type: ignore
+                    raced = list(result.all())
+                    categories.extend(raced)
+                    missing_names -= {category.category_name for category in raced}
                 new_categories = [
                     Category(category_name=name) for name in missing_names  # type: ignore
                 ]
@@ -168,6 +483,14 @@ class ProductService:
             await session.commit()
             await session.refresh(new_product)
 
+            await search_cache.invalidate()
+            suggestion_index.add(new_product.name, PRODUCT)
+            for category in categories:
+                if category.category_name in missing_names:
+                    suggestion_index.add(category.category_name, CATEGORY, popularity=1)
+                else:
+                    suggestion_index.bump(category.category_name, CATEGORY)
+
             statement = (
                 select(Product)
                 .options(selectinload(Product.categories))  # type: ignore
@@ -176,7 +499,7 @@ class ProductService:
             result = await session.exec(statement)
             new_product_with_categories = result.one()
             product_responses = [
-                ProductResponse.model_validate(product)
+                self._response(product)
                 for product in new_product_with_categories
             ]
             return product_responses
@@ -191,17 +514,76 @@ class ProductService:
     async def create_bulk_products(
         self, session: AsyncSession, products_data: List[ProductCreate]
     ):
-        results = []
-        errors = []
-        for index, product_data in enumerate(products_data):
-            try:
-                product = await self.create_new_product(session, product_data)
-                results.append({"index": index, "product": product})
-            except HTTPException as e:
-                errors.append({"index": index, "detail": e.detail})
-            except Exception as e:
-                errors.append({"index": index, "detail": f"Unexpected error: {str(e)}"})
-        return {"success": results, "errors": errors}
+        try:
+            report = await import_products(session, products_data)
+        except Exception as e:
+            await session.rollback()
+            raise HTTPException(
+                status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+                detail=f"FAILED TO IMPORT PRODUCTS: {str(e)}",
+            )
+        self._index_imported(report)
+        await search_cache.invalidate()
+        return report
+
+    def _index_imported(self, report: dict):
+        new_categories = set(report["new_categories"])
+        for category_name in new_categories:
+            suggestion_index.add(category_name, CATEGORY)
+        for row in report["success"]:
+            suggestion_index.add(row["name"], PRODUCT)
+            for category_name in row["category_names"]:
+                suggestion_index.bump(category_name, CATEGORY)
+
+    async def start_import(self, file: UploadFile, file_format: str | None, vendor_id: UUID):
+        file_format = detect_format(file, file_format)
+        job_id, path = new_import_path(file_format)
+        try:
+            await spool_upload(file, path)
+            await import_jobs.create(job_id, vendor_id, file_format, file.filename)
+            import_products_file.delay(job_id, path, file_format, str(vendor_id))
+        except Exception as e:
+            if os.path.exists(path):
+                os.remove(path)
+            raise HTTPException(
+                status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+                detail=f"FAILED TO START IMPORT: {str(e)}",
+            )
+        return {"job_id": job_id, "status": "queued"}
+
+    async def _get_import_job(self, job_id: str, vendor_id: UUID):
+        job = await import_jobs.get(job_id)
+        if not job or job["vendor_id"] != str(vendor_id):
+            raise HTTPException(
+                status_code=status.HTTP_404_NOT_FOUND, detail="Import job not found"
+            )
+        return job
+
+    async def get_import_job(self, job_id: str, vendor_id: UUID):
+        return await self._get_import_job(job_id, vendor_id)
+
+    async def get_import_errors(
+        self, job_id: str, vendor_id: UUID, offset: int = 0, limit: int = 100
+    ):
+        job = await self._get_import_job(job_id, vendor_id)
+        return {
+            "job_id": job_id,
+            "failed": job["failed"],
+            "offset": offset,
+            "errors": await import_jobs.errors(job_id, offset, limit),
+        }
+
+    def export_products(self, file_format: str, user_id: UUID, role):
+        # Vendors export their own catalog; admins get everything.
+        vendor_id = None if UserRole.admin in role else user_id
+        media_type, extension = EXPORT_FORMATS[file_format]
+        return StreamingResponse(
+            stream_export(file_format, vendor_id),
+            media_type=media_type,
+            headers={
+                "Content-Disposition": f'attachment; filename="catalog.{extension}"'
+            },
+        )
 
     async def update_product(
         self,
@@ -231,24 +613,40 @@ class ProductService:
                 status_code=status.HTTP_405_METHOD_NOT_ALLOWED,
                 detail="Only admins are allowed to update other vendor products",
             )
+        previous_name = product_to_update.name
+        previous_urls = list(product_to_update.image_urls or [])
         for key, value in product_update.model_dump(exclude_unset=True).items():
             setattr(product_to_update, key, value)
 
+        new_image_urls = []
         if images:
             image_urls = product_to_update.image_urls or []
-            for image in images:
-                image_url = await image_up.save_image(image, subdir=f"products/{product_id}")
-                image_urls.append(image_url)
-            product_to_update.image_urls = image_urls
+            new_image_urls = await image_up.save_images(images)
+            product_to_update.image_urls = image_urls + new_image_urls
+        # Drop variants of images that are no longer attached.
+        kept_urls = set(product_to_update.image_urls or [])
+        product_to_update.image_variants = {
+            url: variants
+            for url, variants in (product_to_update.image_variants or {}).items()
+            if url in kept_urls
+        }
 
         await session.commit()
         await session.refresh(product_to_update)
 
-        product_response = ProductResponse.model_validate(product_to_update)
+        if new_image_urls:
+            generate_image_variants.delay(str(product_to_update.product_id), new_image_urls)
+        await enqueue_orphans([url for url in previous_urls if url not in kept_urls])
+        await search_cache.invalidate()
+        if product_to_update.name != previous_name:
+            suggestion_index.remove(previous_name, PRODUCT)
+            suggestion_index.add(product_to_update.name, PRODUCT)
+
+        product_response = self._response(product_to_update)
         return product_response
 
     async def delete_product(self, product_id, user_id, role, session: AsyncSession):
-        statement = select(Product).where(Product.product_id == product_id)
+        statement = select(Product).where(Product.product_id == product_id).options(selectinload(Product.categories))  # type: ignore
         product_to_delete = await session.scalar(statement)
         if not product_to_delete:
             raise HTTPException(
@@ -259,12 +657,19 @@ class ProductService:
                 status_code=status.HTTP_403_FORBIDDEN,
                 detail="Only admins or the product owner can delete this product",
             )
-        if product_to_delete.image_urls:
-            for urls in product_to_delete.image_urls:
-                await image_up.delete_image(urls)
-
+        image_urls = list(product_to_delete.image_urls or [])
+        category_names = [category.category_name for category in product_to_delete.categories]
         await session.delete(product_to_delete)
         await session.commit()
+
+        # Files may be shared with other products (content-addressed), so the
+        # media collector decides what to remove, outside the request.
+        await enqueue_orphans(image_urls)
+
+        await search_cache.invalidate()
+        suggestion_index.remove(product_to_delete.name, PRODUCT)
+        for category_name in category_names:
+            suggestion_index.bump(category_name, CATEGORY, -1)
         return {"message": "Product deleted successfully"}
 
     async def upload_images(
@@ -279,25 +684,13 @@ class ProductService:
         if not product.image_urls:
             product.image_urls = []
 
-        new_image_urls = []
-        for file in files:
-            if not file.filename:
-                raise HTTPException(status_code=400, detail="Invalid file")
-
-            _, file_ext = os.path.splitext(file.filename)
-            file_ext = file_ext.lower().lstrip(".")
-
-            if file_ext not in {"jpg", "jpeg", "png"}:
-                raise HTTPException(
-                    status_code=400, detail=f"Invalid file format: {file_ext}"
-                )
-
-            image_url = await image_up.save_image(file, subdir=f"products/{product_id}")
-            new_image_urls.append(image_url)
+        new_image_urls = await image_up.save_images(files)
 
         if new_image_urls:
             product.image_urls = product.image_urls + new_image_urls
 
             await session.commit()
             await session.refresh(product)
+            generate_image_variants.delay(str(product.product_id), new_image_urls)
+            await search_cache.invalidate()
         return product.image_urls
@@ -0,0 +1,505 @@
+import time
+import uuid
+from datetime import datetime, timedelta, timezone
+from uuid import UUID
+
+import redis.asyncio as red_db
+from fastapi import HTTPException, status
+from redis.exceptions import RedisError
+from sqlalchemy import func, update
+from sqlmodel import select
+from sqlmodel.ext.asyncio.session import AsyncSession
+
+from config import settings
+from db.models import Product, ReservationStatus, StockReservation, remove_timezone
+from db.redis import redis_client
+from db.session import worker_session_factory
+
+# Hot SKUs sell from a Redis pool of units moved out of product.stock ahead
+# of time, so every unit is either in the DB, in the pool or held by exactly
+# one reservation and nothing can be sold twice. A crash between moving
+# units and crediting the pool can only undersell.
+HOT_KEY = "stock:hot"
+POOL_PREFIX = "stock:pool:"
+RECLAIM_LIMIT = 100
+
+# Shared by the scripts below: return expired holds to the pool.
+_RECLAIM = """
+local expired = redis.call('ZRANGEBYSCORE', KEYS[2], '-inf', ARGV[1], 'LIMIT', 0, %d)
+for _, id in ipairs(expired) do
+    local hold = redis.call('HGET', KEYS[3], id)
+    if hold then
+        redis.call('INCRBY', KEYS[1], tonumber(string.match(hold, '^(%%d+)')))
+        redis.call('HDEL', KEYS[3], id)
+    end
+    redis.call('ZREM', KEYS[2], id)
+end
+""" % RECLAIM_LIMIT
+
+# ARGV: now, quantity, reservation id, expires at, user id
+RESERVE_SCRIPT = _RECLAIM + """
+local available = tonumber(redis.call('GET', KEYS[1]) or '0')
+local wanted = tonumber(ARGV[2])
+if available < wanted then
+    return {0, available}
+end
+redis.call('DECRBY', KEYS[1], wanted)
+redis.call('ZADD', KEYS[2], ARGV[4], ARGV[3])
+redis.call('HSET', KEYS[3], ARGV[3], ARGV[2] .. ':' .. ARGV[5])
+return {1, available - wanted}
+"""
+
+# ARGV: reservation id, user id ('' for any), 'release' or 'commit'
+FINISH_SCRIPT = """
+local hold = redis.call('HGET', KEYS[3], ARGV[1])
+if not hold then
+    return -1
+end
+local quantity, owner = string.match(hold, '^(%d+):(.*)$')
+if ARGV[2] ~= '' and owner ~= ARGV[2] then
+    return -2
+end
+redis.call('HDEL', KEYS[3], ARGV[1])
+redis.call('ZREM', KEYS[2], ARGV[1])
+if ARGV[3] == 'release' then
+    redis.call('INCRBY', KEYS[1], quantity)
+end
+return tonumber(quantity)
+"""
+
+# ARGV: now
+RECLAIM_SCRIPT = _RECLAIM + """
+return #expired
+"""
+
+# KEYS: pool  ARGV: quantity. Takes units straight from the pool, all or none.
+TAKE_SCRIPT = """
+if tonumber(redis.call('GET', KEYS[1]) or '0') < tonumber(ARGV[1]) then
+    return 0
+end
+redis.call('DECRBY', KEYS[1], ARGV[1])
+return 1
+"""
+
+
+def pool_keys(product_id) -> list[str]:
+    return [
+        f"{POOL_PREFIX}{product_id}",
+        f"stock:holds:{product_id}",
+        f"stock:hold:{product_id}",
+    ]
+
+
+def _now() -> datetime:
+    return remove_timezone(datetime.now(timezone.utc))
+
+
+class StockService:
+    def __init__(self, client=redis_client):
+        self.client = client
+        self._reserve = client.register_script(RESERVE_SCRIPT)
+        self._finish = client.register_script(FINISH_SCRIPT)
+        self._reclaim = client.register_script(RECLAIM_SCRIPT)
+        self._take = client.register_script(TAKE_SCRIPT)
+
+    async def _hot_allocation(self, product_id) -> int | None:
+        try:
+            allocation = await self.client.hget(HOT_KEY, str(product_id))
+        except RedisError:
+            return None
+        return int(allocation) if allocation else None
+
+    async def _check_user_limit(self, session: AsyncSession, product_id: UUID, quantity: int, user_id: UUID):
+        # Caps the units one shopper can hold of a product, so a single
+        # account cannot take the whole stock offline. The lock serialises
+        # this shopper's concurrent reservations until the transaction ends.
+        await session.exec(select(func.pg_advisory_xact_lock(func.hashtext(f"reserve:{user_id}"))))
+        result = await session.exec(
+            select(func.coalesce(func.sum(StockReservation.quantity), 0)).where(
+                StockReservation.user_id == user_id,
+                StockReservation.product_id == product_id,
+                StockReservation.status == ReservationStatus.active,
+                StockReservation.expires_at > _now(),
+            )
+        )
+        held = result.one() + sum(
+            units for *_, units in await self.user_pool_holds(user_id, [product_id])
+        )
+        if held + quantity > settings.STOCK_RESERVATION_MAX_PER_USER:
+            await session.rollback()
+            raise HTTPException(
+                status_code=status.HTTP_409_CONFLICT,
+                detail=f"Reservation limit of {settings.STOCK_RESERVATION_MAX_PER_USER} units per product reached",
+            )
+
+    async def reserve(self, session: AsyncSession, product_id: UUID, quantity: int, user_id: UUID | None):
+        if user_id:
+            await self._check_user_limit(session, product_id, quantity, user_id)
+        allocation = await self._hot_allocation(product_id)
+        if allocation:
+            try:
+                return await self._reserve_hot(session, product_id, quantity, user_id, allocation)
+            except RedisError:
+                # Units parked in the pool stay there until Redis is back;
+                # the DB path can still sell what is left in product.stock.
+                pass
+        return await self._reserve_db(session, product_id, quantity, user_id)
+
+    async def _reserve_db(self, session: AsyncSession, product_id: UUID, quantity: int, user_id: UUID | None):
+        result = await session.exec(
+            update(Product)  # type: ignore
+            .where(Product.product_id == product_id, Product.stock >= quantity)  # type: ignore
+            .values(stock=Product.stock - quantity)
+            .returning(Product.stock)
+        )
+        if result.first() is None:
+            await session.rollback()
+            raise HTTPException(
+                status_code=status.HTTP_409_CONFLICT, detail="Insufficient stock"
+            )
+        reservation = StockReservation(
+            product_id=product_id,
+            user_id=user_id,
+            quantity=quantity,
+            expires_at=_now() + timedelta(seconds=settings.STOCK_RESERVATION_TTL_SECONDS),
+        )
+        session.add(reservation)
+        await session.commit()
+        return {
+            "reservation_id": reservation.reservation_id,
+            "product_id": product_id,
+            "quantity": quantity,
+            "expires_at": reservation.expires_at,
+            "source": "db",
+        }
+
+    async def _reserve_hot(
+        self, session: AsyncSession, product_id: UUID, quantity: int, user_id: UUID | None, allocation: int
+    ):
+        reservation_id = uuid.uuid4()
+        expires_at = _now() + timedelta(seconds=settings.STOCK_RESERVATION_TTL_SECONDS)
+        for _ in range(2):
+            reserved, _available = await self._reserve(
+                keys=pool_keys(product_id),
+                args=[
+                    time.time(),
+                    quantity,
+                    str(reservation_id),
+                    expires_at.replace(tzinfo=timezone.utc).timestamp(),
+                    str(user_id or ""),
+                ],
+            )
+            if reserved:
+                return {
+                    "reservation_id": reservation_id,
+                    "product_id": product_id,
+                    "quantity": quantity,
+                    "expires_at": expires_at,
+                    "source": "redis",
+                }
+            if not await self._refill(session, product_id, max(allocation, quantity)):
+                break
+        raise HTTPException(status_code=status.HTTP_409_CONFLICT, detail="Insufficient stock")
+
+    async def _refill(self, session: AsyncSession, product_id: UUID, units: int) -> int:
+        # Move up to `units` from product.stock into the pool in one
+        # conditional statement; the row lock serialises concurrent refills.
+        allotment = (
+            select(Product.product_id, func.least(Product.stock, units).label("take"))
+            .where(Product.product_id == product_id, Product.stock > 0)
+            .with_for_update()
+            .cte("allotment")
+        )
+        result = await session.exec(
+            update(Product)  # type: ignore
+            .where(Product.product_id == allotment.c.product_id)
+            .values(stock=Product.stock - allotment.c.take)
+            .returning(allotment.c.take)
+        )
+        moved = result.scalar() or 0
+        await session.commit()
+        if moved:
+            await self.client.incrby(pool_keys(product_id)[0], moved)
+        return moved
+
+    async def _finish_hold(self, product_id: UUID, reservation_id: UUID, user_id: UUID | None, mode: str):
+        try:
+            quantity = await self._finish(
+                keys=pool_keys(product_id),
+                args=[str(reservation_id), str(user_id or ""), mode],
+            )
+        except RedisError:
+            return None
+        if quantity == -2:
+            raise HTTPException(
+                status_code=status.HTTP_404_NOT_FOUND, detail="Reservation not found"
+            )
+        return quantity if quantity > 0 else None
+
+    async def release(self, session: AsyncSession, product_id: UUID, reservation_id: UUID, user_id: UUID | None):
+        quantity = await self._finish_hold(product_id, reservation_id, user_id, "release")
+        if quantity is None:
+            quantity = await self._finish_db(
+                session, product_id, reservation_id, user_id, ReservationStatus.released
+            )
+            await session.commit()
+        return {"reservation_id": reservation_id, "released": quantity}
+
+    async def commit(self, session: AsyncSession, product_id: UUID, reservation_id: UUID, user_id: UUID | None):
+        # Turns a hold into a sale. DB reservations are committed as part of
+        # the caller's transaction.
+        quantity = await self._finish_hold(product_id, reservation_id, user_id, "commit")
+        if quantity is not None:
+            return quantity
+        result = await session.exec(
+            update(StockReservation)  # type: ignore
+            .where(
+                StockReservation.reservation_id == reservation_id,
+                StockReservation.product_id == product_id,
+                StockReservation.status == ReservationStatus.active,
+                *([StockReservation.user_id == user_id] if user_id else []),
+            )
+            .values(status=ReservationStatus.committed, updated_at=_now())
+            .returning(StockReservation.quantity)
+        )
+        quantity = result.scalar()
+        if quantity is None:
+            raise HTTPException(
+                status_code=status.HTTP_410_GONE, detail="Reservation expired or not found"
+            )
+        return quantity
+
+    async def _finish_db(self, session, product_id, reservation_id, user_id, new_status):
+        finished = (
+            update(StockReservation)  # type: ignore
+            .where(
+                StockReservation.reservation_id == reservation_id,
+                StockReservation.product_id == product_id,
+                StockReservation.status == ReservationStatus.active,
+                *([StockReservation.user_id == user_id] if user_id else []),
+            )
+            .values(status=new_status, updated_at=_now())
+            .returning(StockReservation.product_id, StockReservation.quantity)
+            .cte("finished")
+        )
+        result = await session.exec(
+            update(Product)  # type: ignore
+            .where(Product.product_id == finished.c.product_id)
+            .values(stock=Product.stock + finished.c.quantity)
+            .returning(finished.c.quantity)
+        )
+        quantity = result.scalar()
+        if quantity is None:
+            raise HTTPException(
+                status_code=status.HTTP_404_NOT_FOUND, detail="Reservation not found"
+            )
+        return quantity
+
+    async def expire_db_reservations(self, session: AsyncSession) -> int:
+        # Batches skip rows another sweeper holds, and each batch returns its
+        # units with one UPDATE per product.
+        due = (
+            select(StockReservation.reservation_id)
+            .where(
+                StockReservation.status == ReservationStatus.active,
+                StockReservation.expires_at < _now(),
+            )
+            .order_by(StockReservation.expires_at)
+            .limit(settings.STOCK_EXPIRY_BATCH_SIZE)
+            .with_for_update(skip_locked=True)
+        )
+        expired = (
+            update(StockReservation)  # type: ignore
+            .where(StockReservation.reservation_id.in_(due))  # type: ignore
+            .values(status=ReservationStatus.expired, updated_at=_now())
+            .returning(StockReservation.product_id, StockReservation.quantity)
+            .cte("expired")
+        )
+        totals = (
+            select(expired.c.product_id, func.sum(expired.c.quantity).label("quantity"))
+            .group_by(expired.c.product_id)
+            .cte("totals")
+        )
+        total = 0
+        while True:
+            result = await session.exec(
+                update(Product)  # type: ignore
+                .where(Product.product_id == totals.c.product_id)
+                .values(stock=Product.stock + totals.c.quantity)
+                .returning(totals.c.quantity)
+            )
+            units = sum(result.scalars().all())
+            await session.commit()
+            if not units:
+                return total
+            total += units
+
+    async def expire_hot_reservations(self) -> dict:
+        hot = await self.client.hkeys(HOT_KEY)
+        reclaimed = 0
+        for product_id in hot:
+            product_id = product_id.decode()
+            while True:
+                count = await self._reclaim(keys=pool_keys(product_id), args=[time.time()])
+                reclaimed += count
+                if count < RECLAIM_LIMIT:
+                    break
+        return {"hot_skus": len(hot), "reclaimed_holds": reclaimed}
+
+    async def drain_cold_pools(self, session: AsyncSession) -> int:
+        # Pools of demoted SKUs keep receiving released units; return them
+        # to product.stock once no holds are left.
+        hot = {product_id.decode() for product_id in await self.client.hkeys(HOT_KEY)}
+        returned = 0
+        async for key in self.client.scan_iter(match=f"{POOL_PREFIX}*", count=500):
+            product_id = key.decode()[len(POOL_PREFIX):]
+            if product_id in hot:
+                continue
+            keys = pool_keys(product_id)
+            await self._reclaim(keys=keys, args=[time.time()])
+            if await self.client.zcard(keys[1]):
+                continue
+            units = int(await self.client.getdel(keys[0]) or 0)
+            if units:
+                await session.exec(
+                    update(Product)  # type: ignore
+                    .where(Product.product_id == UUID(product_id))  # type: ignore
+                    .values(stock=Product.stock + units)
+                )
+                await session.commit()
+                returned += units
+        return returned
+
+    async def promote(self, session: AsyncSession, product_id: UUID, allocation: int):
+        if not await session.get(Product, product_id):
+            raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Product not found")
+        await self.client.hset(HOT_KEY, str(product_id), allocation)
+        moved = await self._refill(session, product_id, allocation)
+        return {"product_id": product_id, "allocation": allocation, "moved_to_pool": moved}
+
+    async def demote(self, session: AsyncSession, product_id: UUID):
+        await self.client.hdel(HOT_KEY, str(product_id))
+        returned = await self.drain_cold_pools(session)
+        return {"product_id": product_id, "returned_to_stock": returned}
+
+    async def levels(self, session: AsyncSession, product_id: UUID):
+        product = await session.get(Product, product_id)
+        if not product:
+            raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Product not found")
+        result = await session.exec(
+            select(func.coalesce(func.sum(StockReservation.quantity), 0)).where(
+                StockReservation.product_id == product_id,
+                StockReservation.status == ReservationStatus.active,
+            )
+        )
+        keys = pool_keys(product_id)
+        async with self.client.pipeline(transaction=False) as pipe:
+            pipe.hget(HOT_KEY, str(product_id))
+            pipe.get(keys[0])
+            pipe.hvals(keys[2])
+            allocation, pool, holds = await pipe.execute()
+        return {
+            "product_id": product_id,
+            "stock": product.stock,
+            "reserved_db": result.one(),
+            "hot": allocation is not None,
+            "pool": int(pool or 0),
+            "reserved_pool": sum(int(hold.split(b":", 1)[0]) for hold in holds),
+        }
+
+    async def lock_user_reservations(self, session: AsyncSession, user_id: UUID) -> list[tuple]:
+        # Locked before any product row, like the expiry sweeper, so the two
+        # cannot deadlock; the sweeper skips rows held here.
+        result = await session.exec(
+            select(StockReservation.product_id, StockReservation.reservation_id, StockReservation.quantity)
+            .where(
+                StockReservation.user_id == user_id,
+                StockReservation.status == ReservationStatus.active,
+                StockReservation.expires_at > _now(),
+            )
+            .order_by(StockReservation.expires_at)
+            .with_for_update()
+        )
+        return list(result.all())
+
+    async def user_pool_holds(self, user_id: UUID, product_ids: list[UUID]) -> list[tuple]:
+        # Unexpired holds of the user on hot SKUs, soonest expiry first.
+        if not product_ids:
+            return []
+        try:
+            async with self.client.pipeline(transaction=False) as pipe:
+                for product_id in product_ids:
+                    keys = pool_keys(product_id)
+                    pipe.zrangebyscore(keys[1], time.time(), "+inf")
+                    pipe.hgetall(keys[2])
+                replies = await pipe.execute()
+        except RedisError:
+            return []
+        holds = []
+        owner = str(user_id).encode()
+        for index, product_id in enumerate(product_ids):
+            live, entries = replies[2 * index], replies[2 * index + 1]
+            for reservation_id in live:
+                hold = entries.get(reservation_id)
+                if not hold:
+                    continue
+                quantity, hold_owner = hold.split(b":", 1)
+                if hold_owner == owner:
+                    holds.append((product_id, UUID(reservation_id.decode()), int(quantity)))
+        return holds
+
+    async def pooled(self, product_ids: list[UUID]) -> dict[UUID, int]:
+        # Units of hot SKUs sitting in Redis pools rather than product.stock.
+        if not product_ids:
+            return {}
+        try:
+            pools = await self.client.mget([pool_keys(product_id)[0] for product_id in product_ids])
+        except RedisError:
+            return {}
+        return {
+            product_id: int(pool)
+            for product_id, pool in zip(product_ids, pools)
+            if pool is not None
+        }
+
+    async def take_pooled(self, wanted: dict[UUID, int]) -> dict[UUID, int]:
+        # Used by checkout for lines product.stock cannot cover. Returns what
+        # was taken; the caller gives it back if its transaction fails.
+        taken = {}
+        for product_id, quantity in wanted.items():
+            try:
+                if await self._take(keys=[pool_keys(product_id)[0]], args=[quantity]):
+                    taken[product_id] = quantity
+            except RedisError:
+                break
+        return taken
+
+    async def return_pooled(self, taken: dict[UUID, int]):
+        if not taken:
+            return
+        try:
+            async with self.client.pipeline(transaction=False) as pipe:
+                for product_id, quantity in taken.items():
+                    pipe.incrby(pool_keys(product_id)[0], quantity)
+                await pipe.execute()
+        except RedisError:
+            # Lost units only undersell; see the note at the top.
+            pass
+
+
+async def run_stock_expiry():
+    client = red_db.from_url(settings.REDIS_URL)
+    worker_engine, session_factory = worker_session_factory()
+    service = StockService(client)
+    try:
+        async with session_factory() as session:
+            expired_units = await service.expire_db_reservations(session)
+            hot = await service.expire_hot_reservations()
+            drained = await service.drain_cold_pools(session)
+        return {"expired_units": expired_units, "returned_from_pools": drained, **hot}
+    finally:
+        await worker_engine.dispose()
+        await client.aclose()
+
+
+stock_service = StockService()
@@ -0,0 +1,196 @@
+import asyncio
+import heapq
+import logging
+import time
+from bisect import bisect_left
+from itertools import islice
+from typing import Iterable
+
+from redis.exceptions import RedisError
+from sqlmodel import select, func
+from sqlmodel.ext.asyncio.session import AsyncSession
+
+from config import settings
+from db.models import Category, OrderItem, Product, ProductCategory
+from db.redis import redis_client
+from db.session import AsyncSessionLocal
+from products.cache import GENERATION_KEY
+
+logger = logging.getLogger(__name__)
+
+
+PRODUCT = "product"
+CATEGORY = "category"
+# Upper bound on keys inspected per lookup so one-letter prefixes stay cheap.
+MAX_SCAN = 20_000
+
+
+def normalize(text: str) -> str:
+    return " ".join(text.lower().split())
+
+
+class SuggestionIndex:
+    # A sorted array of (key, kind, term) searched with bisect. Every word
+    # start of a term is a key, so "rice" also finds "basmati rice".
+    # Terms are per process; each worker loads its own copy on first use and
+    # rebuilds it once another process bumps the search generation, or after
+    # SUGGEST_MAX_AGE_SECONDS when Redis cannot be read. Rebuilds after the
+    # first run in the background while the old index keeps serving.
+    def __init__(self, session_factory=AsyncSessionLocal):
+        self.session_factory = session_factory
+        self._keys: list[tuple[str, str, str]] = []
+        self._terms: dict[tuple[str, str], dict] = {}
+        self._loaded = False
+        self._generation = None
+        self._built_at = 0.0
+        self._lock = asyncio.Lock()
+        self._refresh: asyncio.Task | None = None
+
+    @staticmethod
+    def _word_keys(term: str) -> set[str]:
+        words = term.split(" ")
+        return {" ".join(words[i:]) for i in range(len(words))}
+
+    @staticmethod
+    async def _current_generation():
+        try:
+            return await redis_client.get(GENERATION_KEY)
+        except RedisError:
+            return None
+
+    def _fresh(self, generation) -> bool:
+        if not self._loaded:
+            return False
+        age = time.monotonic() - self._built_at
+        if age >= settings.SUGGEST_MAX_AGE_SECONDS:
+            return False
+        # Local writes are applied in place, so a bumped generation only
+        # triggers a rebuild once per SUGGEST_REFRESH_SECONDS.
+        return (
+            generation is None
+            or generation == self._generation
+            or age < settings.SUGGEST_REFRESH_SECONDS
+        )
+
+    async def ensure_loaded(self, session: AsyncSession):
+        generation = await self._current_generation()
+        if self._fresh(generation):
+            return
+        if not self._loaded:
+            async with self._lock:
+                if not self._loaded:
+                    await self._rebuild(session, generation)
+            return
+        if self._refresh is None or self._refresh.done():
+            self._refresh = asyncio.create_task(self._refresh_in_background(generation))
+
+    async def _refresh_in_background(self, generation):
+        try:
+            async with self.session_factory() as session:
+                await self._rebuild(session, generation)
+        except Exception as e:
+            # Keep serving the old index; try again after the refresh interval.
+            self._built_at = time.monotonic()
+            logger.warning("Suggestion index rebuild failed: %s", e)
+
+    async def _rebuild(self, session: AsyncSession, generation):
+        sold = func.coalesce(func.sum(OrderItem.quantity), 0)
+        products = await session.exec(
+            select(Product.name, sold)
+            .outerjoin(OrderItem, OrderItem.product_id == Product.product_id)  # type: ignore
+            .group_by(Product.product_id)  # type: ignore
+        )
+        product_count = func.count(ProductCategory.product_id)  # type: ignore
+        categories = await session.exec(
+            select(Category.category_name, product_count)
+            .outerjoin(ProductCategory, ProductCategory.category_id == Category.category_id)  # type: ignore
+            .group_by(Category.category_id)  # type: ignore
+        )
+        rows = [(name, PRODUCT, popularity) for name, popularity in products.all()] + [
+            (name, CATEGORY, popularity) for name, popularity in categories.all()
+        ]
+        terms, keys = await asyncio.to_thread(self._compile, rows)
+        # Swapped without an await in between, so readers see either index.
+        self._terms, self._keys = terms, keys
+        self._loaded = True
+        self._generation = generation
+        self._built_at = time.monotonic()
+
+    @classmethod
+    def _compile(cls, rows: Iterable[tuple[str, str, int]]):
+        terms: dict[tuple[str, str], dict] = {}
+        for display, kind, popularity in rows:
+            term = normalize(display)
+            if not term:
+                continue
+            entry = terms.setdefault(
+                (kind, term), {"text": display, "refs": 0, "popularity": 0}
+            )
+            entry["refs"] += 1
+            entry["popularity"] += int(popularity or 0)
+        keys = sorted(
+            (key, kind, term) for kind, term in terms for key in cls._word_keys(term)
+        )
+        return terms, keys
+
+    def add(self, display: str, kind: str, popularity: int = 0):
+        if not self._loaded:
+            return
+        term = normalize(display)
+        if not term:
+            return
+        entry = self._terms.get((kind, term))
+        if entry:
+            entry["refs"] += 1
+            entry["popularity"] += popularity
+            return
+        self._terms[(kind, term)] = {"text": display, "refs": 1, "popularity": popularity}
+        for key in self._word_keys(term):
+            item = (key, kind, term)
+            self._keys.insert(bisect_left(self._keys, item), item)
+
+    def remove(self, display: str, kind: str):
+        if not self._loaded:
+            return
+        term = normalize(display)
+        entry = self._terms.get((kind, term))
+        if not entry:
+            return
+        entry["refs"] -= 1
+        if entry["refs"] > 0:
+            return
+        del self._terms[(kind, term)]
+        for key in self._word_keys(term):
+            item = (key, kind, term)
+            position = bisect_left(self._keys, item)
+            if position < len(self._keys) and self._keys[position] == item:
+                del self._keys[position]
+
+    def bump(self, display: str, kind: str, amount: int = 1):
+        entry = self._terms.get((kind, normalize(display)))
+        if entry:
+            entry["popularity"] += amount
+
+    def suggest(self, prefix: str, limit: int = 10) -> list[dict]:
+        prefix = normalize(prefix)
+        if not prefix:
+            return []
+        start = bisect_left(self._keys, (prefix,))
+        end = bisect_left(self._keys, (prefix + "\uffff",), lo=start)
+        matches = {(kind, term) for _, kind, term in islice(self._keys, start, min(end, start + MAX_SCAN))}
+        best = heapq.nlargest(
+            limit,
+            matches,
+            key=lambda ident: (self._terms[ident]["popularity"], -len(ident[1])),
+        )
+        return [
+            {
+                "text": self._terms[ident]["text"],
+                "kind": ident[0],
+                "popularity": self._terms[ident]["popularity"],
+            }
+            for ident in best
+        ]
+
+
+suggestion_index = SuggestionIndex()
@@ -0,0 +1,63 @@
+from uuid import UUID
+
+import redis.asyncio as red_db
+from sqlalchemy import JSON, cast, func, update
+from sqlalchemy.dialects.postgresql import JSONB
+
+from config import settings
+from db.models import Product
+from db.session import worker_session_factory
+from products.cache import SearchCache
+from utils.image_variants import VARIANT_SIZES, generate_variants
+
+IMAGE_SIZES = tuple(VARIANT_SIZES)
+PREVIEW_FORMAT = "webp"
+
+
+def preview_image_url(image_urls, image_variants, size: str = "card") -> str | None:
+    # Falls back to the original until the worker has rendered the variants.
+    if not image_urls:
+        return None
+    first = image_urls[0]
+    if size == "original":
+        return first
+    variants = (image_variants or {}).get(first) or {}
+    return (variants.get(size) or {}).get(PREVIEW_FORMAT, first)
+
+
+def generate_product_variants(image_urls: list[str]) -> tuple[dict, dict]:
+    variants = {}
+    errors = {}
+    for image_url in image_urls:
+        try:
+            variants[image_url] = generate_variants(image_url)
+        except Exception as e:
+            errors[image_url] = str(e)
+    return variants, errors
+
+
+async def record_image_variants(product_id: str, variants: dict):
+    # Merge into whatever is stored already with a single jsonb `||`, so
+    # concurrent jobs for the same product do not overwrite each other.
+    if not variants:
+        return
+    current = func.coalesce(cast(Product.image_variants, JSONB), func.jsonb_build_object())
+    statement = (
+        update(Product)
+        .where(Product.product_id == UUID(product_id))  # type: ignore
+        .values(
+            image_variants=cast(
+                current.op("||")(cast(variants, JSONB)), JSON
+            )
+        )
+    )
+    worker_engine, session_factory = worker_session_factory()
+    client = red_db.from_url(settings.REDIS_URL)
+    try:
+        async with session_factory() as session:
+            await session.exec(statement)  # type: ignore
+            await session.commit()
+        await SearchCache(client).invalidate()
+    finally:
+        await worker_engine.dispose()
+        await client.aclose()
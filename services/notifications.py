@@ -0,0 +1,172 @@
+from collections import defaultdict
+from datetime import datetime
+
+import redis.asyncio as red_db
+from sqlalchemy.orm import aliased
+from sqlmodel import select
+
+from config import settings
+from db.models import Order, OrderItem, Product, User
+from db.session import worker_session_factory
+from orders.outbox import mark_processed
+from utils.mail import send_email
+
+HANDLED_PREFIX = "outbox:handled:"
+HANDLED_TTL_SECONDS = 7 * 24 * 3600
+
+
+async def order_placed(session, client, event: dict):
+    payload = event["payload"]
+    order_id = payload["order_id"]
+    vendor = aliased(User)
+    result = await session.exec(
+        select(
+            Product.product_id,
+            Product.name,
+            Product.stock,
+            OrderItem.quantity,
+            OrderItem.price,
+            vendor.email,
+        )
+        .join(Product, Product.product_id == OrderItem.product_id)  # type: ignore
+        .join(vendor, vendor.user_id == Product.vendor_id)  # type: ignore
+        .where(OrderItem.order_id == order_id)
+    )
+    items = result.all()
+    customer = (
+        await session.exec(select(User.email).where(User.user_id == payload["user_id"]))
+    ).first()
+
+    # Confirmation email
+    if customer:
+        await send_email(
+            customer,
+            f"Your KiranaKart order {order_id[:8]} is confirmed",
+            template_name="order_confirmation.html",
+            template_data={
+                "order_id": order_id,
+                "total": payload["total"],
+                "items": [
+                    {"name": name, "quantity": quantity, "price": price}
+                    for _, name, _, quantity, price, _ in items
+                ],
+            },
+        )
+
+    # Vendor notification and stock alerts, one email of each per vendor
+    sold = defaultdict(list)
+    low_stock = defaultdict(list)
+    for _, name, stock, quantity, _, vendor_email in items:
+        sold[vendor_email].append({"name": name, "quantity": quantity})
+        if stock <= settings.LOW_STOCK_THRESHOLD:
+            low_stock[vendor_email].append({"name": name, "stock": stock})
+    for vendor_email, lines in sold.items():
+        await send_email(
+            vendor_email,
+            "New order on KiranaKart",
+            template_name="vendor_new_order.html",
+            template_data={"order_id": order_id, "items": lines},
+        )
+    for vendor_email, lines in low_stock.items():
+        await send_email(
+            vendor_email,
+            "Products running low on KiranaKart",
+            template_name="low_stock.html",
+            template_data={"items": lines, "threshold": settings.LOW_STOCK_THRESHOLD},
+        )
+
+    # Analytics
+    day = datetime.fromisoformat(event["created_at"]).date().isoformat()
+    async with client.pipeline(transaction=False) as pipe:
+        pipe.hincrby(f"analytics:orders:{day}", "orders", 1)
+        pipe.hincrby(f"analytics:orders:{day}", "units", sum(item[3] for item in items))
+        pipe.hincrbyfloat(f"analytics:orders:{day}", "revenue", payload["total"])
+        await pipe.execute()
+
+
+STATUS_MESSAGES = {
+    "processing": "is being packed",
+    "shipped": "is on its way",
+    "delivered": "has been delivered",
+}
+
+
+async def orders_status_changed(session, client, event: dict):
+    # One event per bulk transition: payload maps each new status to the
+    # orders that moved to it. Every email sent is marked per order, so a
+    # redelivered batch only emails the customers that were missed.
+    changed = event["payload"]["orders"]
+    order_ids = [order_id for ids in changed.values() for order_id in ids]
+    marker = f"{HANDLED_PREFIX}{event['event_id']}:"
+    async with client.pipeline(transaction=False) as pipe:
+        for order_id in order_ids:
+            pipe.exists(f"{marker}{order_id}")
+        notified = {order_id for order_id, seen in zip(order_ids, await pipe.execute()) if seen}
+
+    pending = [order_id for order_id in order_ids if order_id not in notified]
+    emails = {}
+    if pending:
+        result = await session.exec(
+            select(Order.order_id, User.email)
+            .join(User, User.user_id == Order.user_id)  # type: ignore
+            .where(Order.order_id.in_(pending))  # type: ignore
+        )
+        emails = {str(order_id): email for order_id, email in result.all()}
+
+    for order_status, ids in changed.items():
+        for order_id in ids:
+            if order_id in notified or order_id not in emails:
+                continue
+            await send_email(
+                emails[order_id],
+                f"Your KiranaKart order {order_id[:8]} {STATUS_MESSAGES[order_status]}",
+                template_name="order_status.html",
+                template_data={
+                    "order_id": order_id,
+                    "status": order_status,
+                    "message": STATUS_MESSAGES[order_status],
+                },
+            )
+            await client.set(f"{marker}{order_id}", 1, ex=HANDLED_TTL_SECONDS)
+
+    day = datetime.fromisoformat(event["created_at"]).date().isoformat()
+    async with client.pipeline(transaction=False) as pipe:
+        for order_status, ids in changed.items():
+            pipe.hincrby(f"analytics:orders:{day}", order_status, len(ids))
+        await pipe.execute()
+
+
+HANDLERS = {
+    "order.placed": order_placed,
+    "orders.status_changed": orders_status_changed,
+}
+
+
+async def run_outbox_handlers(events: list[dict]):
+    # Events of one aggregate, oldest first. Stops at the first failure so a
+    # later event is never handled before an earlier one; the relay sends the
+    # rest again. Handled events are remembered in Redis so a redelivered
+    # batch skips the side effects that already happened.
+    client = red_db.from_url(settings.REDIS_URL)
+    worker_engine, session_factory = worker_session_factory()
+    done = []
+    failed = None
+    try:
+        async with session_factory() as session:
+            for event in events:
+                handled_key = f"{HANDLED_PREFIX}{event['event_id']}"
+                if not await client.exists(handled_key):
+                    handler = HANDLERS.get(event["event_type"])
+                    try:
+                        if handler:
+                            await handler(session, client, event)
+                    except Exception as e:
+                        failed = (event["event_id"], str(e))
+                        break
+                    await client.set(handled_key, 1, ex=HANDLED_TTL_SECONDS)
+                done.append(event["event_id"])
+            await mark_processed(session, done, failed)
+        return {"processed": done, "failed": failed}
+    finally:
+        await worker_engine.dispose()
+        await client.aclose()
@@ -1,5 +1,5 @@
-from fastapi import APIRouter, Depends, HTTPException, status
-from typing import List
+from fastapi import APIRouter, Depends, HTTPException, Query, status
+from typing import Optional
 from user.schemas import UserResponse, UserUpdate
 from auth.dependencies import RoleChecker, AccessTokenBearer
 from datetime import datetime, timezone
@@ -20,12 +20,14 @@ def remove_timezone(dt: datetime) -> datetime:
     return dt.replace(tzinfo=None) if dt.tzinfo else dt
 
 
-@User_router.get("/all", response_model=List[UserResponse])
+@User_router.get("/all", response_model=dict)
 async def get_all_users(
     session: AsyncSession = Depends(get_session),
     token_details=Depends(access_token_bearer),
+    limit: int = Query(20, ge=1, le=100),
+    cursor: Optional[str] = None,
 ):
-    users_data = await user_service.get_all_users(session)
+    users_data = await user_service.get_all_users(session, limit=limit, cursor=cursor)
     return users_data
 
 
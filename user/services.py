@@ -1,22 +1,34 @@
-from sqlmodel import select, desc
+from sqlmodel import select
 from fastapi import HTTPException, status
 from sqlmodel.ext.asyncio.session import AsyncSession
 from auth.services import AuthService
 from uuid import UUID
 from db.models import User, Order
-from user.schemas import UserUpdate
+from user.schemas import UserResponse, UserUpdate
+from utils.pagination import keyset_after, keyset_order, next_cursor, parse_created_cursor
 
 
 auth_services= AuthService()
 
 class UserService:
-    async def get_all_users(self, session :AsyncSession):
+    async def get_all_users(self, session :AsyncSession, limit: int = 20, cursor: str | None = None):
         try:
-            statement = select(User).where(User.is_active==True).order_by(desc(User.created_at))
+            keyset = (User.created_at, User.user_id)
+            statement = select(User).where(User.is_active==True)
+            cursor_values = parse_created_cursor(cursor)
+            if cursor_values:
+                statement = keyset_after(statement, keyset, cursor_values)
+            statement = keyset_order(statement, keyset).limit(limit)
             result = await session.exec(statement)
             users= result.all()
-            return users
+            return {
+                "users": [UserResponse.model_validate(user) for user in users],
+                "limit": limit,
+                "next_cursor": next_cursor(users, limit, lambda u: (u.created_at, u.user_id)),
+            }
 
+        except HTTPException:
+            raise
         except Exception as e:
             raise HTTPException(status_code=status.HTTP_500_INTERNAL_SERVER_ERROR, detail=f"FAILED TO FETCH USERS: {str(e)}")
 
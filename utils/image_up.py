@@ -1,33 +1,100 @@
 from fastapi import HTTPException, UploadFile, status
+from config import settings
+import asyncio
+import hashlib
 import os
 import uuid
-import shutil
 
 STATIC_DIR = "static/images/"
+CHUNK_SIZE = 256 * 1024
 
+# (offset, magic bytes, extension); WebP is RIFF....WEBP
+SIGNATURES = [
+    (0, b"\xff\xd8\xff", "jpg"),
+    (0, b"\x89PNG\r\n\x1a\n", "png"),
+    (8, b"WEBP", "webp"),
+]
 
 
-async def save_image(file: UploadFile, subdir: str = "") -> str:
+def sniff_image_type(header: bytes) -> str | None:
+    for offset, magic, extension in SIGNATURES:
+        if header[offset : offset + len(magic)] == magic:
+            if extension == "webp" and not header.startswith(b"RIFF"):
+                continue
+            return extension
+    return None
+
+
+def _write_chunk(buffer, digest, chunk: bytes):
+    digest.update(chunk)
+    buffer.write(chunk)
+
+
+def _publish(temp_path: str, final_path: str):
+    os.makedirs(os.path.dirname(final_path), exist_ok=True)
+    try:
+        # Same bytes already stored for another product. Touch it so the
+        # media collector treats the file as freshly uploaded.
+        os.utime(final_path)
+    except FileNotFoundError:
+        os.replace(temp_path, final_path)
+    else:
+        os.remove(temp_path)
+
+
+def _discard(buffer, temp_path: str):
+    buffer.close()
+    if os.path.exists(temp_path):
+        os.remove(temp_path)
+
+
+async def save_image(file: UploadFile, subdir: str = "products") -> str:
     if not file.filename:
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Not a avalid file")
     directory = os.path.join(STATIC_DIR, subdir)
-    os.makedirs(directory, exist_ok=True)
+    await asyncio.to_thread(os.makedirs, directory, exist_ok=True)
+
+    chunk = await file.read(CHUNK_SIZE)
+    file_ext = sniff_image_type(chunk)
+    if not file_ext:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"Invalid file format: {file.filename}",
+        )
+
+    # Stream to a temp file while hashing; hashing and disk writes run in a
+    # worker thread so a large upload never blocks the event loop.
+    digest = hashlib.sha256()
+    temp_path = os.path.join(directory, f".{uuid.uuid4()}.part")
+    buffer = await asyncio.to_thread(open, temp_path, "wb")
+    size = 0
+    try:
+        while chunk:
+            size += len(chunk)
+            if size > settings.MAX_IMAGE_UPLOAD_BYTES:
+                raise HTTPException(
+                    status_code=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE,
+                    detail=f"Image exceeds {settings.MAX_IMAGE_UPLOAD_BYTES} bytes",
+                )
+            await asyncio.to_thread(_write_chunk, buffer, digest, chunk)
+            chunk = await file.read(CHUNK_SIZE)
+    except BaseException:
+        await asyncio.to_thread(_discard, buffer, temp_path)
+        raise
+    await asyncio.to_thread(buffer.close)
 
-    file_ext = file.filename.split(".")[-1]
-    file_name = f"{uuid.uuid4()}.{file_ext}"
-    file_path = os.path.join(directory, file_name)
+    content_hash = digest.hexdigest()
+    relative_path = f"{subdir}/{content_hash[:2]}/{content_hash}.{file_ext}"
+    await asyncio.to_thread(_publish, temp_path, os.path.join(STATIC_DIR, relative_path))
 
-    with open(file_path, "wb") as buffer:
-        shutil.copyfileobj(file.file, buffer)
+    return f"/{STATIC_DIR}{relative_path}".replace("\\", "/")
 
-    return f"/{STATIC_DIR}{subdir}/{file_name}".replace("\\", "/")
 
-async def delete_image(image_url: str):
+async def save_images(files: list[UploadFile], subdir: str = "products") -> list[str]:
+    semaphore = asyncio.Semaphore(settings.IMAGE_UPLOAD_CONCURRENCY)
 
-    image_path = image_url.lstrip("/")
-    if os.path.exists(image_path):
-        os.remove(image_path)
+    async def save(file: UploadFile):
+        async with semaphore:
+            return await save_image(file, subdir=subdir)
 
-        folder_path = os.path.dirname(image_path)
-        if not os.listdir(folder_path): 
-            shutil.rmtree(folder_path)
+    return list(await asyncio.gather(*(save(file) for file in files)))
@@ -0,0 +1,72 @@
+import os
+import uuid
+
+from PIL import Image, ImageOps
+
+# Longest edge in pixels; smaller originals are never upscaled.
+VARIANT_SIZES = {"thumb": 160, "card": 480, "detail": 1200}
+VARIANT_FORMATS = {
+    "webp": ("WEBP", {"quality": 80, "method": 4}),
+    "jpg": ("JPEG", {"quality": 82, "optimize": True, "progressive": True}),
+}
+
+
+def variant_url(image_url: str, size: str, file_format: str) -> str:
+    # /static/images/products/ab/<sha256>.png -> .../ab/<sha256>_card.webp
+    stem, _ = os.path.splitext(image_url)
+    return f"{stem}_{size}.{file_format}"
+
+
+def variant_urls(image_url: str) -> list[str]:
+    return [
+        variant_url(image_url, size, file_format)
+        for size in VARIANT_SIZES
+        for file_format in VARIANT_FORMATS
+    ]
+
+
+def _save(image: Image.Image, path: str, file_format: str):
+    pil_format, options = VARIANT_FORMATS[file_format]
+    if pil_format == "JPEG" and image.mode != "RGB":
+        background = Image.new("RGB", image.size, (255, 255, 255))
+        image = image.convert("RGBA")
+        background.paste(image, mask=image.getchannel("A"))
+        image = background
+    temp_path = os.path.join(os.path.dirname(path), f".{uuid.uuid4()}.part")
+    try:
+        image.save(temp_path, pil_format, **options)
+        os.replace(temp_path, path)
+    finally:
+        if os.path.exists(temp_path):
+            os.remove(temp_path)
+
+
+def generate_variants(image_url: str) -> dict:
+    # CPU bound; meant for a Celery worker, never the API event loop. The
+    # original is content-addressed, so an existing variant file is already
+    # correct and is not rendered again.
+    source = image_url.lstrip("/")
+    variants = {}
+    with Image.open(source) as original:
+        # Let the JPEG decoder downscale while decoding instead of
+        # materialising a full 4000px bitmap.
+        largest = max(VARIANT_SIZES.values())
+        original.draft("RGB", (largest, largest))
+        image = ImageOps.exif_transpose(original)
+        if image.mode not in ("RGB", "RGBA"):
+            image = image.convert("RGBA" if "transparency" in image.info else "RGB")
+
+        for size, edge in sorted(VARIANT_SIZES.items(), key=lambda item: -item[1]):
+            resized = image.copy()
+            resized.thumbnail((edge, edge), Image.Resampling.LANCZOS)
+            variants[size] = {}
+            for file_format in VARIANT_FORMATS:
+                url = variant_url(image_url, size, file_format)
+                path = url.lstrip("/")
+                if not os.path.exists(path):
+                    _save(resized, path, file_format)
+                variants[size][file_format] = url
+            # Each smaller size starts from the previous one, which is cheaper
+            # than resampling the original again.
+            image = resized
+    return variants
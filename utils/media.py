@@ -0,0 +1,64 @@
+import os
+import re
+
+from starlette.datastructures import Headers
+from starlette.responses import FileResponse, Response
+from starlette.staticfiles import NotModifiedResponse, StaticFiles
+from starlette.types import Receive, Scope, Send
+
+# <sha256>.<ext> originals from image_up and <sha256>_<size>.<ext> variants
+CONTENT_HASHED = re.compile(r"^[0-9a-f]{64}(?:_[a-z]+)?\.[a-z0-9]+$")
+IMMUTABLE = "public, max-age=31536000, immutable"
+REVALIDATE = "public, no-cache"
+PATHSEND = "http.response.pathsend"
+
+
+class MediaFileResponse(FileResponse):
+    chunk_size = 256 * 1024
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        self._pathsend = PATHSEND in scope.get("extensions", {})
+        await super().__call__(scope, receive, send)
+
+    async def _handle_simple(self, send: Send, send_header_only: bool) -> None:
+        # Servers offering the pathsend extension (e.g. Granian) transfer the
+        # file themselves with sendfile instead of reading it into Python.
+        if not self._pathsend or send_header_only:
+            return await super()._handle_simple(send, send_header_only)
+        await send(
+            {"type": "http.response.start", "status": self.status_code, "headers": self.raw_headers}
+        )
+        await send({"type": PATHSEND, "path": os.path.abspath(self.path)})
+
+
+class MediaFiles(StaticFiles):
+    def file_response(
+        self,
+        full_path,
+        stat_result: os.stat_result,
+        scope: Scope,
+        status_code: int = 200,
+    ) -> Response:
+        request_headers = Headers(scope=scope)
+        response = MediaFileResponse(full_path, status_code=status_code, stat_result=stat_result)
+
+        name = os.path.basename(full_path)
+        if CONTENT_HASHED.match(name):
+            # The file name is derived from its bytes, so it is a strong
+            # validator and the URL can be cached forever.
+            response.headers["etag"] = f'"{name}"'
+            response.headers["cache-control"] = IMMUTABLE
+        else:
+            response.headers["cache-control"] = REVALIDATE
+
+        if self.is_not_modified(response.headers, request_headers):
+            return NotModifiedResponse(response.headers)
+        return response
+
+    def is_not_modified(self, response_headers: Headers, request_headers: Headers) -> bool:
+        # If-None-Match takes precedence over If-Modified-Since (RFC 9110).
+        if_none_match = request_headers.get("if-none-match")
+        if if_none_match is None:
+            return super().is_not_modified(response_headers, request_headers)
+        tags = [tag.strip().removeprefix("W/") for tag in if_none_match.split(",")]
+        return "*" in tags or response_headers.get("etag") in tags
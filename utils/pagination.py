@@ -0,0 +1,68 @@
+import base64
+import json
+from datetime import datetime
+from typing import Any, Callable, Sequence
+from uuid import UUID
+
+from fastapi import HTTPException, status
+from sqlalchemy import tuple_
+
+
+def _encode_value(value: Any):
+    if isinstance(value, datetime):
+        return value.isoformat()
+    if isinstance(value, UUID):
+        return str(value)
+    return value
+
+
+def encode_cursor(*values: Any) -> str:
+    payload = json.dumps([_encode_value(value) for value in values], separators=(",", ":"))
+    return base64.urlsafe_b64encode(payload.encode()).decode().rstrip("=")
+
+
+def _load_cursor(cursor: str) -> list:
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        values = json.loads(base64.urlsafe_b64decode(padded.encode()))
+    except ValueError:
+        values = None
+    if not isinstance(values, list):
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST, detail="Invalid cursor"
+        )
+    return values
+
+
+def decode_cursor(cursor: str, *parsers: Callable[[Any], Any]) -> tuple:
+    values = _load_cursor(cursor)
+    try:
+        if len(values) != len(parsers):
+            raise ValueError("cursor arity mismatch")
+        return tuple(parse(value) for parse, value in zip(parsers, values))
+    except (ValueError, TypeError):
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST, detail="Invalid cursor"
+        )
+
+
+def keyset_after(statement, columns: Sequence, values: Sequence):
+    # Rows are always ordered DESC on every key column, so "after" the cursor
+    # means a row-wise comparison that Postgres can serve from a composite index.
+    return statement.where(tuple_(*columns) < tuple_(*values))
+
+
+def keyset_order(statement, columns: Sequence):
+    return statement.order_by(*(column.desc() for column in columns))
+
+
+def next_cursor(rows: Sequence, limit: int, key: Callable[[Any], tuple]):
+    if len(rows) < limit:
+        return None
+    return encode_cursor(*key(rows[-1]))
+
+
+def parse_created_cursor(cursor: str | None):
+    if not cursor:
+        return None
+    return decode_cursor(cursor, datetime.fromisoformat, UUID)
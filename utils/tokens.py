@@ -20,6 +20,10 @@ serializer = URLSafeTimedSerializer(
     secret_key=settings.JWT_SECRET, salt="email.configuration"
 )
 
+guest_serializer = URLSafeTimedSerializer(
+    secret_key=settings.JWT_SECRET, salt="guest.cart"
+)
+
 
 def create_access_token(
     user_data: dict,
@@ -68,6 +72,20 @@ def create_url_safe_token(
     return token
 
 
+def create_guest_token(guest_id: uuid.UUID) -> str:
+    return guest_serializer.dumps(str(guest_id))
+
+
+def decode_guest_token(token: str | None) -> uuid.UUID | None:
+    # Missing, forged or expired cookies just start a new guest cart.
+    if not token:
+        return None
+    try:
+        return uuid.UUID(guest_serializer.loads(token, max_age=settings.CART_GUEST_TTL_SECONDS))
+    except (BadSignature, ValueError):
+        return None
+
+
 def decode_url_safe_token(token: str, max_age: int = 86400):
     try:
         token_data = serializer.loads(token, max_age=max_age)